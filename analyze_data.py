@@ -1,15 +1,16 @@
 
-import pandas as pd
 import numpy as np
 
-# Load the data
-file_path = '/Users/johannesmaerz/Documents/MVPs/teslavaluation3/tesla_data_with_highland_flag.csv'
-df = pd.read_csv(file_path)
+from tesla_valuation.frame import load_frame
+
+# Load the data (typed, cached under .cache/)
+file_path = 'tesla_data_with_highland_flag.csv'
+df = load_frame(file_path)
 
 # 1. Powertrain Analysis
 print("--- Powertrain Analysis ---")
 # Group by model, variant, power, drive_type, battery to identify specs
-powertrain_groups = df.groupby(['model', 'powe_kw', 'drive_type', 'battery_netto']).agg(
+powertrain_groups = df.groupby(['model', 'powe_kw', 'drive_type', 'battery_netto'], observed=True).agg(
     count=('highest_bid_price', 'count'),
     avg_price=('highest_bid_price', 'mean'),
     min_price=('highest_bid_price', 'min'),
@@ -29,8 +30,8 @@ winter_tires_stats = df.groupby('tires_winter')['highest_bid_price'].describe()
 print(winter_tires_stats)
 
 # More detailed comparison controlling for Model and Age (roughly)
-df['year'] = pd.to_datetime(df['first_registration']).dt.year
-detailed_winter = df.groupby(['model', 'year', 'tires_winter'])['highest_bid_price'].mean().unstack()
+df['year'] = df['first_registration'].dt.year
+detailed_winter = df.groupby(['model', 'year', 'tires_winter'], observed=True)['highest_bid_price'].mean().unstack()
 print("\nAverage Price with/without Winter Tires by Model and Year:")
 print(detailed_winter)
 
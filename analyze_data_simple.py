@@ -1,6 +1,6 @@
-import csv
-from collections import defaultdict
-from statistics import mean
+import argparse
+
+from tesla_valuation.aggregate import Aggregator
 
 file_path = 'tesla_data_with_highland_flag.csv'
 
@@ -20,98 +20,83 @@ def safe_int(value):
     except ValueError:
         return 0
 
-print("--- Analysis Report ---")
-
-rows = []
-with open(file_path, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        rows.append(row)
-
-total_cars = len(rows)
-print(f"Total cars: {total_cars}")
-
-# 1. Powertrain Groups
-# Key: (Model, Power KW, Drive Type, Battery Netto)
-powertrain_stats = defaultdict(list)
-
-for row in rows:
-    key = (
-        row['model'], 
-        row['powe_kw'], 
-        row['drive_type'], 
-        row['battery_netto']
-    )
-    price = safe_float(row['highest_bid_price'])
+class Car:
+    """
+    The fields the reports read, parsed once per row.
+    """
+    __slots__ = ('model', 'kw', 'drive', 'battery', 'price', 'winter', 'highland')
+
+    def __init__(self, row):
+        self.model = row['model']
+        self.kw = row['powe_kw']
+        self.drive = row['drive_type']
+        self.battery = row['battery_netto']
+        self.price = safe_float(row['highest_bid_price'])
+        self.winter = row.get('tires_winter', '0') == '1'
+        self.highland = (row.get('is_highland') or '').upper() == 'TRUE'
+
+def build_reports(quantiles=()):
+    agg = Aggregator(parse=Car)
+    price = lambda car: car.price
     # Only count valid prices
-    if price > 1000: 
-        powertrain_stats[key].append(price)
-
-print("\n--- Powertrain Combinations (Top 10 by volume) ---")
-# Sort by count
-sorted_powertrains = sorted(powertrain_stats.items(), key=lambda x: len(x[1]), reverse=True)
-
-print(f"{'Model':<10} | {'kW':<5} | {'Drive':<5} | {'Bat':<5} | {'Count':<5} | {'Avg Price':<10} | {'Min':<8} | {'Max':<8}")
-print("-" * 80)
-for key, prices in sorted_powertrains[:15]:
-    model, kw, drive, bat = key
-    avg_price = mean(prices)
-    print(f"{model:<10} | {kw:<5} | {drive:<5} | {bat:<5} | {len(prices):<5} | {avg_price:<10.1f} | {min(prices):<8.1f} | {max(prices):<8.1f}")
-
-
-# 2. Winter Tires Analysis
-# Simple split
-spring_prices = []
-winter_prices = []
-
-for row in rows:
-    price = safe_float(row['highest_bid_price'])
-    if price < 1000: continue
-    
-    winter = row.get('tires_winter', '0')
-    if winter == '1':
-        winter_prices.append(price)
-    else:
-        spring_prices.append(price)
-
-print("\n--- Winter Tires Impact (Raw) ---")
-if spring_prices: print(f"No Winter Tires: {len(spring_prices)} cars, Avg: {mean(spring_prices):.1f}")
-if winter_prices: print(f"With Winter Tires: {len(winter_prices)} cars, Avg: {mean(winter_prices):.1f}")
-
-# 3. Controlled Winter Tires Analysis (Model 3 & Y separately)
-print("\n--- Winter Tires Impact (By Model) ---")
-for model_name in ['Model 3', 'Model Y']:
-    m_winter = []
-    m_no_winter = []
-    for row in rows:
-        if row['model'] != model_name: continue
-        price = safe_float(row['highest_bid_price'])
-        if price < 1000: continue
-        
-        if row.get('tires_winter', '0') == '1':
-            m_winter.append(price)
-        else:
-            m_no_winter.append(price)
-            
-    print(f"{model_name}:")
-    if m_no_winter: print(f"  No Winter: {mean(m_no_winter):.1f} (n={len(m_no_winter)})")
-    if m_winter:    print(f"  Winter:    {mean(m_winter):.1f} (n={len(m_winter)})")
-
-# 4. Highland Analysis
-print("\n--- Highland Analysis (Model 3 only) ---")
-highland_prices = []
-pre_highland_prices = []
-
-for row in rows:
-    if row['model'] == 'Model 3':
-        price = safe_float(row['highest_bid_price'])
-        if price < 1000: continue
-        
-        is_highland = row.get('is_highland', '').upper()
-        if is_highland == 'TRUE':
-            highland_prices.append(price)
-        else:
-            pre_highland_prices.append(price)
-
-if pre_highland_prices: print(f"Pre-Highland: {mean(pre_highland_prices):.1f} (n={len(pre_highland_prices)})")
-if highland_prices:     print(f"Highland:     {mean(highland_prices):.1f} (n={len(highland_prices)})")
+    agg.register('powertrain', key=lambda car: (car.model, car.kw, car.drive, car.battery), value=price,
+                 where=lambda car: car.price > 1000, quantiles=quantiles)
+    agg.register('winter', key=lambda car: car.winter, value=price,
+                 where=lambda car: car.price >= 1000)
+    agg.register('winter_by_model', key=lambda car: (car.model, car.winter), value=price,
+                 where=lambda car: car.price >= 1000 and car.model in ('Model 3', 'Model Y'))
+    agg.register('highland', key=lambda car: car.highland, value=price,
+                 where=lambda car: car.model == 'Model 3' and car.price >= 1000)
+    return agg
+
+def print_report(agg, quantiles=()):
+    print(f"Total cars: {agg.rows}")
+
+    # 1. Powertrain Groups
+    # Key: (Model, Power KW, Drive Type, Battery Netto)
+    print("\n--- Powertrain Combinations (Top 10 by volume) ---")
+    header = f"{'Model':<10} | {'kW':<5} | {'Drive':<5} | {'Bat':<5} | {'Count':<5} | {'Avg Price':<10} | {'Min':<8} | {'Max':<8}"
+    header += "".join(f" | {f'P{round(p * 100)}':<8}" for p in quantiles)
+    print(header)
+    print("-" * (80 + 11 * len(quantiles)))
+    for key, stats in agg['powertrain'].top(15):
+        model, kw, drive, bat = key
+        line = f"{model:<10} | {kw:<5} | {drive:<5} | {bat:<5} | {stats.count:<5} | {stats.mean:<10.1f} | {stats.min:<8.1f} | {stats.max:<8.1f}"
+        line += "".join(f" | {stats.quantile(p):<8.1f}" for p in quantiles)
+        print(line)
+
+    # 2. Winter Tires Analysis
+    winter = agg['winter'].groups
+    print("\n--- Winter Tires Impact (Raw) ---")
+    if False in winter: print(f"No Winter Tires: {winter[False].count} cars, Avg: {winter[False].mean:.1f}")
+    if True in winter: print(f"With Winter Tires: {winter[True].count} cars, Avg: {winter[True].mean:.1f}")
+
+    # 3. Controlled Winter Tires Analysis (Model 3 & Y separately)
+    print("\n--- Winter Tires Impact (By Model) ---")
+    by_model = agg['winter_by_model'].groups
+    for model_name in ['Model 3', 'Model Y']:
+        m_no_winter = by_model.get((model_name, False))
+        m_winter = by_model.get((model_name, True))
+        print(f"{model_name}:")
+        if m_no_winter: print(f"  No Winter: {m_no_winter.mean:.1f} (n={m_no_winter.count})")
+        if m_winter:    print(f"  Winter:    {m_winter.mean:.1f} (n={m_winter.count})")
+
+    # 4. Highland Analysis
+    print("\n--- Highland Analysis (Model 3 only) ---")
+    highland = agg['highland'].groups
+    if False in highland: print(f"Pre-Highland: {highland[False].mean:.1f} (n={highland[False].count})")
+    if True in highland:  print(f"Highland:     {highland[True].mean:.1f} (n={highland[True].count})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Price summaries by powertrain, winter tires and Highland, in one pass.")
+    parser.add_argument('--file', default=file_path, help=f"dataset CSV (default: {file_path})")
+    parser.add_argument('--quantiles', type=float, nargs='+', default=(), metavar='P',
+                        help="also estimate these price quantiles per powertrain, e.g. 0.5 0.9")
+    args = parser.parse_args()
+
+    print("--- Analysis Report ---")
+    agg = build_reports(args.quantiles).consume_csv(args.file)
+    print_report(agg, args.quantiles)
+
+if __name__ == "__main__":
+    main()
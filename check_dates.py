@@ -1,22 +1,12 @@
-import csv
-from datetime import datetime
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.dates import DateColumns, from_epoch_days
 
-dates = []
-with open('tesla_data_with_highland_flag.csv', 'r') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        try:
-            ds = row['auction_end_date']
-            # Format is like: 2026-01-14 10:00:00+00
-            # or 2025-04-28 ...
-            if ds:
-                dt = datetime.fromisoformat(ds.replace('Z', '+00:00'))
-                dates.append(dt)
-        except:
-            pass
+# auction_end_date as epoch days, parsed once per distinct string
+columns = DateColumns.from_csv(DATASET_CSV, fields=['auction_end_date'])
+span = columns.range('auction_end_date')
 
-if dates:
-    print(f"Min Date: {min(dates)}")
-    print(f"Max Date: {max(dates)}")
-    dates.sort()
-    print("Recent distinct dates:", [d.strftime('%Y-%m-%d') for d in dates[-10:]])
+if span:
+    print(f"Min Date: {from_epoch_days(span[0])}")
+    print(f"Max Date: {from_epoch_days(span[1])}")
+    recent = columns.latest('auction_end_date', 10, distinct=True)
+    print("Recent distinct dates:", [from_epoch_days(d).isoformat() for d in reversed(recent)])
@@ -1,26 +1,288 @@
+import argparse
 import csv
+import io
 import json
+import os
 
-csv_path = 'tesla_data_with_highland_flag.csv'
-json_path = 'src/data/tesla_data.json'
-
-data = []
-with open(csv_path, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        # Clean numeric fields
-        try:
-            row['highest_bid_price'] = float(row['highest_bid_price']) if row['highest_bid_price'] else 0
-            row['mileage'] = int(row['mileage']) if row['mileage'] else 0
-            row['powe_kw'] = int(float(row['powe_kw'])) if row['powe_kw'] else 0
-            row['battery_netto'] = int(round(float(row['battery_netto']))) if row['battery_netto'] else 0
-        except ValueError as e:
-            print(f"Skipping row due to error: {e} | Row: {row}")
-            continue # Skip bad rows
-            
-        data.append(row)
-
-with open(json_path, 'w', encoding='utf-8') as f:
-    json.dump(data, f)
-    
-print(f"converted {len(data)} rows to {json_path}")
+from tesla_valuation.columnar import write_columnar
+from tesla_valuation.dataset import DATASET_CSV, DATASET_JSON, iter_clean_rows
+from tesla_valuation.engine import ValuationEngine
+from tesla_valuation.incremental import RowIndex, splice
+from tesla_valuation.instrument import stage
+from tesla_valuation.pricing_image import write_image
+from tesla_valuation.record import AuctionRecord, clean_record, read_records
+from tesla_valuation.shards import ShardWriter
+
+csv_path = DATASET_CSV
+json_path = DATASET_JSON
+columnar_path = 'tesla_data_columnar'
+pricing_image_path = 'tesla_data_pricing'
+# Under public/ so the app can fetch shards as static files
+shards_path = 'public/tesla_shards'
+
+# json.dump(list) separates items with ', '; records are written the same way
+SEPARATOR = b', '
+
+def encode_record(row):
+    return json.dumps(row).encode('utf-8')
+
+def convert(csv_path=csv_path, json_path=json_path):
+    """
+    Streams the CSV into the JSON array one record at a time, so the dataset
+    is never held in memory. Writes the same bytes as json.dump(rows).
+    """
+    rows_in = 0
+    written = 0
+    with open(json_path + '.tmp', 'wb') as out:
+        out.write(b'[')
+        for record in read_records(csv_path, decode=False):
+            rows_in += 1
+            # Clean numeric fields
+            try:
+                row = clean_record(record)
+            except ValueError as e:
+                print(f"Skipping row due to error: {e} | Row: {record.to_dict()}")
+                continue # Skip bad rows
+
+            if written:
+                out.write(SEPARATOR)
+            out.write(encode_record(row))
+            written += 1
+        out.write(b']')
+    os.replace(json_path + '.tmp', json_path)
+
+    print(f"converted {written} rows to {json_path}")
+    return rows_in, written
+
+def convert_columnar(csv_path=csv_path, out_dir=columnar_path):
+    """
+    Writes the same rows as the JSON in the columnar format (see tesla_valuation.columnar).
+    """
+    n = write_columnar(iter_clean_rows(csv_path), out_dir)
+    print(f"converted {n} rows to {out_dir}/")
+    return n
+
+def convert_pricing_image(csv_path=csv_path, out_dir=pricing_image_path):
+    """
+    Writes the comparables of the same rows as a pricing image for worker
+    processes to map (see tesla_valuation.pricing_image). Returns the manifest.
+    """
+    manifest = write_image(ValuationEngine(iter_clean_rows(csv_path)), out_dir)
+    print(f"wrote {manifest['rows']} comparables in {len(manifest['segments'])} segments to {out_dir}/")
+    return manifest
+
+def convert_shards(csv_path=csv_path, out_dir=shards_path):
+    """
+    Streams the same records as the JSON into one gzip'd NDJSON shard per
+    segment (see tesla_valuation.shards). Returns the manifest.
+    """
+    with ShardWriter(out_dir) as shards:
+        for record in read_records(csv_path, decode=False):
+            try:
+                row = clean_record(record)
+            except ValueError:
+                # Reported by convert(); skipped the same way
+                continue
+            shards.write(row, encode_record(row))
+    manifest = shards.manifest
+    size = sum(e['bytes'] for e in manifest['shards'])
+    print(f"wrote {manifest['rows']} rows to {len(manifest['shards'])} shards in {out_dir}/ ({size / 1e3:.0f} kB)")
+    return manifest
+
+def read_csv_header(csv_path):
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        return tuple(next(csv.reader(f)))
+
+def parse_csv_span(data, fieldnames):
+    # Same newline handling as reading the whole file in text mode
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    return AuctionRecord.from_row(next(csv.reader(text)), fieldnames, decode=False)
+
+def convert_indexed(csv_index, csv_path=csv_path, json_path=json_path):
+    """
+    Full conversion driven by the CSV's row index, so every JSON record can be
+    indexed under the same auction key. Writes the same bytes as convert().
+    """
+    fieldnames = read_csv_header(csv_path)
+    json_index = RowIndex()
+    written = 0
+    entries = sorted(csv_index.rows.items(), key=lambda item: item[1][1])
+
+    with open(csv_path, 'rb') as src, open(json_path + '.tmp', 'wb') as out:
+        out.write(b'[')
+        offset = 1
+        for key, (digest, row_offset, row_length) in entries:
+            src.seek(row_offset)
+            auction = parse_csv_span(src.read(row_length), fieldnames)
+            try:
+                row = clean_record(auction)
+            except ValueError as e:
+                print(f"Skipping row due to error: {e} | Row: {auction.to_dict()}")
+                json_index.set(key, digest, -1, 0)
+                continue
+            if written:
+                out.write(SEPARATOR)
+                offset += len(SEPARATOR)
+            record = encode_record(row)
+            out.write(record)
+            json_index.set(key, digest, offset, len(record))
+            offset += len(record)
+            written += 1
+        out.write(b']')
+    os.replace(json_path + '.tmp', json_path)
+    json_index.save(json_path)
+
+    print(f"converted {written} rows to {json_path}")
+    return len(entries), written
+
+def convert_incremental(csv_path=csv_path, json_path=json_path):
+    """
+    Patches `json_path` with the auctions whose CSV row changed since the last
+    run, found by comparing the content hashes of the CSV and JSON indexes.
+    New auctions are appended before the closing bracket; changed ones are
+    spliced over their old record. An auction turning valid or invalid
+    changes which records precede which, so the JSON is rebuilt then. Needs
+    the index written by `scripts/transform_new_csv.py --incremental`.
+    Returns (changed rows read, records written).
+    """
+    csv_index = RowIndex.load(csv_path)
+    if csv_index is None:
+        print(f"No valid index for {csv_path} (run transform_new_csv.py --incremental), converting in full.")
+        return convert(csv_path, json_path)
+    json_index = RowIndex.load(json_path)
+    if json_index is None or set(json_index.rows) - set(csv_index.rows):
+        print(f"No valid index for {json_path}, rebuilding it.")
+        return convert_indexed(csv_index, csv_path, json_path)
+
+    fieldnames = read_csv_header(csv_path)
+    appended = []      # (key, digest, record)
+    replacements = {}  # offset -> (old_length, record)
+    replaced = []      # (key, digest, record)
+    skipped = 0
+
+    with open(csv_path, 'rb') as src:
+        for key, (digest, row_offset, row_length) in csv_index.rows.items():
+            if json_index.digest(key) == digest:
+                continue
+            src.seek(row_offset)
+            auction = parse_csv_span(src.read(row_length), fieldnames)
+            try:
+                row = clean_record(auction)
+            except ValueError as e:
+                if key in json_index.rows and json_index.span(key)[0] >= 0:
+                    # Dropping a record also means dropping its separator
+                    print(f"Previously valid row is now invalid ({e}), rebuilding {json_path}.")
+                    return convert_indexed(csv_index, csv_path, json_path)
+                print(f"Skipping row due to error: {e} | Row: {auction.to_dict()}")
+                json_index.set(key, digest, -1, 0)
+                skipped += 1
+                continue
+            if key in json_index.rows and json_index.span(key)[0] < 0:
+                # Appending would put it after records that follow it in the CSV
+                print(f"Previously skipped row is now valid, rebuilding {json_path}.")
+                return convert_indexed(csv_index, csv_path, json_path)
+            record = encode_record(row)
+            if key in json_index.rows and json_index.span(key)[0] >= 0:
+                offset, length = json_index.span(key)
+                replacements[offset] = (length, record)
+                replaced.append((key, digest, record))
+            else:
+                appended.append((key, digest, record))
+
+    json_index.shift_after_splice(splice(json_path, replacements))
+    for key, digest, record in replaced:
+        offset, _ = json_index.span(key)
+        json_index.set(key, digest, offset, len(record))
+
+    if appended:
+        with open(json_path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            # Drop the closing bracket, append records, close the array again
+            f.seek(end - 1)
+            f.truncate()
+            offset = end - 1
+            for key, digest, record in appended:
+                if offset > 1:
+                    f.write(SEPARATOR)
+                    offset += len(SEPARATOR)
+                f.write(record)
+                json_index.set(key, digest, offset, len(record))
+                offset += len(record)
+            f.write(b']')
+    json_index.save(json_path)
+
+    print(f"{len(appended)} new, {len(replaced)} changed, {skipped} skipped rows applied to {json_path}")
+    written = len(appended) + len(replaced)
+    return written + skipped, written
+
+def shards_dir(csv, json_out):
+    """
+    Where a run converting `csv` to `json_out` writes its shards when --shards
+    is not given: the app's own directory only for the default dataset, else
+    next to the JSON (`<json without extension>_shards`), so ad-hoc runs never
+    replace what the app serves.
+    """
+    def same(a, b):
+        return os.path.realpath(a) == os.path.realpath(b)
+    if same(csv, csv_path) and same(json_out, json_path):
+        return shards_path
+    return os.path.splitext(json_out)[0] + '_shards'
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the dataset CSV into the app's JSON.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only convert auctions that changed since the last run and patch the JSON in place")
+    parser.add_argument('--csv', default=csv_path, help=f"dataset CSV (default: {csv_path})")
+    parser.add_argument('--json', default=json_path, help=f"JSON to write (default: {json_path})")
+    parser.add_argument('--columnar', nargs='?', const=columnar_path, metavar='DIR',
+                        help=f"also write the columnar binary export (default dir: {columnar_path})")
+    parser.add_argument('--pricing-image', nargs='?', const=pricing_image_path, metavar='DIR',
+                        help=f"also write the mmap'able pricing image for worker pools (default dir: {pricing_image_path})")
+    parser.add_argument('--shards', metavar='DIR',
+                        help=f"where to write one gzip'd NDJSON shard per segment, which the app loads on demand "
+                             f"instead of the JSON (default: {shards_path} for the default dataset, "
+                             f"else <json without extension>_shards)")
+    parser.add_argument('--no-shards', action='store_true',
+                        help="do not rewrite the shards (the app keeps serving the previous ones)")
+    parser.add_argument('--report', metavar='PATH',
+                        help="append this run's stage metrics to a JSON run report (or set TESLA_RUN_REPORT)")
+    args = parser.parse_args()
+    if args.shards is None:
+        args.shards = shards_dir(args.csv, args.json)
+    with stage('convert', args.report) as s:
+        s.extra['mode'] = 'incremental' if args.incremental else 'full'
+        s.read_file(args.csv)
+        if args.incremental:
+            rows_in, rows_out = convert_incremental(args.csv, args.json)
+        else:
+            rows_in, rows_out = convert(args.csv, args.json)
+        s.rows_in, s.rows_out = rows_in, rows_out
+        s.skip('value_error', rows_in - rows_out)
+        s.wrote_file(args.json)
+    if args.columnar:
+        with stage('convert_columnar', args.report) as s:
+            s.read_file(args.csv)
+            s.rows_in = s.rows_out = convert_columnar(args.csv, args.columnar)
+            for name in ('columns.bin', 'text.jsonl', 'manifest.json'):
+                s.wrote_file(os.path.join(args.columnar, name))
+    if args.pricing_image:
+        with stage('convert_pricing_image', args.report) as s:
+            s.read_file(args.csv)
+            manifest = convert_pricing_image(args.csv, args.pricing_image)
+            s.rows_out = manifest['rows']
+            for name in (manifest['image'], 'manifest.json'):
+                s.wrote_file(os.path.join(args.pricing_image, name))
+    # Every run: the app prefers the shards, so stale ones would hide the new JSON
+    # (ad-hoc runs write theirs next to their JSON, see shards_dir)
+    if not args.no_shards:
+        with stage('convert_shards', args.report) as s:
+            s.read_file(args.csv)
+            manifest = convert_shards(args.csv, args.shards)
+            s.rows_out = manifest['rows']
+            s.extra['shards'] = len(manifest['shards'])
+            for entry in manifest['shards']:
+                s.wrote_file(os.path.join(args.shards, entry['file']))
+
+if __name__ == "__main__":
+    main()
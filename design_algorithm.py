@@ -1,77 +1,37 @@
-import csv
-import json
-from collections import defaultdict
-from statistics import mean, median
+from statistics import mean
+
+import pandas as pd
+
+from tesla_valuation.frame import load_frame
+from tesla_valuation.powertrain import CLUSTER_LABELS, assign_clusters
 
 file_path = 'tesla_data_with_highland_flag.csv'
 
-def safe_float(value):
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return 0.0
-
-def safe_int(value):
-    try:
-        return int(float(value))
-    except (ValueError, TypeError):
-        return 0
-
-rows = []
-with open(file_path, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        # Filter out invalid prices/bids
-        if safe_float(row.get('highest_bid_price')) > 1000:
-            rows.append(row)
+df = load_frame(file_path)
+# Filter out invalid prices/bids
+df = df[df['highest_bid_price'] > 1000].copy()
+df['kw'] = df['powe_kw'].fillna(0).astype(int)
+df['drive'] = df['drive_type'].astype(object).fillna('').str.lower()
+# Normalize battery: 78.1 -> 78, 55.0 -> 55
+df['bat'] = df['battery_netto'].fillna(0).round().astype(int)
+if 'powertrain_cluster' not in df:
+    # CSV from before the powertrain_cluster column
+    df['powertrain_cluster'] = assign_clusters(df['model'], df['powe_kw'], df['battery_netto'])
 
 # --- 1. Powertrain Clustering ---
 # Key: Model, kW, Drive, Battery (rounded)
-clusters = defaultdict(list)
-
-for row in rows:
-    model = row['model']
-    kw = safe_int(row['powe_kw'])
-    drive = row['drive_type'].lower()
-    
-    # Normalize battery: 78.1 -> 78, 55.0 -> 55
-    bat_raw = safe_float(row['battery_netto'])
-    bat = int(round(bat_raw))
-    
-    # Logic to handle 'clean' clusters
-    # We ignore entries with 0 data to keep clusters high quality
-    if kw == 0 or bat == 0:
-        continue
-
-    # Create a unique key for the powertrain
-    key = (model, kw, drive, bat)
-    clusters[key].append(row)
+# We ignore entries with 0 data to keep clusters high quality
+clean = df[(df['kw'] != 0) & (df['bat'] != 0)]
+clusters = clean.groupby(['model', 'kw', 'drive', 'bat'], sort=False, observed=True)
 
 print("--- Defined Powertrain Clusters ---")
 cluster_data = []
-for key, cluster_rows in clusters.items():
+for key, cluster_rows in clusters:
     model, kw, drive, bat = key
-    prices = [safe_float(r['highest_bid_price']) for r in cluster_rows]
+    prices = cluster_rows['highest_bid_price'].tolist()
     
-    # Identify common marketing names based on these specs for the user
-    # This is a heuristic based on Tesla knowledge
-    marketing_name = "Unknown"
-    if model == 'Model 3':
-        if bat < 65:
-            marketing_name = "Standard Range / RWD"
-        elif drive == 'awd':
-            if kw > 350:
-                marketing_name = "Performance"
-            else:
-                marketing_name = "Long Range"
-    elif model == 'Model Y':
-        if bat < 65:
-            marketing_name = "Standard Range / RWD"
-        elif drive == 'awd':
-            if kw > 380:
-                marketing_name = "Performance"
-            else:
-                marketing_name = "Long Range"
+    # Marketing name of the app's powertrain cluster (same kW/battery for every row here)
+    marketing_name = CLUSTER_LABELS.get(cluster_rows['powertrain_cluster'].iloc[0], "Unknown")
 
     data = {
         "model": model,
@@ -81,7 +41,7 @@ for key, cluster_rows in clusters.items():
         "count": len(cluster_rows),
         "avg_price": round(mean(prices)),
         "marketing_guess": marketing_name,
-        "unique_variants": list(set([r['variant'] for r in cluster_rows]))[:3] # Sample variants
+        "unique_variants": list(set(cluster_rows['variant']))[:3] # Sample variants
     }
     cluster_data.append(data)
 
@@ -96,23 +56,15 @@ for c in cluster_data:
 # --- 2. Taxation Analysis ---
 # VAT Deductible vs Marginally Taxed
 print("\n--- Taxation Impact ---")
-tax_stats = defaultdict(list)
-for row in rows:
-    tax = row.get('taxation', 'unknown')
-    price = safe_float(row['highest_bid_price'])
-    tax_stats[tax].append(price)
-
-for tax, prices in tax_stats.items():
+taxation = df['taxation'].astype(object).fillna('')
+for tax, prices in df.groupby(taxation, sort=False)['highest_bid_price']:
     print(f"{tax}: Avg €{mean(prices):.0f} (n={len(prices)})")
     
 # Control for model to get a "Premium %"
 # We compare Model Y LR AWD (vat vs margin) as a benchmark
-control_prices = defaultdict(list)
-for row in rows:
-    if row['model'] == 'Model Y' and row['drive_type'] == 'awd' and safe_int(row['powe_kw']) == 378:
-         tax = row.get('taxation')
-         if tax in ['vat_deductible', 'marginally_taxed']:
-             control_prices[tax].append(safe_float(row['highest_bid_price']))
+control = df[(df['model'] == 'Model Y') & (df['drive_type'] == 'awd') & (df['kw'] == 378)]
+control_prices = {tax: control.loc[taxation == tax, 'highest_bid_price'].tolist()
+                  for tax in ['vat_deductible', 'marginally_taxed']}
 
 if control_prices['vat_deductible'] and control_prices['marginally_taxed']:
     vat_avg = mean(control_prices['vat_deductible'])
@@ -124,25 +76,19 @@ if control_prices['vat_deductible'] and control_prices['marginally_taxed']:
 # --- 3. Tire Logic Analysis ---
 # Categories: Summer Only, Winter Only, Both, All-Season
 print("\n--- Tire Configuration Impact ---")
-tire_groups = defaultdict(list)
-
-for row in rows:
-    s = safe_int(row.get('tires_summer', '0'))
-    w = safe_int(row.get('tires_winter', '0'))
-    a = safe_int(row.get('tires_all_season', '0'))
-    
-    label = "Unknown"
+def tire_label(s, w, a):
     if a == 1:
-        label = "All-Season"
+        return "All-Season"
     elif s == 1 and w == 1:
-        label = "8 Tires (Summer+Winter)"
+        return "8 Tires (Summer+Winter)"
     elif s == 1 and w == 0:
-        label = "Summer Only"
+        return "Summer Only"
     elif s == 0 and w == 1:
-        label = "Winter Only"
-    
-    price = safe_float(row['highest_bid_price'])
-    tire_groups[label].append(price)
+        return "Winter Only"
+    return "Unknown"
+
+tires = df[['tires_summer', 'tires_winter', 'tires_all_season']].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+labels = [tire_label(s, w, a) for s, w, a in tires.itertuples(index=False)]
 
-for label, prices in tire_groups.items():
+for label, prices in df.groupby(pd.Series(labels, index=df.index), sort=False)['highest_bid_price']:
     print(f"{label}: Avg €{mean(prices):.0f} (n={len(prices)})")
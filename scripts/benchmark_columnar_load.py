@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from tesla_valuation.columnar import write_columnar
+
+JSON_PATH = os.path.join(ROOT, 'src/data/tesla_data.json')
+
+# Columns predictPrice reads
+VALUATION_COLUMNS = [
+    'model', 'powe_kw', 'battery_netto', 'is_highland', 'taxation', 'highest_bid_price',
+    'first_registration', 'auction_end_date', 'mileage', 'accident_free_cardentity',
+    'features_trailer_hitch', 'trailer_hitch_seller', 'tires_total_sets',
+    'tires_all_season', 'tires_winter', 'status',
+]
+
+# Each measurement runs in a fresh interpreter so peak RSS is not shared
+PROBE = r'''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+mode, path, columns = sys.argv[1], sys.argv[2], sys.argv[3].split(',')
+start = time.perf_counter()
+if mode == 'json':
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    cols = {{c: [r[c] for r in rows] for c in columns}}
+else:
+    from tesla_valuation.columnar import load_columns
+    cols = load_columns(path, columns)
+    # Touch every value so pages are actually read
+    for c in cols.values():
+        sum(getattr(c, 'codes', c))
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss //= 1024
+print(json.dumps({{'seconds': elapsed, 'peak_rss_kb': rss}}))
+'''
+
+def probe(mode, path, columns):
+    code = PROBE.format(root=ROOT)
+    out = subprocess.run([sys.executable, '-c', code, mode, path, ','.join(columns)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time and peak RSS: tesla_data.json vs the columnar export.")
+    parser.add_argument('--scale', type=int, default=100,
+                        help="tile the dataset N times to simulate a larger history (default: 100)")
+    args = parser.parse_args()
+
+    with open(JSON_PATH, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    rows = rows * args.scale
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'tesla_data.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+        col_path = os.path.join(tmp, 'columnar')
+        write_columnar(iter(rows), col_path)
+        del rows
+
+        json_mb = os.path.getsize(json_path) / 1e6
+        col_mb = os.path.getsize(os.path.join(col_path, 'columns.bin')) / 1e6
+        print(f"Rows: {args.scale} x dataset | JSON {json_mb:.1f} MB | columns.bin {col_mb:.1f} MB\n")
+
+        baseline = probe('json', json_path, VALUATION_COLUMNS)
+        print(f"{'Format':<24} | {'Load s':>7} | {'Peak RSS MB':>11}")
+        print("-" * 50)
+        print(f"{'JSON (all fields)':<24} | {baseline['seconds']:>7.3f} | {baseline['peak_rss_kb'] / 1024:>11.1f}")
+        for label, cols in [("columnar (valuation)", VALUATION_COLUMNS), ("columnar (3 columns)", VALUATION_COLUMNS[:3])]:
+            result = probe('columnar', col_path, cols)
+            print(f"{label:<24} | {result['seconds']:>7.3f} | {result['peak_rss_kb'] / 1024:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import transform_new_csv
+from tesla_valuation.instrument import stage
+from tesla_valuation.synthetic import synthetic_export
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+DEFAULT_SIZES = ['10k', '100k']
+HISTORY = 'benchmark_history.jsonl'
+WORK_DIR = os.path.join('.cache', 'bench')
+GENERATOR_VERSION = 2
+VALUATION_DATE = '2026-02-05'
+
+# Cases that hold the whole dataset in memory are skipped above max_rows
+# (suite size) unless --no-limits is given.
+CASES = {}
+DEFAULT_CASES = ['transform', 'convert', 'analyze_simple', 'analyze_frame', 'price_single', 'price_batch']
+
+def case(name, max_rows=None):
+    def register(fn):
+        CASES[name] = (fn, max_rows)
+        return fn
+    return register
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+@case('transform')
+def bench_transform(inputs, options):
+    out = os.path.join(inputs['dir'], 'transform_out.csv')
+    try:
+        with stage('transform') as s, quiet():
+            s.read_file(inputs['export'])
+            stats = transform_new_csv.run(inputs['export'], out, progress_every=0)
+            s.rows_in, s.rows_out = stats.rows_in, stats.rows_out
+            s.wrote_file(out)
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+    return s
+
+@case('transform_parallel')
+def bench_transform_parallel(inputs, options):
+    out = os.path.join(inputs['dir'], 'transform_parallel_out.csv')
+    try:
+        with stage('transform_parallel') as s, quiet():
+            s.read_file(inputs['export'])
+            stats = transform_new_csv.run_parallel(inputs['export'], out, workers=options['workers'],
+                                                   progress_every=0)
+            s.rows_in, s.rows_out = stats.rows_in, stats.rows_out
+            s.extra['workers'] = options['workers']
+            s.wrote_file(out)
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+    return s
+
+@case('convert', max_rows=1_000_000)
+def bench_convert(inputs, options):
+    from convert_csv_to_json import convert
+    out = os.path.join(inputs['dir'], 'convert_out.json')
+    try:
+        with stage('convert') as s, quiet():
+            s.read_file(inputs['dataset'])
+            s.rows_in, s.rows_out = convert(inputs['dataset'], out)
+            s.wrote_file(out)
+    finally:
+        if os.path.exists(out):
+            os.remove(out)
+    return s
+
+@case('analyze_simple')
+def bench_analyze_simple(inputs, options):
+    from analyze_data_simple import build_reports
+    with stage('analyze_simple') as s:
+        s.read_file(inputs['dataset'])
+        agg = build_reports((0.5, 0.9)).consume_csv(inputs['dataset'])
+        s.rows_in = s.rows_out = agg.rows
+    return s
+
+@case('analyze_frame', max_rows=1_000_000)
+def bench_analyze_frame(inputs, options):
+    from tesla_valuation.frame import load_frame
+    with stage('analyze_frame') as s:
+        s.read_file(inputs['dataset'])
+        df = load_frame(inputs['dataset'], cache_dir=False)
+        df.groupby(['model', 'powe_kw', 'drive_type', 'battery_netto'], observed=True).agg(
+            count=('highest_bid_price', 'count'),
+            avg_price=('highest_bid_price', 'mean'),
+            min_price=('highest_bid_price', 'min'),
+            max_price=('highest_bid_price', 'max'),
+        )
+        s.rows_in = s.rows_out = len(df)
+    return s
+
+def sample_queries(engine, n, seed):
+    """
+    predictPrice inputs for `n` dataset cars, as the app would send them.
+    """
+    from tesla_valuation.powertrain import row_cluster
+    comps = random.Random(seed).sample(engine.comparables, min(n, engine.size))
+    return [{
+        'model': c.row['model'],
+        'powertrainId': row_cluster(c.row),
+        'mileage': c.mileage,
+        'registrationDate': c.row['first_registration'],
+        'isNetPrice': c.row.get('taxation') == 'vat_deductible',
+        'isHighland': c.row.get('is_highland') == 'TRUE',
+        'hasAhk': c.has_ahk,
+        'isAccidentFree': c.accident_free,
+        'tireOption': c.tire_option,
+        'valuationDate': VALUATION_DATE,
+    } for c in comps]
+
+@case('price_single', max_rows=1_000_000)
+def bench_price_single(inputs, options):
+    from tesla_valuation.engine import ValuationEngine
+    engine = ValuationEngine.from_csv(inputs['dataset'])
+    queries = sample_queries(engine, options['queries'], options['seed'])
+    with stage('price_single') as s:
+        for query in queries:
+            engine.predict(query)
+        s.rows_in = s.rows_out = len(queries)
+        s.extra['comparables'] = engine.size
+    return s
+
+@case('price_batch', max_rows=1_000_000)
+def bench_price_batch(inputs, options):
+    from tesla_valuation.batch import BatchPricer
+    from tesla_valuation.engine import ValuationEngine
+    engine = ValuationEngine.from_csv(inputs['dataset'])
+    queries = sample_queries(engine, options['batch_queries'], options['seed'])
+    pricer = BatchPricer(engine)
+    with stage('price_batch') as s:
+        pricer.price(queries)
+        s.rows_in = s.rows_out = len(queries)
+        s.extra['comparables'] = engine.size
+    return s
+
+def run_case(name, inputs, options):
+    # Runs in a fresh process, so peak RSS and warm caches belong to this case alone
+    fn, _ = CASES[name]
+    return fn(inputs, options).to_dict()
+
+def prepare_inputs(label, rows, seed):
+    """
+    Synthetic export and its transformed dataset for one suite size, generated
+    once under WORK_DIR and reused by later runs.
+    """
+    directory = os.path.join(WORK_DIR, f"v{GENERATOR_VERSION}_{label}_seed{seed}")
+    os.makedirs(directory, exist_ok=True)
+    inputs = {
+        'dir': directory,
+        'export': os.path.join(directory, 'export.csv'),
+        'dataset': os.path.join(directory, 'dataset.csv'),
+    }
+    if not os.path.exists(inputs['export']):
+        print(f"Generating {rows:,} synthetic auctions ({label})...", file=sys.stderr)
+        start = time.perf_counter()
+        tmp = inputs['export'] + '.tmp'
+        synthetic_export(tmp, rows, seed=seed, malformed_share=0.001)
+        os.replace(tmp, inputs['export'])
+        print(f"  {os.path.getsize(inputs['export']) / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+    if not os.path.exists(inputs['dataset']):
+        print(f"Transforming the {label} export into a dataset CSV...", file=sys.stderr)
+        with quiet():
+            transform_new_csv.run(inputs['export'], inputs['dataset'], progress_every=0)
+    return inputs
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+def load_history(path):
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+def baseline_of(history, record, window):
+    """
+    Median wall time and peak RSS of the last `window` comparable runs
+    (same case, size and CPU count), or None without history.
+    """
+    previous = [
+        r for r in history
+        if r['stage'] == record['stage'] and r['size'] == record['size']
+        and r['cpus'] == record['cpus'] and r['status'] == 'ok'
+    ][-window:]
+    if not previous:
+        return None
+    return (statistics.median(r['wall_s'] for r in previous),
+            statistics.median(r.get('peak_rss_kb') or 0 for r in previous),
+            len(previous))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingest scripts, analytics and pricing on synthetic exports.")
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, choices=list(SIZES),
+                        help=f"suite sizes in export rows (default: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument('--cases', nargs='+', default=DEFAULT_CASES, choices=list(CASES),
+                        help=f"benchmarks to run (default: {' '.join(DEFAULT_CASES)})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes for transform_parallel (default: CPU count)")
+    parser.add_argument('--queries', type=int, default=200, help="cars priced one by one in price_single (default: 200)")
+    parser.add_argument('--batch-queries', type=int, default=5000, help="cars priced in price_batch (default: 5000)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-limits', action='store_true',
+                        help="also run in-memory cases above their row limit")
+    parser.add_argument('--history', default=HISTORY, help=f"JSON-lines results history (default: {HISTORY})")
+    parser.add_argument('--no-save', action='store_true', help="compare against the history without appending to it")
+    parser.add_argument('--window', type=int, default=5,
+                        help="compare against the median of this many previous runs (default: 5)")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="flag cases slower or bigger than the baseline by this fraction (default: 0.2)")
+    args = parser.parse_args()
+
+    options = {'workers': args.workers, 'queries': args.queries,
+               'batch_queries': args.batch_queries, 'seed': args.seed}
+    history = load_history(args.history)
+    run = {
+        'run_id': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+    }
+    ctx = get_context('spawn')
+
+    print(f"{'Case':<18} | {'Size':>5} | {'Seconds':>8} | {'Rows/s':>11} | {'Peak RSS MB':>11} | vs baseline")
+    print("-" * 80)
+    results, regressions = [], []
+    for label in args.sizes:
+        rows = SIZES[label]
+        inputs = prepare_inputs(label, rows, args.seed)
+        for name in args.cases:
+            _, max_rows = CASES[name]
+            if max_rows and rows > max_rows and not args.no_limits:
+                print(f"{name:<18} | {label:>5} | skipped: holds the dataset in memory (--no-limits to run)")
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                record = pool.submit(run_case, name, inputs, options).result()
+            for key in ('pid', 'command'):
+                record.pop(key, None)
+            record.update(run, size=label, export_rows=rows)
+            rate = record['rows_in'] / record['wall_s'] if record['wall_s'] else 0.0
+            rss = (record.get('peak_rss_kb') or 0) / 1024
+
+            verdict = "no history"
+            baseline = baseline_of(history, record, args.window)
+            if baseline:
+                wall, peak, n = baseline
+                verdict = f"{record['wall_s'] / wall - 1:+.0%} time (median of {n})"
+                if record['wall_s'] > wall * (1 + args.threshold):
+                    regressions.append(f"{name} {label}: {wall:.3f}s -> {record['wall_s']:.3f}s")
+                    verdict += " REGRESSION"
+                if peak and (record.get('peak_rss_kb') or 0) > peak * (1 + args.threshold):
+                    regressions.append(f"{name} {label}: peak RSS {peak / 1024:.1f} -> {rss:.1f} MB")
+                    verdict += " RSS REGRESSION"
+            print(f"{name:<18} | {label:>5} | {record['wall_s']:>8.3f} | {rate:>11,.0f} | {rss:>11.1f} | {verdict}")
+            results.append(record)
+
+    if not args.no_save and results:
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for record in results:
+                f.write(json.dumps(record) + "\n")
+        print(f"\nAppended {len(results)} results to {args.history}")
+
+    if regressions:
+        print(f"\nRegressions (> {args.threshold:.0%} vs baseline):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+import transform_new_csv
+from tesla_valuation.synthetic import synthetic_export
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transform_new_csv.py serial vs --workers N.")
+    parser.add_argument('--rows', type=int, default=200000, help="synthetic export size (default: 200000)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8],
+                        help="worker counts to compare against serial (default: 2 4 8)")
+    parser.add_argument('--chunk-mb', type=float, default=transform_new_csv.DEFAULT_CHUNK_MB)
+    args = parser.parse_args()
+
+    print(f"CPUs available: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, 'export.csv')
+        print(f"Generating {args.rows:,} synthetic auctions...")
+        synthetic_export(export_path, args.rows)
+        print(f"Export size: {os.path.getsize(export_path) / 1e6:.1f} MB\n")
+
+        results = []
+        out_path = os.path.join(tmp, 'serial.csv')
+        start = time.perf_counter()
+        transform_new_csv.run(export_path, out_path, progress_every=0)
+        serial = time.perf_counter() - start
+        reference = file_digest(out_path)
+        results.append(("serial", serial, True))
+
+        for n in args.workers:
+            out_path = os.path.join(tmp, f"workers_{n}.csv")
+            start = time.perf_counter()
+            transform_new_csv.run_parallel(export_path, out_path, workers=n,
+                                           chunk_mb=args.chunk_mb, progress_every=0)
+            elapsed = time.perf_counter() - start
+            results.append((f"{n} workers", elapsed, file_digest(out_path) == reference))
+
+    print(f"\n{'Mode':<12} | {'Seconds':>8} | {'Rows/s':>10} | {'Speedup':>7} | Identical")
+    print("-" * 58)
+    for label, elapsed, same in results:
+        print(f"{label:<12} | {elapsed:>8.2f} | {args.rows / elapsed:>10,.0f} | {serial / elapsed:>6.2f}x | {same}")
+
+if __name__ == "__main__":
+    main()
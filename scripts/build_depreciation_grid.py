@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.engine import ValuationEngine
+from tesla_valuation.grid import (DEFAULT_MAX_AGE, DEFAULT_MAX_MILEAGE, DEFAULT_MILEAGE_STEP, DEFAULT_PROBES,
+                                  DEFAULT_TOLERANCE, GRID_BIN, MANIFEST, build_grid)
+from tesla_valuation.instrument import stage
+
+GRID_DIR = 'depreciation_grid'
+
+def format_error(error):
+    if not error or error['hit_rate'] is None:
+        return "no probes"
+    if error['abs_error_p50'] is None:
+        return f"hit rate {error['hit_rate']:.1%}"
+    return (f"hit rate {error['hit_rate']:.1%} | abs err p50 €{error['abs_error_p50']:.2f} "
+            f"p95 €{error['abs_error_p95']:.2f} max €{error['abs_error_max']:.0f} | "
+            f"rel err p95 {error['rel_error_p95']:.3%} max {error['rel_error_max']:.2%}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute per-segment depreciation grids of predictPrice for O(1) approximate quotes.")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    parser.add_argument('--out', default=GRID_DIR, help=f"grid directory to write (default: {GRID_DIR})")
+    parser.add_argument('--valuation-date', help="ISO date the grid prices at (default: today, UTC)")
+    parser.add_argument('--max-age', type=int, default=DEFAULT_MAX_AGE,
+                        help=f"ages 0 .. N-1 months (default: {DEFAULT_MAX_AGE})")
+    parser.add_argument('--max-mileage', type=int, default=DEFAULT_MAX_MILEAGE,
+                        help=f"highest mileage in the grid (default: {DEFAULT_MAX_MILEAGE})")
+    parser.add_argument('--mileage-step', type=int, default=DEFAULT_MILEAGE_STEP,
+                        help=f"km between grid points (default: {DEFAULT_MILEAGE_STEP})")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"relative midpoint error above which an interval is priced exactly "
+                             f"(default: {DEFAULT_TOLERANCE})")
+    parser.add_argument('--probes', type=int, default=DEFAULT_PROBES,
+                        help=f"random probes per segment for the error report (default: {DEFAULT_PROBES})")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', metavar='PATH',
+                        help="append this run's stage metrics to a JSON run report (or set TESLA_RUN_REPORT)")
+    args = parser.parse_args()
+    valuation_date = args.valuation_date or datetime.now(timezone.utc).date().isoformat()
+
+    with stage('depreciation_grid', args.report) as s:
+        s.read_file(args.data)
+        engine = ValuationEngine.from_csv(args.data)
+        manifest = build_grid(engine, args.out, valuation_date, max_age=args.max_age,
+                              max_mileage=args.max_mileage, mileage_step=args.mileage_step,
+                              tolerance=args.tolerance, probes=args.probes, seed=args.seed,
+                              dataset_path=args.data)
+        s.rows_in = engine.size
+        s.rows_out = len(manifest['segments'])
+        s.extra['error'] = manifest['error']
+        for name in (GRID_BIN, MANIFEST):
+            s.wrote_file(os.path.join(args.out, name))
+
+    print(f"{'Segment':<44} | {'Comps':>5} | {'Trusted':>7} | Error vs predictPrice")
+    print("-" * 110)
+    for segment in manifest['segments']:
+        model, cluster, highland, vat = segment['key']
+        label = f"{model} {cluster} {'Highland' if highland else 'pre-Highland'} {'VAT' if vat else 'margin'}"
+        print(f"{label:<44} | {segment['comparables']:>5} | {segment['trusted_share']:>7.1%} | "
+              f"{format_error(segment['error'])}")
+    print(f"\nAll segments: {format_error(manifest['error'])}")
+    print(f"Wrote {args.out}/ ({os.path.getsize(os.path.join(args.out, GRID_BIN)) / 1e6:.1f} MB, "
+          f"valuation date {manifest['valuation_date'][:10]}) in {s.wall_s:.1f}s")
+
+if __name__ == "__main__":
+    main()
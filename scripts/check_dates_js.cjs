@@ -1,17 +1,21 @@
-
 const fs = require('fs');
 const data = JSON.parse(fs.readFileSync('src/data/tesla_data.json', 'utf8'));
 
-const dates = data
-    .map(r => r.auction_end_date)
-    .filter(d => d)
-    .sort();
+// One pass: ISO strings compare like the dates they hold, no sort needed
+const cutoff = "2024-11-01";
+let earliest;
+let latest;
+let recent = 0;
+for (const { auction_end_date: d } of data) {
+    if (!d) continue;
+    if (earliest === undefined || d < earliest) earliest = d;
+    if (latest === undefined || d > latest) latest = d;
+    if (d >= cutoff) recent++;
+}
 
 console.log("Total records:", data.length);
-console.log("Earliest auction:", dates[0]);
-console.log("Latest auction:", dates[dates.length - 1]);
+console.log("Earliest auction:", earliest);
+console.log("Latest auction:", latest);
 
 // Count recent
-const cutoff = "2024-11-01";
-const recent = dates.filter(d => d >= cutoff).length;
 console.log(`Auctions on/after ${cutoff}:`, recent);
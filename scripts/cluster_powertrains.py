@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.instrument import stage
+from tesla_valuation.powertrain import CLUSTER_RULES, assign_clusters, derive_rules
+from tesla_valuation.record import read_records, write_records
+
+def cluster_columns(records):
+    return (
+        [r.model for r in records],
+        [r.powe_kw for r in records],
+        [r.battery_netto for r in records],
+    )
+
+def print_rules(rules):
+    for rule in rules:
+        kw = f"[{rule.kw_min or '':>4}, {rule.kw_max or '':>4})"
+        battery = f"[{rule.battery_min or '':>3}, {rule.battery_max or '':>3})"
+        print(f"  {rule.model:<8} {rule.cluster:<28} kW {kw}  kWh {battery}")
+
+def print_crosstab(table_ids, derived_ids):
+    pairs = Counter(zip(table_ids, derived_ids))
+    print("\nTable cluster -> derived cluster (cars):")
+    for (table, derived), n in sorted(pairs.items(), key=lambda item: (str(item[0][0]), -item[1])):
+        print(f"  {str(table):<10} -> {str(derived):<28} {n:>7,}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Assign the powertrain_cluster column of a dataset CSV in one vectorized pass.")
+    parser.add_argument('--csv', default=DATASET_CSV, help=f"dataset CSV to read (default: {DATASET_CSV})")
+    parser.add_argument('--output', help="CSV to write (default: rewrite --csv in place; required with --derive)")
+    parser.add_argument('--derive', action='store_true',
+                        help="split clusters at the valleys of the kW/kWh density instead of using CLUSTER_RULES "
+                             "(for analysis: the app only knows the table's ids)")
+    parser.add_argument('--kw-bandwidth', type=float, default=10.0, help="kernel width in kW for --derive (default: 10)")
+    parser.add_argument('--battery-bandwidth', type=float, default=2.0,
+                        help="kernel width in kWh for --derive (default: 2)")
+    parser.add_argument('--min-count', type=int, default=5, help="smallest derived cluster kept (default: 5)")
+    parser.add_argument('--dry-run', action='store_true', help="print the clusters without writing")
+    parser.add_argument('--report', metavar='PATH',
+                        help="append this run's stage metrics to a JSON run report (or set TESLA_RUN_REPORT)")
+    args = parser.parse_args()
+    output = args.output or args.csv
+    # Derived ids are unknown to the app and the engine: never let them replace the dataset's
+    if args.derive and not args.dry_run and (
+            not args.output or os.path.realpath(args.output) == os.path.realpath(args.csv)):
+        parser.error("--derive writes cluster ids the app does not know; pass --dry-run or an --output "
+                     "other than --csv")
+
+    with stage('cluster', args.report) as s:
+        s.read_file(args.csv)
+        records = list(read_records(args.csv, decode=False))
+        columns = cluster_columns(records)
+        drive_types = [r.drive_type for r in records]
+        highland = [r.is_highland == 'TRUE' for r in records]
+        clusters = assign_clusters(*columns, drive_types=drive_types, highland=highland)
+
+        if args.derive:
+            rules = derive_rules(*columns, kw_bandwidth=args.kw_bandwidth,
+                                 battery_bandwidth=args.battery_bandwidth, min_count=args.min_count)
+            print("Rules derived from the kW/kWh density:")
+            print_rules(rules)
+            derived = assign_clusters(*columns, drive_types=drive_types, highland=highland, rules=rules)
+            print_crosstab(clusters, derived)
+            clusters = derived
+        else:
+            print("Rules (CLUSTER_RULES):")
+            print_rules(CLUSTER_RULES)
+
+        counts = Counter(clusters)
+        print(f"\n{len(records):,} cars:")
+        for cluster, n in counts.most_common():
+            print(f"  {str(cluster):<28} {n:>7,}")
+        s.rows_in = s.rows_out = len(records)
+        s.extra['clusters'] = {str(cluster): n for cluster, n in counts.items()}
+
+        if not args.dry_run:
+            for record, cluster in zip(records, clusters):
+                record.powertrain_cluster = cluster
+            with open(output + '.tmp', 'w', encoding='utf-8') as f:
+                write_records(f, records)
+            os.replace(output + '.tmp', output)
+            s.wrote_file(output)
+            print(f"\nWrote {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from price_batch import read_inputs
+from tesla_valuation.dataset import DATASET_CSV
+
+PRICE_FIELDS = ('model', 'powertrainId', 'registrationDate', 'mileage')
+
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection to the pricing service.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+def load_inputs(args):
+    if args.synthetic:
+        import benchmark_suite
+        from tesla_valuation.engine import ValuationEngine
+        inputs = benchmark_suite.sample_queries(ValuationEngine.from_csv(args.data), args.synthetic, args.seed)
+        if len(inputs) < args.synthetic:
+            print(f"{args.data} has {len(inputs):,} priced cars; sampling {args.synthetic:,} queries with "
+                  f"replacement (repeated cars hit the service cache)", file=sys.stderr)
+            inputs += random.Random(args.seed).choices(inputs, k=args.synthetic - len(inputs))
+        return inputs
+    if not os.path.exists(args.inputs):
+        sys.exit(f"{args.inputs} not found (use --synthetic N to sample dataset cars instead)")
+    inputs = [line for line in read_inputs(args.inputs)
+              if isinstance(line, dict) and all(name in line for name in PRICE_FIELDS)]
+    if not inputs:
+        sys.exit(f"No predictPrice inputs in {args.inputs} (use --synthetic N to sample dataset cars instead)")
+    return inputs
+
+async def run(args, inputs):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    if args.batch > 1:
+        bodies = [('/price/batch', inputs[i:i + args.batch]) for i in range(0, len(inputs), args.batch)]
+    else:
+        bodies = [('/price', query) for query in inputs]
+    bodies *= args.repeat
+
+    probe = Connection(host, port)
+    _, before = await probe.request('GET', '/health')
+    latencies = []
+    errors = []
+    cursor = iter(bodies)
+
+    async def worker():
+        conn = Connection(host, port)
+        try:
+            for path, payload in cursor:
+                start = time.perf_counter()
+                try:
+                    status, result = await conn.request('POST', path, payload)
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+                    conn.close()
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(f"{status}: {result.get('error') if result else ''}")
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - start
+    _, after = await probe.request('GET', '/health')
+    probe.close()
+    return bodies, latencies, errors, wall, before, after
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay predictPrice inputs against the pricing service and report latency and throughput.")
+    parser.add_argument('inputs', nargs='?', default='requests.jsonl',
+                        help="JSON array or JSON lines of predictPrice inputs (default: requests.jsonl)")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="replay N dataset cars (as benchmark_suite samples them) instead of a file")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV for --synthetic (default: {DATASET_CSV})")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help="service URL (default: http://127.0.0.1:8765)")
+    parser.add_argument('--concurrency', type=int, default=32, help="connections in flight (default: 32)")
+    parser.add_argument('--batch', type=int, default=1,
+                        help="cars per request; above 1 posts to /price/batch (default: 1)")
+    parser.add_argument('--repeat', type=int, default=1, help="replay the inputs this many times (default: 1)")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args()
+
+    inputs = load_inputs(args)
+    bodies, latencies, errors, wall, before, after = asyncio.run(run(args, inputs))
+    cars = len(inputs) * args.repeat
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    delta = {name: after[name] - before[name]
+             for name in ('requests', 'cars_priced', 'cache_hits', 'batches', 'batched_cars')}
+    summary = {
+        'requests': len(bodies),
+        'cars': cars,
+        'errors': len(errors),
+        'concurrency': args.concurrency,
+        'wall_s': round(wall, 3),
+        'requests_per_s': round(len(bodies) / wall, 1),
+        'cars_per_s': round(cars / wall, 1),
+        'latency_ms': {name: round(float(np.percentile(ms, q)), 3)
+                       for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        'cache_hit_rate': round(delta['cache_hits'] / delta['cars_priced'], 4) if delta['cars_priced'] else None,
+        'batches': delta['batches'],
+        'mean_batch': round(delta['batched_cars'] / delta['batches'], 1) if delta['batches'] else None,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        latency = summary['latency_ms']
+        print(f"{summary['requests']:,} requests ({cars:,} cars) over {args.concurrency} connections "
+              f"in {wall:.2f}s, {len(errors)} errors")
+        print(f"Throughput: {summary['requests_per_s']:,.0f} req/s, {summary['cars_per_s']:,.0f} cars/s")
+        print(f"Latency: p50 {latency['p50']:.2f} ms | p90 {latency['p90']:.2f} ms | "
+              f"p99 {latency['p99']:.2f} ms | max {latency['max']:.2f} ms")
+        hit_rate = summary['cache_hit_rate']
+        print(f"Server: {delta['batches']:,} scoring batches (mean {summary['mean_batch'] or 0} cars), "
+              f"cache hit rate {hit_rate:.1%}" if hit_rate is not None else "Server: no cars priced")
+    for error in errors[:5]:
+        print(f"  error: {error}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.config import load_valuation_config
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.dates import parse_iso
+from tesla_valuation.loocv import LoocvHarness
+
+def print_result(label, result):
+    if result['count'] == 0:
+        print(f"{label}: no predictions")
+        return
+    models = " | ".join(f"{model}: {median:.3f}%" for model, median in result['models'].items())
+    print(f"{label}: median {result['median']:.3f}% | mean {result['mean']:.3f}% | {models} ({result['count']} cars)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Leave-one-out median % error of valuation configs.")
+    parser.add_argument('configs', nargs='*',
+                        help="JSON files in VALUATION_CONFIG shape (default: the config in src/utils/valuation.js)")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    parser.add_argument('--valuation-date', help="ISO date to value at (default: now, like the optimizers)")
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="re-evaluate the first config N times and report configs per minute")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    harness = LoocvHarness.from_csv(args.data, now=parse_iso(args.valuation_date))
+    print(f"Precomputed {len(harness.segments)} segments, {len(harness)} targets in {time.perf_counter() - start:.3f}s")
+
+    configs = []
+    for path in args.configs:
+        with open(path, 'r', encoding='utf-8') as f:
+            configs.append((path, json.load(f)))
+    if not configs:
+        configs.append(("VALUATION_CONFIG", load_valuation_config()))
+
+    for label, config in configs:
+        print_result(label, harness.evaluate(config))
+
+    if args.benchmark:
+        config = configs[0][1]
+        start = time.perf_counter()
+        for _ in range(args.benchmark):
+            harness.evaluate(config)
+        elapsed = time.perf_counter() - start
+        print(f"{args.benchmark} evaluations in {elapsed:.2f}s ({args.benchmark / elapsed * 60:.0f} configs/min)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.market import MARKET_SUFFIX, REFERENCE_AGE_MONTHS, REFERENCE_MILEAGE, MarketIndex
+
+def load_index(data, rebuild=False):
+    """
+    The saved market index of `data`, built and saved first if it is missing or stale.
+    """
+    index = None if rebuild else MarketIndex.load(data)
+    if index is None:
+        print(f"Building {data}{MARKET_SUFFIX}...", file=sys.stderr)
+        index = MarketIndex.from_csv(data)
+        index.save(data)
+    return index
+
+def trend_groups(index, model=None, powertrain=None, by_model=False):
+    """
+    [(label, segments)] to report, one per segment or one per model.
+    """
+    segments = [s for s in index.segments()
+                if (model is None or s[0] == model) and (powertrain is None or s[1] == powertrain)]
+    if not by_model:
+        return [(" / ".join([str(s[0]), str(s[1]), "Highland" if s[2] else "classic", "VAT" if s[3] else "margin"]),
+                 [s]) for s in segments]
+    models = sorted({s[0] for s in segments})
+    return [(m, [s for s in segments if s[0] == m]) for m in models]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Weekly median adjusted auction prices and drift per segment, from the market index.")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    parser.add_argument('--model', help="only this model (e.g. 'Model Y')")
+    parser.add_argument('--powertrain', help="only this powertrain cluster (e.g. my_lr)")
+    parser.add_argument('--by-model', action='store_true', help="merge the segments of each model")
+    parser.add_argument('--weeks', type=int, default=12, help="latest N weeks per group, 0 for all (default: 12)")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the index even if it is current")
+    parser.add_argument('--json', action='store_true', help="print JSON instead of tables")
+    args = parser.parse_args()
+
+    index = load_index(args.data, args.rebuild)
+    report = []
+    for label, segments in trend_groups(index, args.model, args.powertrain, args.by_model):
+        series = index.series(segments)
+        latest = series[-1][2]
+        rows = series[-args.weeks:] if args.weeks > 0 else series
+        # drift: what a sale of that week is worth at the latest week's prices
+        report.append({'group': label, 'weeks': [
+            {'week': week.isoformat(), 'cars': count, 'median': round(median), 'drift': round(latest / median, 4)}
+            for week, count, median in rows]})
+
+    if args.json:
+        print(json.dumps(report, indent=1))
+        return
+    print(f"Median highest bid adjusted to {REFERENCE_AGE_MONTHS} months and {REFERENCE_MILEAGE:,} km, by auction week")
+    for group in report:
+        print(f"\n{group['group']}")
+        for w in group['weeks']:
+            print(f"  {w['week']}  {w['cars']:>6,} cars  €{w['median']:>7,}  x{w['drift']:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+// The app fetches public/tesla_shards/manifest.json plus the one gzip'd NDJSON
+// shard of the queried segment (src/utils/shards.js), and only falls back to
+// src/data/tesla_data.json without shards. Its load cost is therefore reading
+// the manifest, then reading, gunzipping and parsing a shard; the largest
+// shard is timed as the worst case, and parsing the whole JSON as the
+// comparison. Appends an 'app_load' stage to the JSON run report named by the
+// first argument or TESLA_RUN_REPORT (same format as tesla_valuation/instrument.py).
+// Usage: node scripts/measure_app_load.mjs [report.json] [data.json] [shards dir]
+const REPORT_VERSION = 1;
+
+function appendToReport(reportPath, record) {
+    let report = { version: REPORT_VERSION, stages: [] };
+    try {
+        const existing = JSON.parse(fs.readFileSync(reportPath, 'utf-8'));
+        if (existing.version === REPORT_VERSION) report = existing;
+    } catch {
+        // Missing or unreadable: start a new report
+    }
+    report.stages.push(record);
+    fs.writeFileSync(reportPath + '.tmp', JSON.stringify(report, null, 2));
+    fs.renameSync(reportPath + '.tmp', reportPath);
+}
+
+function seconds(from, to) {
+    return Number(to - from) / 1e9;
+}
+
+function loadShard(shardsDir) {
+    const start = process.hrtime.bigint();
+    const manifestText = fs.readFileSync(path.join(shardsDir, 'manifest.json'), 'utf-8');
+    const manifest = JSON.parse(manifestText);
+    const manifestDone = process.hrtime.bigint();
+    const shard = manifest.shards.reduce((a, b) => (b.rows > a.rows ? b : a));
+    const gz = fs.readFileSync(path.join(shardsDir, shard.file));
+    const readDone = process.hrtime.bigint();
+    const text = zlib.gunzipSync(gz).toString('utf-8');
+    const gunzipDone = process.hrtime.bigint();
+    const rows = text.split('\n').filter((line) => line).map((line) => JSON.parse(line));
+    const end = process.hrtime.bigint();
+    return {
+        rows: rows.length,
+        wall_s: seconds(start, end),
+        bytes_read: Buffer.byteLength(manifestText) + gz.length,
+        shard: shard.file,
+        manifest_s: seconds(start, manifestDone),
+        read_s: seconds(manifestDone, readDone),
+        gunzip_s: seconds(readDone, gunzipDone),
+        parse_s: seconds(gunzipDone, end),
+    };
+}
+
+function loadJson(dataPath) {
+    const start = process.hrtime.bigint();
+    const text = fs.readFileSync(dataPath, 'utf-8');
+    const readDone = process.hrtime.bigint();
+    const data = JSON.parse(text);
+    const end = process.hrtime.bigint();
+    return {
+        rows: data.length,
+        wall_s: seconds(start, end),
+        bytes_read: Buffer.byteLength(text),
+        read_s: seconds(start, readDone),
+        parse_s: seconds(readDone, end),
+    };
+}
+
+function main() {
+    const reportPath = process.argv[2] || process.env.TESLA_RUN_REPORT;
+    const dataPath = process.argv[3] || path.join(__dirname, '../src/data/tesla_data.json');
+    const shardsDir = process.argv[4] || path.join(__dirname, '../public/tesla_shards');
+    const startedAt = new Date().toISOString();
+
+    const cpuStart = process.cpuUsage();
+    const hasShards = fs.existsSync(path.join(shardsDir, 'manifest.json'));
+    const load = hasShards ? loadShard(shardsDir) : loadJson(dataPath);
+    const cpu = process.cpuUsage(cpuStart);
+    // Before the comparison, which would dominate both
+    const peakRssKb = process.resourceUsage().maxRSS;
+    const heapUsedKb = Math.round(process.memoryUsage().heapUsed / 1024);
+    const full = hasShards ? loadJson(dataPath) : load;
+
+    const { rows, wall_s, bytes_read, ...timings } = load;
+    const record = {
+        stage: 'app_load',
+        status: 'ok',
+        started_at: startedAt,
+        wall_s,
+        cpu_s: (cpu.user + cpu.system) / 1e6,
+        rows_in: rows,
+        rows_out: rows,
+        rows_skipped: {},
+        bytes_read,
+        bytes_written: 0,
+        peak_rss_kb: peakRssKb,
+        peak_rss_children_kb: null,
+        pid: process.pid,
+        command: process.argv,
+        mode: hasShards ? 'shard' : 'json',
+        ...timings,
+        heap_used_kb: heapUsedKb,
+        full_json: { rows: full.rows, bytes: full.bytes_read, wall_s: full.wall_s, read_s: full.read_s, parse_s: full.parse_s },
+    };
+
+    const ms = (s) => `${(s * 1000).toFixed(1)} ms`;
+    if (hasShards) {
+        console.log(`Loaded manifest + ${record.shard}: ${rows} records (${(bytes_read / 1e3).toFixed(1)} kB) in ${ms(wall_s)} ` +
+            `(manifest ${ms(record.manifest_s)}, read ${ms(record.read_s)}, gunzip ${ms(record.gunzip_s)}, ` +
+            `parse ${ms(record.parse_s)}), peak RSS ${(peakRssKb / 1024).toFixed(1)} MB`);
+    } else {
+        console.log(`No shards in ${shardsDir}, timed the JSON fallback`);
+    }
+    console.log(`Full JSON: ${full.rows} records (${(full.bytes_read / 1e6).toFixed(1)} MB) in ${ms(full.wall_s)} ` +
+        `(read ${ms(full.read_s)}, parse ${ms(full.parse_s)})`);
+    if (reportPath) {
+        appendToReport(reportPath, record);
+        console.log(`Appended app_load to ${reportPath}`);
+    }
+}
+
+main();
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.engine import ValuationEngine
+
+# Per-process state of pool workers (see start_worker)
+_worker = {}
+
+def read_inputs(path):
+    """
+    predictPrice inputs from a JSON array or a JSON-lines file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def memory_mb():
+    """
+    (private, shared) resident MB of this process, from /proc on Linux; None elsewhere.
+    """
+    sizes = {}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in ('Private_Clean', 'Private_Dirty', 'Shared_Clean', 'Shared_Dirty'):
+                    sizes[name] = int(rest.split()[0]) / 1024
+    except OSError:
+        return None
+    return (sizes.get('Private_Clean', 0) + sizes.get('Private_Dirty', 0),
+            sizes.get('Shared_Clean', 0) + sizes.get('Shared_Dirty', 0))
+
+def batch_pricer(image_path, data_path):
+    """
+    (BatchPricer, neighbour indices -> auction ids) over a pricing image, or
+    over an engine built from the CSV when no image is given.
+    """
+    from tesla_valuation.batch import BatchPricer
+    if image_path:
+        from tesla_valuation.pricing_image import PricingImage
+        image = PricingImage(image_path)
+        return BatchPricer(image), image.auction_ids
+    engine = ValuationEngine.from_csv(data_path)
+    return BatchPricer(engine), lambda row: [engine.comparables[j].row['auction_id'] for j in row if j >= 0]
+
+def price_vectorized(pricer, auction_ids, inputs):
+    batch = pricer.price(inputs)
+    return [(float(price), auction_ids(row)) for price, row in zip(batch.prices, batch.neighbors)]
+
+def start_worker(image_path, data_path):
+    start = time.perf_counter()
+    _worker['pricer'], _worker['auction_ids'] = batch_pricer(image_path, data_path)
+    _worker['startup_s'] = time.perf_counter() - start
+
+def price_chunk(inputs):
+    results = price_vectorized(_worker['pricer'], _worker['auction_ids'], inputs)
+    return os.getpid(), _worker['startup_s'], memory_mb(), results
+
+def price_in_pool(inputs, workers, image_path, data_path):
+    """
+    Prices `inputs` in a process pool. Returns (results in input order,
+    {pid: (startup seconds, (private MB, shared MB))}).
+    """
+    size = max(1, -(-len(inputs) // (workers * 4)))
+    chunks = [inputs[i:i + size] for i in range(0, len(inputs), size)]
+    results = []
+    stats = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                             initargs=(image_path, data_path)) as pool:
+        for pid, startup_s, memory, chunk in pool.map(price_chunk, chunks):
+            results.extend(chunk)
+            stats[pid] = (startup_s, memory)
+    return results, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Price many cars at once with the Python valuation engine.")
+    parser.add_argument('inputs', help="JSON array or JSON lines of predictPrice inputs")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    parser.add_argument('--output', help="write JSON lines here instead of stdout")
+    parser.add_argument('--vectorized', action='store_true',
+                        help="score with the NumPy batch pricer instead of one car at a time")
+    parser.add_argument('--image', metavar='DIR',
+                        help="score with the batch pricer over a pricing image (convert_csv_to_json.py "
+                             "--pricing-image) instead of indexing --data")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="score with the batch pricer in N processes, each mapping --image or "
+                             "indexing its own copy of --data (default: 1)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    start = time.perf_counter()
+    inputs = read_inputs(args.inputs)
+    workers = None
+    if args.workers > 1:
+        built = time.perf_counter()
+        results, workers = price_in_pool(inputs, args.workers, args.image, args.data)
+        size = None
+    elif args.image or args.vectorized:
+        pricer, auction_ids = batch_pricer(args.image, args.data)
+        built = time.perf_counter()
+        results = price_vectorized(pricer, auction_ids, inputs)
+        size = pricer.engine.size
+    else:
+        engine = ValuationEngine.from_csv(args.data)
+        built = time.perf_counter()
+        results = [(r['price'], [n['auction_id'] for n in r['neighbors']]) for r in engine.predict_many(inputs)]
+        size = engine.size
+    done = time.perf_counter()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for price, neighbors in results:
+            out.write(json.dumps({'price': price, 'neighbors': neighbors}) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+    source = f"image {args.image}" if args.image else args.data
+    if workers is None:
+        print(f"Indexed {size} comparables from {source} in {built - start:.3f}s, "
+              f"priced {len(inputs)} cars in {done - built:.3f}s", file=sys.stderr)
+        return
+    print(f"Priced {len(inputs)} cars in {done - built:.3f}s with {len(workers)} workers over {source}",
+          file=sys.stderr)
+    startup = statistics.median(s for s, _ in workers.values())
+    line = f"  per worker: startup {startup:.3f}s (median)"
+    memories = [m for _, m in workers.values() if m is not None]
+    if memories:
+        line += (f", private {statistics.median(m[0] for m in memories):.1f} MB, "
+                 f"shared {statistics.median(m[1] for m in memories):.1f} MB resident (median)")
+    print(line, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
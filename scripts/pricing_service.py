@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.engine import ValuationEngine
+from tesla_valuation.service import (DEFAULT_BATCH_WINDOW, DEFAULT_CACHE_SIZE, DEFAULT_MAX_BATCH,
+                                     DEFAULT_MILEAGE_BUCKET, DEFAULT_POLL, PricingService, serve)
+from tesla_valuation.snapshots import SnapshotStore
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve predictPrice over local HTTP (/price, /price/batch, /health) with micro-batching.")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    parser.add_argument('--snapshots', metavar='DIR',
+                        help="serve the latest snapshot in DIR instead of --data and follow new versions")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL,
+                        help=f"seconds between checks for new snapshots, 0 for POST /reload only "
+                             f"(default: {DEFAULT_POLL:g})")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW * 1000,
+                        help=f"ms to collect cars into one scoring call (default: {DEFAULT_BATCH_WINDOW * 1000:g})")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f"score early once this many cars wait (default: {DEFAULT_MAX_BATCH})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"cached responses, 0 to disable (default: {DEFAULT_CACHE_SIZE})")
+    parser.add_argument('--mileage-bucket', type=int, default=DEFAULT_MILEAGE_BUCKET,
+                        help=f"km mileages are rounded to, 0 for exact (default: {DEFAULT_MILEAGE_BUCKET})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshots = SnapshotStore(args.snapshots) if args.snapshots else None
+    engine = snapshots.open_engine() if snapshots else ValuationEngine.from_csv(args.data)
+    service = PricingService(engine, batch_window=args.batch_window / 1000, max_batch=args.max_batch,
+                             cache_size=args.cache_size, mileage_bucket=args.mileage_bucket, snapshots=snapshots)
+
+    def ready(server):
+        source = f"snapshot v{engine.version} of {args.snapshots}" if snapshots else args.data
+        print(f"Indexed {engine.size:,} comparables from {source} in {time.perf_counter() - start:.2f}s; "
+              f"serving on http://{args.host}:{args.port}", flush=True)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready, poll=args.poll))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
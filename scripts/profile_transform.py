@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import transform_new_csv
+from tesla_valuation.jsonblob import BlobDecoder, orjson
+from tesla_valuation.synthetic import synthetic_export
+
+def time_decode(rows, decoder):
+    start = time.perf_counter()
+    for row in rows:
+        decoder.decode(row.get('tyres', '[]'), 'tyres')
+        decoder.decode(row.get('conditions', '[]'), 'conditions')
+    return time.perf_counter() - start
+
+def time_transform(rows, decoder):
+    transform_new_csv.BLOBS = decoder
+    start = time.perf_counter()
+    for row in rows:
+        transform_new_csv.transform_row(row)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage timing of transform_row with and without blob memoization.")
+    parser.add_argument('--rows', type=int, default=200000, help="synthetic export size (default: 200000)")
+    parser.add_argument('--input', help="profile this export instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if path is None:
+            path = os.path.join(tmp, 'export.csv')
+            print(f"Generating {args.rows:,} synthetic auctions...")
+            synthetic_export(path, args.rows)
+        start = time.perf_counter()
+        rows = list(transform_new_csv.read_rows(path))
+        read_s = time.perf_counter() - start
+
+    # Only rows past the make/model filter reach the blob parsing
+    tesla = [r for r in rows if r.get('make') == 'Tesla' and r.get('model') in ('Model 3', 'Model Y')]
+    print(f"{len(rows):,} rows, {len(tesla):,} Tesla | csv read {read_s:.2f}s\n")
+
+    decoders = [
+        ("json.loads, no cache", lambda: BlobDecoder(maxsize=0, backend='json')),
+        ("json.loads, LRU cache", lambda: BlobDecoder(backend='json')),
+    ]
+    if orjson is not None:
+        decoders += [
+            ("orjson, no cache", lambda: BlobDecoder(maxsize=0, backend='orjson')),
+            ("orjson, LRU cache", lambda: BlobDecoder(backend='orjson')),
+        ]
+
+    print(f"{'Decoder':<22} | {'Decode s':>8} | {'transform_row s':>15} | {'Decode share':>12} | {'Saved':>6}")
+    print("-" * 76)
+    baseline = None
+    for label, make in decoders:
+        decode_s = time_decode(tesla, make())
+        decoder = make()
+        transform_s = time_transform(rows, decoder)
+        if baseline is None:
+            baseline = transform_s
+        saved = (baseline - transform_s) / baseline * 100
+        print(f"{label:<22} | {decode_s:>8.3f} | {transform_s:>15.3f} | {decode_s / transform_s:>11.0%} | {saved:>5.1f}%")
+
+    info = decoder.cache_info()
+    if info:
+        print(f"\nCache: {info.hits:,} hits, {info.misses:,} misses ({info.currsize:,} distinct blobs)")
+    malformed = sum(decoder.malformed.values())
+    print(f"Malformed blobs: {malformed:,} ({dict(decoder.malformed)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.instrument import stage
+from tesla_valuation.snapshots import DEFAULT_KEEP, SNAPSHOT_DIR, SnapshotStore, same_comparables
+from transform_new_csv import print_snapshot
+
+def verify_delta(store, previous):
+    """
+    Follows the delta from `previous` and compares the engine with a cold
+    load of the latest version. Returns False if they differ.
+    """
+    if previous is None or previous == store.current():
+        return True
+    try:
+        engine = store.open_engine(previous)
+    except FileNotFoundError:
+        print(f"v{previous} has no full dataset left; delta reload not verified.")
+        return True
+    followed, touched = store.update_engine(engine)
+    same = same_comparables(followed, store.open_engine())
+    mode = "full reload" if touched is None else f"delta over {len(touched)} segments"
+    print(f"Delta reload check ({mode}): {'matches' if same else 'DIFFERS from'} a cold load.")
+    return same
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish the dataset CSV as an immutable, versioned snapshot with an auction_id delta.")
+    parser.add_argument('--csv', default=DATASET_CSV, help=f"dataset CSV to publish (default: {DATASET_CSV})")
+    parser.add_argument('--snapshots', default=SNAPSHOT_DIR, help=f"snapshot store (default: {SNAPSHOT_DIR})")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                        help=f"versions that keep their full dataset copy (default: {DEFAULT_KEEP})")
+    parser.add_argument('--verify', action='store_true',
+                        help="check that following the new delta gives the same engine as a cold load")
+    parser.add_argument('--report', metavar='PATH',
+                        help="append this run's stage metrics to a JSON run report (or set TESLA_RUN_REPORT)")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.snapshots)
+    previous = store.current()
+    with stage('publish_snapshot', args.report) as s:
+        s.read_file(args.csv)
+        manifest = store.publish(args.csv, keep=args.keep)
+        s.rows_in = manifest['rows']
+        s.rows_out = sum(manifest['counts'].values())
+        s.extra['version'] = manifest['version']
+    print_snapshot(manifest, args.snapshots, previous)
+    if args.verify and not verify_delta(store, previous):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
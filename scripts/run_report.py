@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.instrument import load_report
+
+def latest_by_stage(report):
+    stages = {}
+    for record in report['stages']:
+        stages[record['stage']] = record
+    return stages
+
+def per_row_us(record):
+    rows = record.get('rows_in') or 0
+    return record['wall_s'] / rows * 1e6 if rows else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a pipeline run report, optionally against a baseline report.")
+    parser.add_argument('report', help="JSON run report (TESLA_RUN_REPORT / --report output)")
+    parser.add_argument('--baseline', help="earlier run report to compare per-row wall time and peak RSS against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="flag stages slower or bigger than the baseline by this fraction (default: 0.2)")
+    args = parser.parse_args()
+
+    report = load_report(args.report)
+    if not report['stages']:
+        sys.exit(f"Error: no stages in {args.report}")
+    baseline = latest_by_stage(load_report(args.baseline)) if args.baseline else {}
+
+    print(f"{'Stage':<18} | {'Wall s':>8} | {'Rows in':>9} | {'Rows out':>9} | {'Skipped':>8} | {'MB read':>8} | {'MB written':>10} | {'Peak RSS MB':>11}")
+    print("-" * 104)
+    regressions = []
+    for record in report['stages']:
+        skipped = sum(record.get('rows_skipped', {}).values())
+        rss = (record.get('peak_rss_kb') or 0) / 1024
+        print(f"{record['stage']:<18} | {record['wall_s']:>8.3f} | {record['rows_in']:>9,} | {record['rows_out']:>9,} | "
+              f"{skipped:>8,} | {record['bytes_read'] / 1e6:>8.1f} | {record['bytes_written'] / 1e6:>10.1f} | {rss:>11.1f}")
+        before = baseline.get(record['stage'])
+        if before is None:
+            continue
+        now_us, before_us = per_row_us(record), per_row_us(before)
+        if now_us and before_us and now_us > before_us * (1 + args.threshold):
+            regressions.append(f"{record['stage']}: {before_us:.1f} -> {now_us:.1f} us/row")
+        if before.get('peak_rss_kb') and record.get('peak_rss_kb', 0) > before['peak_rss_kb'] * (1 + args.threshold):
+            regressions.append(f"{record['stage']}: peak RSS {before['peak_rss_kb'] / 1024:.1f} -> {rss:.1f} MB")
+
+    if args.baseline:
+        print()
+        if regressions:
+            print("Regressions vs baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No stage regressed by more than {args.threshold:.0%} vs {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import DATASET_CSV
+from tesla_valuation.search import evaluate_baseline, format_config_js, round_config, run_search
+
+DEFAULT_LOG = 'search_trials.jsonl'
+
+def describe(result):
+    models = ", ".join(f"{model}: {median:.2f}%" for model, median in result['models'].items())
+    return f"{result['median']:.3f}% ({models})"
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel random search over VALUATION_CONFIG, scored by LOOCV.")
+    parser.add_argument('--trials', type=int, default=2000, help="configs to sample (default: 2000)")
+    parser.add_argument('--seed', type=int, default=0, help="RNG seed for configs and subsamples (default: 0)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--rungs', type=int, default=1,
+                        help="successive-halving rungs; 1 scores every trial on all targets (default: 1)")
+    parser.add_argument('--eta', type=int, default=3,
+                        help="keep the best 1/ETA per rung; rung samples grow by ETA (default: 3)")
+    parser.add_argument('--log', default=DEFAULT_LOG,
+                        help=f"trial log to checkpoint to and resume from (default: {DEFAULT_LOG})")
+    parser.add_argument('--valuation-date', help="ISO date to value at (default: now, or the resumed log's)")
+    parser.add_argument('--data', default=DATASET_CSV, help=f"dataset CSV (default: {DATASET_CSV})")
+    args = parser.parse_args()
+    if args.rungs < 1 or args.eta < 2:
+        parser.error("--rungs must be >= 1 and --eta >= 2")
+
+    start = time.perf_counter()
+    best = {'median': None}
+    counts = {'new': 0}
+
+    def on_record(record):
+        counts['new'] += 1
+        median = record['result']['median']
+        if record['rung'] == args.rungs - 1 and median is not None and (best['median'] is None or median < best['median']):
+            best['median'] = median
+            print(f"[trial {record['trial']}] New best: {describe(record['result'])} [{time.perf_counter() - start:.1f}s]")
+
+    try:
+        ranked, meta = run_search(args.trials, seed=args.seed, workers=args.workers, rungs=args.rungs, eta=args.eta,
+                            data=args.data, now=args.valuation_date, log_path=args.log, on_record=on_record)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"\n{counts['new']} evaluations in {elapsed:.1f}s ({len(ranked)} configs reached the full LOOCV)")
+
+    winner = ranked[0]
+    now = meta['now']
+    baseline = evaluate_baseline(args.data, now)
+    pasted = round_config(winner['config'])
+    print(f"Current VALUATION_CONFIG: {describe(baseline)}")
+    print(f"Best (trial {winner['trial']}):      {describe(winner['result'])}")
+    print(f"Best, rounded as below:   {describe(evaluate_baseline(args.data, now, pasted))}")
+    print()
+    print(format_config_js(pasted))
+
+if __name__ == "__main__":
+    main()
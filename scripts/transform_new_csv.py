@@ -1,131 +1,118 @@
 
+import argparse
 import csv
-import json
+import io
+import os
+import shutil
 import sys
-from datetime import datetime
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tesla_valuation.dataset import clean_row
+from tesla_valuation.incremental import RowIndex, append_bytes, content_hash, splice
+from tesla_valuation.instrument import stage
+from tesla_valuation.jsonblob import BlobDecoder
+from tesla_valuation.market import MARKET_SUFFIX, MarketIndex
+from tesla_valuation.powertrain import assign_clusters
+from tesla_valuation.record import COLUMNS, RecordDecoder
+from tesla_valuation.snapshots import SnapshotStore
 
 # Input/Output Config
 INPUT_CSV = 'auctions_latest_export.csv'
 OUTPUT_CSV = 'tesla_data_with_highland_flag.csv'
 
+# Streaming Config
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PROGRESS_EVERY = 50000
+
+# Parallel Config
+DEFAULT_WORKERS = 1
+DEFAULT_CHUNK_MB = 16
+
 # Target Headers (matching the original file)
-HEADERS = [
-    'make', 'model', 'variant', 'mileage', 'first_registration', 'powe_kw', 
-    'drive_type', 'features_autopilot', 'tires_summer', 'tires_winter', 
-    'tires_all_season', 'tires_total_sets', 'features_heatpump', 
-    'features_pano_roof', 'features_trailer_hitch', 'battery_netto', 
-    'battery_brutto', 'color', 'upholstery', 'taxation', 'accident_free', 
-    'number_of_keys', 'damage_description', 'auction_start_date', 
-    'auction_end_date', 'status', 'highest_bid_price', 'number_of_bids', 
-    'list_price', 'acc', 'number_of_seats', 'electric_seats', 'leather_seats', 
-    'head_up_display', 'seat_heating', 'sport_seat_type', 'heated_steering_wheel', 
-    'sport_steering_wheel', 'leather_steering_wheel', 'camera_type', 
-    'trailer_hitch_seller', 'paint_color', 'upholstery', 'equipment', 
-    'charging_cables', 'document_type', 'documents', 'form_of_ownership', 
-    'seller_type', 'special_equipment_price', 'accident_free_cardentity', 
-    'service_maintained', 'smoker_car', 'pet_car', 'auction_id', 
-    'auction_short_id', 'auction_sequence', 'activated_at', 
-    'auction_created_at', 'highest_bider_id', 'highest_bid_at', 
-    'bids_count_calc', 'max_bid_offer_amount', 'min_bid_offer_amount', 
-    'last_bid_at', 'is_highland', 'highland_logic_reason'
-]
-
-def parse_json_safe(json_str):
-    try:
-        return json.loads(json_str)
-    except:
-        return []
+HEADERS = COLUMNS
+
+# Dataset field <- export column, for the fields copied as they are
+EXPORT_SOURCES = {
+    'make': 'make', 'model': 'model', 'variant': 'variant', 'mileage': 'mileage',
+    'first_registration': 'first_registration', 'powe_kw': 'power_kw',
+    'drive_type': 'drive_type', 'features_autopilot': 'tesla_autopilot',
+    'features_heatpump': 'heatpump', 'features_pano_roof': 'panorama_roof',
+    'features_trailer_hitch': 'trailer_hitch', 'battery_netto': 'battery_capacity_netto',
+    'battery_brutto': 'battery_capacity_brutto',
+    # 'color' was empty in the old file; 'paint_color' exists in both
+    'paint_color': 'paint_color', 'taxation': 'taxation',
+    # The old 'accident_free' column holds the seller's statement
+    'accident_free': 'accident_free_seller', 'accident_free_cardentity': 'accident_free_cardentity',
+    'number_of_keys': 'number_of_keys',
+    'auction_start_date': 'start_time', 'auction_end_date': 'end_time', 'status': 'status',
+    'highest_bid_price': 'highest_bid_amount',
+    'number_of_bids': 'number_of_bids', 'list_price': 'list_price', 'acc': 'acc',
+    'number_of_seats': 'number_of_seats', 'electric_seats': 'electric_seats',
+    'leather_seats': 'leather_seats', 'head_up_display': 'head_up_display',
+    'seat_heating': 'seat_heating', 'sport_seat_type': 'sport_seat_type',
+    'heated_steering_wheel': 'heated_steering_wheel', 'sport_steering_wheel': 'sport_steering_wheel',
+    'leather_steering_wheel': 'leather_steering_wheel', 'camera_type': 'camera_type',
+    'trailer_hitch_seller': 'trailer_hitch_seller',
+    # "{type_2}"-style strings in both files, copied as they are
+    'charging_cables': 'charging_cables', 'documents': 'documents',
+    'document_type': 'document_type', 'form_of_ownership': 'form_of_ownership',
+    'seller_type': 'seller_type', 'special_equipment_price': 'special_equipment_price',
+    'service_maintained': 'service_maintained', 'smoker_car': 'smoker_car', 'pet_car': 'pet_car',
+    'auction_id': 'auction_id', 'auction_short_id': 'auction_short_id',
+    'auction_sequence': 'auction_sequence', 'activated_at': 'activated_at',
+    'auction_created_at': 'auction_created_at', 'highest_bider_id': 'highest_bider_id',
+    'highest_bid_at': 'highest_bid_at', 'bids_count_calc': 'bids_count_calc',
+    'max_bid_offer_amount': 'max_bid_offer_amount', 'min_bid_offer_amount': 'min_bid_offer_amount',
+    'last_bid_at': 'last_bid_at',
+}
+# The transform only copies these, so they stay text (see RecordDecoder)
+FROM_EXPORT = RecordDecoder(EXPORT_SOURCES, decode=False)
+
+# tyres/conditions blobs repeat across rows; each distinct one is decoded once
+BLOBS = BlobDecoder()
 
-def get_highland_status(row):
+def parse_json_safe(json_str, field=None):
+    # Empty and malformed blobs read as [] and are counted in BLOBS
+    return BLOBS.decode(json_str, field)
+
+def get_highland_status(record):
     """
-    Determines if a Model 3 is the Highland facelift.
+    Determines if a Model 3 is the Highland facelift. Returns (is_highland, reason).
     """
-    model = row.get('model', '')
-    variant = row.get('variant', '')
-    reg_date = row.get('first_registration', '')
-
-    if model != 'Model 3':
-        return "FALSE", "Not Model 3"
+    if record.model != 'Model 3':
+        return False, "Not Model 3"
 
     # 1. Explicit Label in Variant
-    if 'highland' in variant.lower():
-        return "TRUE", "Labeled Highland"
+    if 'highland' in (record.variant or '').lower():
+        return True, "Labeled Highland"
 
     # User Request: If it's not labeled Highland, it's NOT Highland. 
     # Even if date is late 2023/2024.
-    return "FALSE", "Not Labeled Highland"
+    return False, "Not Labeled Highland"
 
 def transform_row(row):
+    """
+    Maps one export row to an AuctionRecord, or None if it is not a Tesla Model 3/Y.
+    """
     # Only Tesla Model 3 and Y
     make = row.get('make', '')
     model = row.get('model', '')
     if make != 'Tesla' or model not in ['Model 3', 'Model Y']:
         return None
 
-    new_row = {k: '' for k in HEADERS}
-    
-    # Direct mappings (New CSV Col -> Old CSV Col)
-    new_row['make'] = make
-    new_row['model'] = model
-    new_row['variant'] = row.get('variant')
-    new_row['mileage'] = row.get('mileage')
-    new_row['first_registration'] = row.get('first_registration')
-    new_row['powe_kw'] = row.get('power_kw')
-    new_row['drive_type'] = row.get('drive_type')
-    new_row['features_autopilot'] = row.get('tesla_autopilot')
-    
-    # Simple Renames
-    new_row['features_heatpump'] = row.get('heatpump')
-    new_row['features_pano_roof'] = row.get('panorama_roof')
-    new_row['features_trailer_hitch'] = row.get('trailer_hitch')
-    new_row['battery_netto'] = row.get('battery_capacity_netto')
-    new_row['battery_brutto'] = row.get('battery_capacity_brutto')
-    # color mapping? 'paint_color' exists in both, 'color' was empty in old head
-    new_row['paint_color'] = row.get('paint_color') 
-    
-    new_row['taxation'] = row.get('taxation')
-    new_row['accident_free'] = row.get('accident_free_seller') # Or cardentity? Old head had 'accident_free' and 'accident_free_cardentity'
-    # Wait, old csv had 'accident_free' populated with 't' in the dump.
-    # New csv has 'accident_free_seller' and 'accident_free_cardentity'.
-    # I will map 'accident_free_seller' to 'accident_free' to be consistent with common usage?
-    # Actually, let's map both specific fields first.
-    new_row['accident_free_cardentity'] = row.get('accident_free_cardentity')
-    # The 'accident_free' column in old CSV: let's populate it with seller's belief for now
-    new_row['accident_free'] = row.get('accident_free_seller')
-
-    new_row['number_of_keys'] = row.get('number_of_keys')
-    
-    new_row['auction_start_date'] = row.get('start_time')
-    new_row['auction_end_date'] = row.get('end_time')
-    new_row['status'] = row.get('status')
-    
-    # Price
-    # Prefer highest_bid_amount, fallback map_bid_offer_amount
-    price = row.get('highest_bid_amount')
-    if not price:
-        price = row.get('max_bid_offer_amount')
-    new_row['highest_bid_price'] = price
-    
-    new_row['number_of_bids'] = row.get('number_of_bids')
-    new_row['list_price'] = row.get('list_price')
-    new_row['acc'] = row.get('acc')
-    
-    # Interior / Seats
-    new_row['number_of_seats'] = row.get('number_of_seats')
-    new_row['electric_seats'] = row.get('electric_seats')
-    new_row['leather_seats'] = row.get('leather_seats')
-    new_row['head_up_display'] = row.get('head_up_display')
-    new_row['seat_heating'] = row.get('seat_heating')
-    new_row['sport_seat_type'] = row.get('sport_seat_type')
-    new_row['heated_steering_wheel'] = row.get('heated_steering_wheel')
-    new_row['sport_steering_wheel'] = row.get('sport_steering_wheel')
-    new_row['leather_steering_wheel'] = row.get('leather_steering_wheel')
-    new_row['camera_type'] = row.get('camera_type')
-    new_row['trailer_hitch_seller'] = row.get('trailer_hitch_seller')
-    
+    record = FROM_EXPORT(row)
+
+    # Price: prefer highest_bid_amount, fall back to max_bid_offer_amount
+    if not record.highest_bid_price:
+        record.highest_bid_price = row.get('max_bid_offer_amount')
+
     # JSON Parsing: Tires
-    tyres = parse_json_safe(row.get('tyres', '[]'))
-    new_row['tires_total_sets'] = len(tyres)
+    tyres = parse_json_safe(row.get('tyres', '[]'), 'tyres')
+    record.tires_total_sets = len(tyres)
     
     has_summer = False
     has_winter = False
@@ -137,12 +124,12 @@ def transform_row(row):
         if 'winter' in ctype: has_winter = True
         if 'all_season' in ctype or 'allseason' in ctype: has_all_season = True
         
-    new_row['tires_summer'] = '1' if has_summer else '0'
-    new_row['tires_winter'] = '1' if has_winter else '0'
-    new_row['tires_all_season'] = '1' if has_all_season else '0'
+    record.tires_summer = int(has_summer)
+    record.tires_winter = int(has_winter)
+    record.tires_all_season = int(has_all_season)
     
     # JSON Parsing: Conditions (Damage)
-    conditions = parse_json_safe(row.get('conditions', '[]'))
+    conditions = parse_json_safe(row.get('conditions', '[]'), 'conditions')
     descriptions = []
     for c in conditions:
         if c.get('title') == 'Damage' or c.get('description'):
@@ -150,64 +137,442 @@ def transform_row(row):
              if desc and desc != "Description not available":
                  descriptions.append(desc)
     
-    new_row['damage_description'] = "; ".join(descriptions)
-    
-    # Other JSONs
-    new_row['charging_cables'] = row.get('charging_cables') # It's {type_2} string in CSV, not real JSON often? CHECK
-    # In old CSV: "{type_2}"
-    # In new CSV head: "{type_2}"
-    # So just copy.
-    
-    new_row['documents'] = row.get('documents')
-    new_row['document_type'] = row.get('document_type')
-    new_row['form_of_ownership'] = row.get('form_of_ownership')
-    new_row['seller_type'] = row.get('seller_type')
-    new_row['special_equipment_price'] = row.get('special_equipment_price')
-    new_row['service_maintained'] = row.get('service_maintained')
-    new_row['smoker_car'] = row.get('smoker_car')
-    new_row['pet_car'] = row.get('pet_car')
-    
-    # IDs
-    new_row['auction_id'] = row.get('auction_id')
-    new_row['auction_short_id'] = row.get('auction_short_id')
-    new_row['auction_sequence'] = row.get('auction_sequence')
-    new_row['activated_at'] = row.get('activated_at')
-    new_row['auction_created_at'] = row.get('auction_created_at')
-    new_row['highest_bider_id'] = row.get('highest_bider_id')
-    new_row['highest_bid_at'] = row.get('highest_bid_at')
-    new_row['bids_count_calc'] = row.get('bids_count_calc')
-    new_row['max_bid_offer_amount'] = row.get('max_bid_offer_amount')
-    new_row['min_bid_offer_amount'] = row.get('min_bid_offer_amount')
-    new_row['last_bid_at'] = row.get('last_bid_at')
+    record.damage_description = "; ".join(descriptions)
     
     # Highland
-    is_highland, reason = get_highland_status(new_row)
-    new_row['is_highland'] = is_highland
-    new_row['highland_logic_reason'] = reason
+    record.is_highland, record.highland_logic_reason = get_highland_status(record)
     
-    return new_row
+    return record
 
-def main():
-    print(f"Reading {INPUT_CSV}...")
-    
-    processed_rows = []
-    
-    with open(INPUT_CSV, 'r', encoding='utf-8') as f:
+def set_clusters(records):
+    """
+    Fills in powertrain_cluster for a batch of records in one vectorized pass.
+    """
+    clusters = assign_clusters([r.model for r in records], [r.powe_kw for r in records],
+                               [r.battery_netto for r in records],
+                               drive_types=[r.drive_type for r in records],
+                               highland=[r.is_highland for r in records])
+    for record, cluster in zip(records, clusters):
+        record.powertrain_cluster = cluster
+
+def read_rows(path):
+    """
+    Yields raw export rows one at a time so the file is never held in memory.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            new_row = transform_row(row)
-            if new_row:
-                processed_rows.append(new_row)
-                
-    print(f"Processed {len(processed_rows)} Tesla records.")
-    
-    print(f"Writing to {OUTPUT_CSV}...")
-    with open(OUTPUT_CSV, 'w', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=HEADERS)
-        writer.writeheader()
-        writer.writerows(processed_rows)
-        
+            yield row
+
+def iter_batches(rows, batch_size, stats):
+    """
+    Transforms rows lazily and groups the kept ones into lists of `batch_size`.
+    Rows rejected by the make/model filter are counted in `stats`.
+    """
+    batch = []
+    for row in rows:
+        stats.rows_in += 1
+        record = transform_row(row)
+        if record is None:
+            stats.rows_dropped += 1
+        else:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                set_clusters(batch)
+                yield batch
+                batch = []
+        stats.maybe_report()
+    if batch:
+        set_clusters(batch)
+        yield batch
+    stats.malformed.update(BLOBS.take_counts()[1])
+
+class ProgressCounter:
+    """
+    Tracks rows read/kept/dropped and prints throughput every `every` rows.
+    """
+
+    def __init__(self, every=DEFAULT_PROGRESS_EVERY, stream=sys.stderr):
+        self.every = every
+        self.stream = stream
+        self.rows_in = 0
+        self.rows_dropped = 0
+        self.rows_unchanged = 0
+        self.malformed = Counter()
+        # (market index, cells updated or None if rebuilt), when one is maintained
+        self.market = None
+        self.last_reported = -1
+        self.started = time.perf_counter()
+
+    @property
+    def rows_out(self):
+        return self.rows_in - self.rows_dropped
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows_in / elapsed if elapsed > 0 else 0.0
+
+    def maybe_report(self):
+        if self.every and self.rows_in % self.every == 0:
+            self.report()
+
+    def report(self):
+        if self.rows_in == self.last_reported:
+            return
+        self.last_reported = self.rows_in
+        print(
+            f"  {self.rows_in:,} rows read | {self.rows_out:,} kept | "
+            f"{self.rows_dropped:,} dropped (make/model) | {self.rate():,.0f} rows/s",
+            file=self.stream,
+        )
+
+    def report_malformed(self):
+        if self.malformed:
+            detail = ", ".join(f"{field}: {n:,}" for field, n in sorted(self.malformed.items()))
+            print(f"  Malformed JSON blobs read as empty: {detail}", file=self.stream)
+
+def run(input_csv=INPUT_CSV, output_csv=OUTPUT_CSV, batch_size=DEFAULT_BATCH_SIZE,
+        progress_every=DEFAULT_PROGRESS_EVERY):
+    """
+    Streams `input_csv` through `transform_row` into `output_csv`.
+    Only one batch of transformed rows is alive at a time. Rows go to a
+    temporary file that replaces `output_csv` once the input is exhausted,
+    so a failed run leaves the previous dataset untouched.
+    """
+    stats = ProgressCounter(every=progress_every)
+    tmp_path = output_csv + '.tmp'
+
+    print(f"Reading {input_csv}...")
+    print(f"Writing to {output_csv}...")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            for batch in iter_batches(read_rows(input_csv), batch_size, stats):
+                writer.writerows(record.to_row() for record in batch)
+        os.replace(tmp_path, output_csv)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    stats.report()
+    stats.report_malformed()
+    print(f"Processed {stats.rows_out} Tesla records.")
+    print("Done.")
+    return stats
+
+def find_chunk_boundaries(path, chunk_bytes):
+    """
+    Splits `path` into byte ranges that each start and end on a CSV row boundary.
+
+    A newline only ends a row when the number of quote characters seen so far is
+    even, so quoted fields spanning several lines are never cut in half ("" escapes
+    keep the parity intact). Returns (fieldnames, [(start, end), ...]).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        fieldnames = next(csv.reader(f), None)
+    if fieldnames is None:
+        return [], []
+
+    ranges = []
+    with open(path, 'rb') as f:
+        offset = 0
+        start = None
+        quotes = 0
+        for line in f:
+            offset += len(line)
+            quotes += line.count(b'"')
+            if quotes % 2:
+                continue
+            if start is None:
+                # End of the header row
+                start = offset
+            elif offset - start >= chunk_bytes:
+                ranges.append((start, offset))
+                start = offset
+        if start is not None and offset > start:
+            ranges.append((start, offset))
+    return fieldnames, ranges
+
+def transform_chunk(task):
+    """
+    Worker entry point: transforms one byte range of the export into a headerless
+    part file. Returns (rows_in, rows_dropped, malformed blob counts).
+    """
+    input_csv, fieldnames, start, end, part_path, batch_size = task
+    with open(input_csv, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    # Same newline handling as open(..., 'r') in read_rows()
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    stats = ProgressCounter(every=0)
+    with open(part_path, 'w', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        for batch in iter_batches(csv.DictReader(text, fieldnames=fieldnames), batch_size, stats):
+            writer.writerows(record.to_row() for record in batch)
+    return stats.rows_in, stats.rows_dropped, stats.malformed
+
+def run_parallel(input_csv=INPUT_CSV, output_csv=OUTPUT_CSV, workers=DEFAULT_WORKERS,
+                 batch_size=DEFAULT_BATCH_SIZE, chunk_mb=DEFAULT_CHUNK_MB,
+                 progress_every=DEFAULT_PROGRESS_EVERY):
+    """
+    Transforms `input_csv` in a process pool and merges the parts in input order.
+    Produces the same bytes as run().
+    """
+    stats = ProgressCounter(every=progress_every)
+    tmp_path = output_csv + '.tmp'
+    part_dir = tempfile.mkdtemp(prefix='transform_parts_', dir=os.path.dirname(os.path.abspath(output_csv)))
+
+    print(f"Reading {input_csv}...")
+    fieldnames, ranges = find_chunk_boundaries(input_csv, int(chunk_mb * 1024 * 1024))
+    print(f"Split into {len(ranges)} chunks across {workers} workers.")
+    print(f"Writing to {output_csv}...")
+    try:
+        tasks = [
+            (input_csv, fieldnames, start, end, os.path.join(part_dir, f"part_{i:05d}.csv"), batch_size)
+            for i, (start, end) in enumerate(ranges)
+        ]
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            csv.writer(out).writerow(HEADERS)
+
+        # Parts are already encoded, so they are appended as raw bytes
+        with open(tmp_path, 'ab') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields in submission order, which keeps the merge ordered
+            for task, (rows_in, rows_dropped, malformed) in zip(tasks, pool.map(transform_chunk, tasks)):
+                reported = stats.rows_in // stats.every if stats.every else 0
+                stats.rows_in += rows_in
+                stats.rows_dropped += rows_dropped
+                stats.malformed.update(malformed)
+                with open(task[4], 'rb') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(task[4])
+                if stats.every and stats.rows_in // stats.every > reported:
+                    stats.report()
+        os.replace(tmp_path, output_csv)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+    stats.report()
+    stats.report_malformed()
+    print(f"Processed {stats.rows_out} Tesla records.")
+    print("Done.")
+    return stats
+
+class RowEncoder:
+    """
+    Encodes single records exactly as run() writes them to a file.
+    """
+
+    def __init__(self):
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf)
+
+    def _take(self):
+        data = self.buf.getvalue().encode('utf-8')
+        self.buf.seek(0)
+        self.buf.truncate()
+        return data
+
+    def header(self):
+        self.writer.writerow(HEADERS)
+        return self._take()
+
+    def encode(self, record):
+        self.writer.writerow(record.to_row())
+        return self._take()
+
+def row_key(row, digest):
+    # auction_id is unique per auction; fall back to the content hash if missing
+    return row.get('auction_id') or digest
+
+def refresh_market_index(output_csv, market=None, changed=()):
+    """
+    Updates `market`, the index of `output_csv` before it was patched, with
+    the `changed` rows (as RowEncoder wrote them), or rebuilds it from
+    `output_csv` if there is none. Saves it next to the output and returns
+    (index, cells updated or None if rebuilt).
+    """
+    if market is None:
+        market = MarketIndex.from_csv(output_csv)
+        touched = None
+    else:
+        rows, removed = [], []
+        for data in changed:
+            row = next(csv.DictReader(io.StringIO(data.decode('utf-8')), fieldnames=HEADERS))
+            try:
+                rows.append(clean_row(row))
+            except ValueError:
+                # The dataset readers skip it now, so its old price goes too
+                if row.get('auction_id'):
+                    removed.append(row['auction_id'])
+        touched = market.update(rows, removed)
+    market.save(output_csv)
+    return market, touched
+
+def run_incremental(input_csv=INPUT_CSV, output_csv=OUTPUT_CSV, progress_every=DEFAULT_PROGRESS_EVERY,
+                    market=False):
+    """
+    Only transforms export rows whose auction_id is new or whose content changed
+    since the last incremental run, and patches `output_csv` in place.
+
+    New auctions are appended; changed ones (status, bid price, ...) overwrite
+    their previous row. Auctions missing from the export are kept, so partial
+    exports are fine. Without a valid index the output is rebuilt once (the
+    same bytes run() produces when auction_ids are unique) and indexed.
+
+    With `market`, the market index next to the output is updated with the
+    same rows (rebuilt if it is missing or stale).
+    """
+    stats = ProgressCounter(every=progress_every)
+    encoder = RowEncoder()
+    index = RowIndex.load(output_csv)
+    rebuild = index is None
+    # Loaded before the output changes, while its stamp still matches
+    market_index = MarketIndex.load(output_csv) if market and not rebuild else None
+    if rebuild:
+        print(f"No valid index for {output_csv}, rebuilding it.")
+        index = RowIndex()
+
+    # Keyed on auction_id so a repeated auction keeps only its last row
+    appended = {}  # key -> (digest, bytes)
+    replaced = {}  # key -> (digest, bytes)
+
+    print(f"Reading {input_csv}...")
+    for row in read_rows(input_csv):
+        stats.rows_in += 1
+        digest = content_hash(row.values())
+        key = row_key(row, digest)
+        known = index.digest(key)
+        if known == digest:
+            stats.rows_unchanged += 1
+            stats.maybe_report()
+            continue
+
+        record = transform_row(row)
+        if record is None:
+            stats.rows_dropped += 1
+        else:
+            set_clusters([record])
+            if known is None:
+                appended[key] = (digest, encoder.encode(record))
+            else:
+                replaced[key] = (digest, encoder.encode(record))
+        stats.maybe_report()
+
+    print(f"Writing to {output_csv}...")
+    if rebuild:
+        with open(output_csv + '.tmp', 'wb') as f:
+            f.write(encoder.header())
+        os.replace(output_csv + '.tmp', output_csv)
+
+    # Splice first: appended rows land after the shifted tail
+    replacements = {}
+    for key, (_, data) in replaced.items():
+        offset, length = index.span(key)
+        replacements[offset] = (length, data)
+    index.shift_after_splice(splice(output_csv, replacements))
+    for key, (digest, data) in replaced.items():
+        offset, _ = index.span(key)
+        index.set(key, digest, offset, len(data))
+
+    spans = append_bytes(output_csv, (data for _, data in appended.values()))
+    for (key, (digest, _)), (offset, length) in zip(appended.items(), spans):
+        index.set(key, digest, offset, length)
+    index.save(output_csv)
+    if market:
+        changed = [data for _, data in replaced.values()] + [data for _, data in appended.values()]
+        stats.market = refresh_market_index(output_csv, market_index, changed)
+
+    stats.malformed.update(BLOBS.take_counts()[1])
+    stats.report()
+    stats.report_malformed()
+    print(f"{len(appended)} new, {len(replaced)} changed, {stats.rows_unchanged} unchanged Tesla records.")
     print("Done.")
+    return stats
+
+def print_snapshot(manifest, store_dir, previous=None):
+    if manifest['version'] == previous:
+        print(f"Dataset matches snapshot v{previous} in {store_dir}; nothing published.")
+        return
+    counts = manifest['counts']
+    mode = "delta" if manifest['delta'] is not None else "full reload"
+    print(f"Snapshot v{manifest['version']} in {store_dir}: {manifest['rows']:,} rows, "
+          f"{counts['added']:,} added, {counts['changed']:,} changed, {counts['removed']:,} removed ({mode}).")
+
+def print_market_index(market, output_csv):
+    index, touched = market
+    action = "rebuilt" if touched is None else f"{len(touched):,} segment-weeks updated"
+    print(f"Market index {output_csv}{MARKET_SUFFIX}: {len(index.cells):,} segment-weeks, {action}.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transform an auction export into the Tesla dataset CSV.")
+    parser.add_argument('--input', default=INPUT_CSV, help=f"auction export CSV (default: {INPUT_CSV})")
+    parser.add_argument('--output', default=OUTPUT_CSV, help=f"dataset CSV to write (default: {OUTPUT_CSV})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"rows buffered per write (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--progress-every', type=int, default=DEFAULT_PROGRESS_EVERY,
+                        help=f"print throughput every N input rows, 0 to disable (default: {DEFAULT_PROGRESS_EVERY})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"transform in N processes, merging output in input order (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB,
+                        help=f"target input bytes per worker chunk in MB (default: {DEFAULT_CHUNK_MB})")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only transform new/changed auctions and patch the output in place")
+    parser.add_argument('--market-index', action='store_true',
+                        help=f"maintain the weekly market index next to the output (<output>{MARKET_SUFFIX}); "
+                             "always done once that file exists")
+    parser.add_argument('--snapshots', metavar='DIR',
+                        help="also publish the output as a new dataset version in this snapshot store")
+    parser.add_argument('--report', metavar='PATH',
+                        help="append this run's stage metrics to a JSON run report (or set TESLA_RUN_REPORT)")
+    args = parser.parse_args(argv)
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental and --workers cannot be combined")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_mb <= 0:
+        parser.error("--chunk-mb must be positive")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    market = args.market_index or os.path.exists(args.output + MARKET_SUFFIX)
+    with stage('transform', args.report) as s:
+        s.read_file(args.input)
+        if args.incremental:
+            s.extra['mode'] = 'incremental'
+            stats = run_incremental(args.input, args.output, progress_every=args.progress_every, market=market)
+        elif args.workers > 1:
+            s.extra['mode'] = f"parallel ({args.workers} workers)"
+            stats = run_parallel(args.input, args.output, workers=args.workers,
+                                 batch_size=args.batch_size, chunk_mb=args.chunk_mb,
+                                 progress_every=args.progress_every)
+        else:
+            s.extra['mode'] = 'serial'
+            stats = run(args.input, args.output, batch_size=args.batch_size, progress_every=args.progress_every)
+        s.rows_in = stats.rows_in
+        s.rows_out = stats.rows_out - stats.rows_unchanged
+        s.skip('make_model', stats.rows_dropped)
+        if stats.rows_unchanged:
+            s.skip('unchanged', stats.rows_unchanged)
+        s.extra['malformed_blobs'] = dict(stats.malformed)
+        s.wrote_file(args.output)
+        if market:
+            if stats.market is None:
+                stats.market = refresh_market_index(args.output)
+            s.extra['market_index'] = len(stats.market[0].cells)
+            print_market_index(stats.market, args.output)
+        if args.snapshots:
+            store = SnapshotStore(args.snapshots)
+            previous = store.current()
+            manifest = store.publish(args.output)
+            s.extra['snapshot'] = manifest['version']
+            print_snapshot(manifest, args.snapshots, previous)
 
 if __name__ == "__main__":
     main()
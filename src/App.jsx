@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useMemo } from "react";
 import { POWERTRAIN_OPTIONS, predictPrice } from "./utils/valuation";
-import teslaData from "./data/tesla_data.json";
+import { loadManifest, loadSegment } from "./utils/shards";
 import {
     Car,
     Calendar,
@@ -53,6 +53,22 @@ function App() {
         }
     }, [availablePowertrains, powertrainId]);
 
+    // Data: only the shard of the selected segment is fetched
+    const [database, setDatabase] = useState({ rows: [], total: null });
+    useEffect(() => {
+        let cancelled = false;
+        Promise.all([loadManifest(), loadSegment({ model, powertrainId, isHighland, isNetPrice })])
+            .then(([manifest, rows]) => ({ rows, total: manifest.rows }))
+            // No shards published: fall back to the full JSON (a separate, lazily loaded chunk)
+            .catch(() => import("./data/tesla_data.json").then(({ default: rows }) => ({ rows, total: rows.length })))
+            .then((data) => {
+                if (!cancelled) setDatabase(data);
+            });
+        return () => {
+            cancelled = true;
+        };
+    }, [model, powertrainId, isHighland, isNetPrice]);
+
     // Calculation
     const prediction = useMemo(() => {
         return predictPrice(
@@ -69,9 +85,10 @@ function App() {
                 tireOption,
                 isHighland,
             },
-            teslaData
+            database.rows
         );
     }, [
+        database,
         model,
         powertrainId,
         registrationDate,
@@ -107,7 +124,7 @@ function App() {
                         </p>
                     </div>
                     <div className="text-xs text-gray-500 text-right">
-                        Database: {teslaData.length} vehicles<br />
+                        Database: {database.total ?? "…"} vehicles<br />
                         Status: Live
                     </div>
                 </header>
@@ -0,0 +1,61 @@
+// Per-segment dataset shards written by every `convert_csv_to_json.py` run
+// over the default dataset (public/tesla_shards/): a manifest plus one gzip'd NDJSON file per
+// (model, powertrain cluster, Highland, taxation) segment. predictPrice only
+// compares cars of one segment, so only that shard is fetched and parsed.
+
+const SHARDS_BASE = `${import.meta.env.BASE_URL}tesla_shards`;
+
+let manifestPromise = null;
+const shardCache = new Map();
+
+export function shardKey(model, powertrainId, isHighland, isNetPrice) {
+    return `${model}|${powertrainId}|${isHighland ? 1 : 0}|${isNetPrice ? 1 : 0}`;
+}
+
+export function loadManifest(base = SHARDS_BASE) {
+    if (!manifestPromise) {
+        manifestPromise = fetch(`${base}/manifest.json`, { cache: "no-cache" })
+            .then((res) => {
+                if (!res.ok) throw new Error(`No dataset shards at ${base} (HTTP ${res.status})`);
+                return res.json();
+            })
+            .then((manifest) => {
+                manifest.byKey = new Map(manifest.shards.map((shard) => [
+                    shardKey(shard.model, shard.powertrainId, shard.isHighland, shard.isNetPrice),
+                    shard,
+                ]));
+                return manifest;
+            });
+        // Retry on the next call instead of caching the failure
+        manifestPromise.catch(() => { manifestPromise = null; });
+    }
+    return manifestPromise;
+}
+
+async function fetchShard(base, shard) {
+    // The content hash versions the URL, so a cached shard is never stale
+    const res = await fetch(`${base}/${shard.file}?v=${shard.sha256.slice(0, 16)}`);
+    if (!res.ok) throw new Error(`Could not load ${shard.file} (HTTP ${res.status})`);
+    const bytes = new Uint8Array(await res.arrayBuffer());
+    // Servers that send .gz with Content-Encoding: gzip hand over the text already inflated
+    const gzipped = bytes[0] === 0x1f && bytes[1] === 0x8b;
+    const text = gzipped
+        ? await new Response(new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"))).text()
+        : new TextDecoder().decode(bytes);
+    return text.split("\n").filter((line) => line).map((line) => JSON.parse(line));
+}
+
+// The rows predictPrice can match for these inputs ([] for an empty segment)
+export async function loadSegment({ model, powertrainId, isHighland, isNetPrice }, base = SHARDS_BASE) {
+    const manifest = await loadManifest(base);
+    const shard = manifest.byKey.get(shardKey(model, powertrainId, isHighland, isNetPrice));
+    if (!shard) return [];
+    const cacheKey = `${shard.file}@${shard.sha256}`;
+    let rows = shardCache.get(cacheKey);
+    if (!rows) {
+        rows = fetchShard(base, shard);
+        shardCache.set(cacheKey, rows);
+        rows.catch(() => shardCache.delete(cacheKey));
+    }
+    return rows;
+}
@@ -19,7 +19,7 @@ const TIRE_TYPES = ["Summer", "Winter", "All-Season"];
 
 export function getPowertrainCluster(car) {
     // Simple clustering logic based on kW and Battery
-    // This is a simplified version of the logic described in context
+    // Keep in sync with CLUSTER_RULES in tesla_valuation/powertrain.py
     const { kw, battery_capacity: batt } = car;
 
     if (!kw || !batt) return null;
@@ -82,6 +82,20 @@ const VALUATION_CONFIG = {
     }
 };
 
+// Parsed dates and age at sale of each dataset car, which no query changes
+const carDateCache = new WeakMap();
+
+function getCarDates(car) {
+    let dates = carDateCache.get(car);
+    if (!dates) {
+        const regDate = parseISO(car.first_registration);
+        const auctionDate = parseISO(car.auction_end_date);
+        dates = { regDate, auctionDate, ageComp: Math.abs(differenceInMonths(auctionDate, regDate)) };
+        carDateCache.set(car, dates);
+    }
+    return dates;
+}
+
 export function predictPrice(inputs, database) {
     const {
         model,
@@ -97,6 +111,8 @@ export function predictPrice(inputs, database) {
 
     const targetDate = new Date(registrationDate);
     const now = new Date(valuationDate);
+    // Age of the target car today (same for every comparable)
+    const ageTarget = Math.abs(differenceInMonths(now, targetDate));
 
     // Select Model Config
     const modelConfig = (model === "Model 3") ? VALUATION_CONFIG.model3 : VALUATION_CONFIG.modelY;
@@ -112,9 +128,11 @@ export function predictPrice(inputs, database) {
         const carKw = car.powe_kw;
         const carBatt = car.battery_netto;
 
-        // Quick cluster check inline or update helper
-        // update helper call:
-        const cluster = getPowertrainCluster({ ...car, kw: carKw, battery_capacity: carBatt });
+        // The data pipeline stores each car's cluster (tesla_valuation/powertrain.py);
+        // data files from before that column are clustered here
+        const cluster = car.powertrain_cluster !== undefined
+            ? car.powertrain_cluster
+            : getPowertrainCluster({ ...car, kw: carKw, battery_capacity: carBatt });
         if (cluster !== powertrainId) return false;
 
         // Highland Logic (Facelift 2024+)
@@ -146,8 +164,7 @@ export function predictPrice(inputs, database) {
         let score = 0;
         const penalties = {};
 
-        const carRegDate = parseISO(car.first_registration);
-        const auctionDate = parseISO(car.auction_end_date);
+        const { auctionDate, ageComp } = getCarDates(car);
 
         // Recency (Market Trend)
         const daysSinceAuction = Math.abs(differenceInDays(now, auctionDate));
@@ -156,8 +173,6 @@ export function predictPrice(inputs, database) {
 
         // Age (Relative Age) with Quadratic Term
         // We compare the age of the target car today vs the age of the comparable at its sale.
-        const ageTarget = Math.abs(differenceInMonths(now, targetDate));
-        const ageComp = Math.abs(differenceInMonths(auctionDate, carRegDate));
         const monthsDiff = Math.abs(ageTarget - ageComp);
 
         let agePenalty = monthsDiff * modelConfig.agePenalty;
@@ -0,0 +1,6 @@
+"""
+Python side of the Tesla valuation tooling.
+
+Shared helpers for the data scripts (`scripts/transform_new_csv.py`,
+`convert_csv_to_json.py`, ...). Scripts are run from the repository root.
+"""
@@ -0,0 +1,182 @@
+"""
+Single-pass group-by aggregation over dataset rows.
+
+A report is registered once as (key, filter, value) functions; Aggregator
+then feeds every row, parsed once, to all reports in a single scan. Each
+group keeps a fixed-size Stats accumulator (count, mean, min, max and any
+requested quantiles), so memory grows with the number of groups, not rows.
+"""
+import csv
+import math
+from bisect import insort
+
+# Values kept exactly before switching to the five-marker estimate
+EXACT_LIMIT = 64
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with five markers (the P-squared algorithm of
+    Jain & Chlamtac). The first EXACT_LIMIT values are kept and give exact
+    (linearly interpolated) quantiles; the markers are then seeded from them.
+    """
+    __slots__ = ('p', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"quantile must be in (0, 1), got {p}")
+        self.p = p
+        self.heights = []
+        self.positions = None
+        self.desired = None
+        self.increments = (0, p / 2, p, (1 + p) / 2, 1)
+
+    def _seed_markers(self):
+        sample = self.heights
+        last = len(sample) - 1
+        self.desired = [last * inc for inc in self.increments]
+        n = [round(d) for d in self.desired]
+        for i in (1, 2, 3):
+            n[i] = max(n[i], n[i - 1] + 1)
+        for i in (3, 2, 1):
+            n[i] = min(n[i], n[i + 1] - 1)
+        self.positions = n
+        self.heights = [sample[i] for i in n]
+
+    def add(self, x):
+        q = self.heights
+        if self.positions is None:
+            insort(q, x)
+            if len(q) > EXACT_LIMIT:
+                self._seed_markers()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Piecewise-parabolic prediction, linear if it leaves the bracket
+                h = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return None
+        if self.positions is None:
+            pos = self.p * (len(q) - 1)
+            lo = math.floor(pos)
+            hi = min(lo + 1, len(q) - 1)
+            return q[lo] + (q[hi] - q[lo]) * (pos - lo)
+        return q[2]
+
+class Stats:
+    """
+    count / mean / min / max of a stream of numbers, plus optional quantiles.
+    """
+    __slots__ = ('count', 'total', 'min', 'max', 'quantiles')
+
+    def __init__(self, quantiles=()):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x):
+        self.count += 1
+        self.total += x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, p):
+        return self.quantiles[p].value()
+
+class Report:
+    """
+    One registered group-by: rows passing `where` are grouped by `key` and
+    `value` is accumulated per group.
+    """
+
+    def __init__(self, name, key, value, where=None, quantiles=()):
+        self.name = name
+        self.key = key
+        self.value = value
+        self.where = where
+        self.quantiles = tuple(quantiles)
+        self.groups = {}
+
+    def add(self, record):
+        if self.where is not None and not self.where(record):
+            return
+        k = self.key(record)
+        stats = self.groups.get(k)
+        if stats is None:
+            stats = self.groups[k] = Stats(self.quantiles)
+        stats.add(self.value(record))
+
+    def top(self, n=None):
+        """
+        Groups by descending count, ties in first-seen order.
+        """
+        ranked = sorted(self.groups.items(), key=lambda item: item[1].count, reverse=True)
+        return ranked if n is None else ranked[:n]
+
+class Aggregator:
+    """
+    Runs every registered Report over a row stream in one pass.
+    """
+
+    def __init__(self, parse=None):
+        self.parse = parse
+        self.reports = {}
+        self.rows = 0
+
+    def register(self, name, key, value, where=None, quantiles=()):
+        report = self.reports[name] = Report(name, key, value, where, quantiles)
+        return report
+
+    def __getitem__(self, name):
+        return self.reports[name]
+
+    def consume(self, rows):
+        reports = list(self.reports.values())
+        parse = self.parse
+        for row in rows:
+            record = parse(row) if parse else row
+            self.rows += 1
+            for report in reports:
+                report.add(record)
+        return self
+
+    def consume_csv(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.consume(csv.DictReader(f))
@@ -0,0 +1,276 @@
+"""
+Vectorized batch pricing with NumPy.
+
+ValuationEngine.predict scores comparables one dict at a time. For pricing
+thousands of cars per call (lease returns, backtests), BatchPricer computes
+the whole target x comparable score matrix of each segment with
+broadcasting, selects the neighbourCount*3 pool with argpartition, applies
+the 25% median consensus filter and the 1/(score+1)^weightExponent weights,
+all without a Python loop over comparables.
+
+Results match ValuationEngine.predict (and so predictPrice): ties are broken
+by dataset order, as the stable JS sort does.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from .config import model_config
+from .dates import difference_in_months, parse_iso, utc_now
+from .engine import OUTLIER_THRESHOLD, segment_key
+
+TIRE_CODES = {"8_tires": 0, "4_summer": 1, "4_winter": 2, "4_all_season": 3}
+MS_PER_DAY = 86400000
+
+# Upper bound on score-matrix cells per block, to keep memory flat for big batches
+DEFAULT_BLOCK_CELLS = 4_000_000
+
+def _epoch_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+class SegmentArrays:
+    """
+    Column arrays of one segment's comparables, in dataset order.
+    """
+
+    def __init__(self, comps):
+        self.index = np.array([c.index for c in comps], dtype=np.int64)
+        self.auction_ms = np.array([_epoch_ms(c.auction_date) for c in comps], dtype=np.int64)
+        self.age_at_sale = np.array([c.age_at_sale for c in comps], dtype=np.float64)
+        self.mileage = np.array([c.mileage for c in comps], dtype=np.float64)
+        self.accident_free = np.array([c.accident_free for c in comps], dtype=bool)
+        self.has_ahk = np.array([c.has_ahk for c in comps], dtype=bool)
+        self.tire = np.array([TIRE_CODES[c.tire_option] for c in comps], dtype=np.int8)
+        self.accepted = np.array([c.accepted for c in comps], dtype=bool)
+        self.price = np.array([c.price for c in comps], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.index)
+
+class TargetTable:
+    """
+    predictPrice inputs as column arrays. Built from a list of input dicts or
+    from a mapping of equal-length columns keyed by the same input names.
+    """
+
+    def __init__(self, targets):
+        if isinstance(targets, dict):
+            n = len(targets['model'])
+            targets = [{k: v[i] for k, v in targets.items()} for i in range(n)]
+        n = len(targets)
+        self.model = [t['model'] for t in targets]
+        self.segment = []
+        self.now_ms = np.empty(n, dtype=np.int64)
+        self.age_target = np.empty(n, dtype=np.float64)
+        self.mileage = np.empty(n, dtype=np.float64)
+        self.accident_free = np.empty(n, dtype=bool)
+        self.has_ahk = np.empty(n, dtype=bool)
+        self.tire = np.empty(n, dtype=np.int8)
+
+        # One pass per target (not per comparable) to normalize dates
+        default_now = utc_now()
+        for i, t in enumerate(targets):
+            now = parse_iso(t.get('valuationDate')) or default_now
+            self.segment.append(segment_key(t['model'], t['powertrainId'], t.get('isHighland'), t.get('isNetPrice')))
+            self.now_ms[i] = _epoch_ms(now)
+            self.age_target[i] = abs(difference_in_months(now, parse_iso(t['registrationDate'])))
+            self.mileage[i] = t['mileage']
+            self.accident_free[i] = bool(t.get('isAccidentFree'))
+            self.has_ahk[i] = bool(t.get('hasAhk'))
+            # Unknown options never equal a comparable's, like the JS string compare
+            self.tire[i] = TIRE_CODES.get(t.get('tireOption'), -1)
+
+    def __len__(self):
+        return len(self.model)
+
+class BatchResult:
+    """
+    prices[i]: predicted price of target i (0 when its segment is empty).
+    neighbors[i]: engine.comparables indices of the neighbours used, best first, -1 padded.
+    weights[i]: matching weights, 0 where padded.
+    """
+
+    def __init__(self, prices, neighbors, weights):
+        self.prices = prices
+        self.neighbors = neighbors
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.prices)
+
+class BatchPricer:
+    """
+    Batch front end over a ValuationEngine's segment index (or a
+    PricingImage, see tesla_valuation/pricing_image.py).
+    """
+
+    def __init__(self, engine, config=None, block_cells=DEFAULT_BLOCK_CELLS):
+        self.engine = engine
+        self.config = config if config is not None else engine.config
+        self.block_cells = block_cells
+        self._arrays = {}
+
+    def arrays(self, key):
+        arrays = self._arrays.get(key)
+        if arrays is None:
+            # A PricingImage maps its arrays; an engine's are built from its comparables
+            mapped = getattr(self.engine, 'segment_arrays', None)
+            arrays = mapped(key) if mapped else SegmentArrays(self.engine.segments.get(key, []))
+            self._arrays[key] = arrays
+        return arrays
+
+    def rebased(self, engine, touched):
+        """
+        A pricer for `engine`, derived from this one's engine by
+        ValuationEngine.with_changes(): the column arrays of segments outside
+        `touched` are reused (None: nothing is).
+        """
+        pricer = BatchPricer(engine, self.config if engine.config is self.engine.config else None,
+                             self.block_cells)
+        if touched is not None:
+            pricer._arrays = {key: arrays for key, arrays in self._arrays.items() if key not in touched}
+        return pricer
+
+    def price(self, targets):
+        """
+        Prices a batch of predictPrice inputs. Returns a BatchResult.
+        """
+        table = targets if isinstance(targets, TargetTable) else TargetTable(targets)
+        k = self.config['shared']['neighborCount']
+        n = len(table)
+        prices = np.zeros(n, dtype=np.float64)
+        neighbors = np.full((n, k), -1, dtype=np.int64)
+        weights = np.zeros((n, k), dtype=np.float64)
+
+        groups = defaultdict(list)
+        for i, key in enumerate(table.segment):
+            groups[key].append(i)
+
+        for key, rows in groups.items():
+            comps = self.arrays(key)
+            if len(comps) == 0:
+                continue
+            rows = np.array(rows, dtype=np.int64)
+            block = max(1, self.block_cells // len(comps))
+            for start in range(0, len(rows), block):
+                sel = rows[start:start + block]
+                p, nb, w = self._price_block(table, sel, comps, key[0])
+                prices[sel] = p
+                neighbors[sel, :nb.shape[1]] = nb
+                weights[sel, :w.shape[1]] = w
+        return BatchResult(prices, neighbors, weights)
+
+    def score_matrix(self, table, sel, comps, model):
+        """
+        (targets x comparables) scores and adjusted prices, summed in predictPrice's order.
+        """
+        shared = self.config['shared']
+        cfg = model_config(self.config, model)
+
+        days = np.abs(table.now_ms[sel, None] - comps.auction_ms[None, :]) // MS_PER_DAY
+        score = days * shared['recencyPenalty']
+
+        months = np.abs(table.age_target[sel, None] - comps.age_at_sale[None, :])
+        score = score + (months * cfg['agePenalty'] + (months * months) * cfg['ageQuadratic'])
+
+        km = table.mileage[sel, None] - comps.mileage[None, :]
+        score = score + np.abs(km) * cfg['mileageDistancePenalty']
+
+        score = score + (table.accident_free[sel, None] != comps.accident_free[None, :]) * shared['accidentPenalty']
+
+        want8 = (table.tire[sel] == TIRE_CODES["8_tires"])[:, None]
+        has8 = (comps.tire == TIRE_CODES["8_tires"])[None, :]
+        type_mismatch = table.tire[sel, None] != comps.tire[None, :]
+        tire = np.where(want8, np.where(has8, 0, shared['tireUserWants8Penalty']),
+                        np.where(has8, shared['tireUserWants4Penalty'],
+                                 np.where(type_mismatch, shared['tireTypePenalty'], 0)))
+        score = score + tire
+        score = score + (~comps.accepted)[None, :] * shared['statusPenalty']
+
+        hitch = (table.has_ahk[sel, None] & ~comps.has_ahk[None, :]) * shared['hitchValue'] \
+            - (~table.has_ahk[sel, None] & comps.has_ahk[None, :]) * shared['hitchValue']
+        mileage_adj = -km * cfg['mileageDepreciation']
+        adjustment = hitch + np.where(np.abs(mileage_adj) > 50, mileage_adj, 0)
+        adjusted = comps.price[None, :] + adjustment
+        return score, adjusted
+
+    def _price_block(self, table, sel, comps, model):
+        shared = self.config['shared']
+        score, adjusted = self.score_matrix(table, sel, comps, model)
+        prices, cols, weights = consensus_price(score, adjusted, shared['neighborCount'], shared['weightExponent'])
+        return prices, np.where(cols >= 0, comps.index[cols], -1), weights
+
+def consensus_price(score, adjusted, neighbor_count, weight_exponent):
+    """
+    predictPrice step 3 over score/adjusted-price matrices (targets x comparables).
+
+    Takes the neighbor_count*3 best scores per row, drops candidates more than
+    25% from the pool's median adjusted price (all of them kept if every one
+    is an outlier), and weights the first neighbor_count survivors by
+    1/(score+1)^weight_exponent. Columns with an infinite score are never used.
+    Returns (prices, neighbour columns -1 padded, weights).
+    """
+    k = neighbor_count
+    n_targets, n_comps = score.shape
+    # Rows can have fewer finite scores than columns (excluded comparables)
+    available = np.isfinite(score).sum(axis=1)
+    pool = min(k * 3, n_comps)
+
+    order = top_k_stable(score, pool)
+    rows = np.arange(n_targets)[:, None]
+    pool_scores = score[rows, order]
+    pool_prices = adjusted[rows, order]
+    in_pool = np.arange(pool)[None, :] < np.minimum(available, pool)[:, None]
+    pool_len = in_pool.sum(axis=1)
+
+    # Median of each row's pool: excluded entries sort to the end as +inf
+    masked = np.where(in_pool, pool_prices, np.inf)
+    median = np.take_along_axis(np.sort(masked, axis=1), (pool_len // 2)[:, None].clip(max=max(pool - 1, 0)), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = np.abs(pool_prices - median) / median
+    # NaN (0/0) is never an outlier, as in JS
+    valid = in_pool & ~(deviation > OUTLIER_THRESHOLD)
+    none_valid = ~valid.any(axis=1)
+    valid[none_valid] = in_pool[none_valid]
+    # Pools under 3 cars skip the consensus filter
+    small = pool_len < 3
+    valid[small] = in_pool[small]
+    # First k valid candidates in score order
+    keep = valid & (np.cumsum(valid, axis=1) <= k)
+
+    width = min(k, pool)
+    # Stable argsort on ~keep moves kept columns to the front, order preserved
+    pick = np.argsort(~keep, axis=1, kind='stable')[:, :width]
+    picked = np.take_along_axis(keep, pick, axis=1)
+    n_scores = np.take_along_axis(pool_scores, pick, axis=1)
+    n_prices = np.take_along_axis(pool_prices, pick, axis=1)
+    n_cols = np.where(picked, np.take_along_axis(order, pick, axis=1), -1)
+
+    with np.errstate(invalid='ignore'):
+        w = np.where(picked, 1 / (n_scores + 1) ** weight_exponent, 0.0)
+        total = w.sum(axis=1)
+        prices = np.where(total > 0, (np.where(picked, n_prices, 0.0) * w).sum(axis=1) / np.where(total > 0, total, 1), 0.0)
+    return prices, n_cols, w
+
+def top_k_stable(score, k):
+    """
+    Column indices of the k smallest scores per row, ordered by (score, column),
+    i.e. the first k of a stable sort, using argpartition instead of a full sort.
+    """
+    n_rows, n_cols = score.shape
+    if k >= n_cols:
+        return np.argsort(score, axis=1, kind='stable')
+
+    part = np.argpartition(score, k - 1, axis=1)[:, :k]
+    kth = np.take_along_axis(score, part, axis=1).max(axis=1, keepdims=True)
+
+    # argpartition may pick any of several columns tied at the k-th score;
+    # a stable sort keeps the lowest-indexed ones, so rebuild the selection.
+    below = score < kth
+    at = score == kth
+    need = k - below.sum(axis=1, keepdims=True)
+    chosen = below | (at & (np.cumsum(at, axis=1) <= need))
+    cols = np.nonzero(chosen)[1].reshape(n_rows, k)
+
+    ranks = np.argsort(np.take_along_axis(score, cols, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(cols, ranks, axis=1)
@@ -0,0 +1,253 @@
+"""
+Columnar binary export of the dataset.
+
+The JSON the app bundles holds every row as a 68-field dict, so anything that
+only needs the valuation columns still parses all of it. This format splits
+the same rows (after convert_csv_to_json.py's cleaning) into:
+
+    <dir>/manifest.json   row count and per-column layout
+    <dir>/columns.bin     fixed-width little-endian arrays, 8-byte aligned
+    <dir>/text.jsonl      every other field, one JSON object per row
+
+Numeric columns are typed arrays, dates are int32 days since 1970-01-01
+plus a <name>_month column of months since January 1970 (both DATE_NA
+when missing, see tesla_valuation.dates), flags are uint8 0/1 and
+categoricals are small integer codes into the manifest's category list. columns.bin is mmap'd and
+each column is a zero-copy memoryview; `numpy.asarray(column)` wraps one
+without copying.
+"""
+import array
+import json
+import mmap
+import os
+import sys
+
+from .dates import DATE_FIELDS, DATE_NA, DateColumns
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+COLUMNS_BIN = 'columns.bin'
+TEXT_JSONL = 'text.jsonl'
+
+# name -> (kind, typecode)
+NUMERIC_COLUMNS = {
+    'mileage': ('int', 'i'),
+    'powe_kw': ('int', 'i'),
+    'battery_netto': ('int', 'i'),
+    'highest_bid_price': ('float', 'd'),
+    'tires_total_sets': ('int', 'i'),
+}
+DATE_COLUMNS = list(DATE_FIELDS)
+FLAG_COLUMNS = {
+    'is_highland': 'TRUE',
+    'accident_free_cardentity': 't',
+    'features_trailer_hitch': 't',
+    'trailer_hitch_seller': 't',
+    'tires_summer': '1',
+    'tires_winter': '1',
+    'tires_all_season': '1',
+}
+CATEGORY_COLUMNS = ['model', 'taxation', 'status', 'drive_type', 'powertrain_cluster']
+
+if sys.byteorder != 'little':
+    raise ImportError("tesla_valuation.columnar assumes a little-endian host")
+
+def _int_value(value):
+    if value in (None, ''):
+        return 0
+    return int(float(value))
+
+def _code_typecode(n):
+    if n <= 0xFF:
+        return 'B'
+    if n <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+def write_columnar(rows, out_dir):
+    """
+    Writes cleaned dataset rows (dicts as produced by convert_csv_to_json.clean_row)
+    to `out_dir`. Returns the number of rows written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    numeric = {name: array.array(tc) for name, (_, tc) in NUMERIC_COLUMNS.items()}
+    dates = DateColumns(DATE_COLUMNS)
+    flags = {name: array.array('B') for name in FLAG_COLUMNS}
+    codes = {name: [] for name in CATEGORY_COLUMNS}
+    categories = {name: {} for name in CATEGORY_COLUMNS}
+    text_offsets = array.array('Q')
+    structured = set(NUMERIC_COLUMNS) | set(DATE_COLUMNS) | set(FLAG_COLUMNS) | set(CATEGORY_COLUMNS)
+
+    n = 0
+    text_path = os.path.join(out_dir, TEXT_JSONL)
+    with open(text_path + '.tmp', 'wb') as text:
+        for row in rows:
+            for name, (kind, _) in NUMERIC_COLUMNS.items():
+                value = row.get(name)
+                numeric[name].append(float(value or 0) if kind == 'float' else _int_value(value))
+            dates.add(row)
+            for name, truthy in FLAG_COLUMNS.items():
+                flags[name].append(1 if row.get(name) == truthy else 0)
+            for name in CATEGORY_COLUMNS:
+                value = row.get(name) or ''
+                lookup = categories[name]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                codes[name].append(code)
+
+            text_offsets.append(text.tell())
+            rest = {k: v for k, v in row.items() if k not in structured}
+            text.write(json.dumps(rest).encode('utf-8'))
+            text.write(b'\n')
+            n += 1
+        text_offsets.append(text.tell())
+
+    layout = {}
+    arrays = []
+    for name, (kind, tc) in NUMERIC_COLUMNS.items():
+        layout[name] = {'kind': kind, 'typecode': tc}
+        arrays.append((name, numeric[name]))
+    for name in DATE_COLUMNS:
+        layout[name] = {'kind': 'date', 'typecode': 'i', 'na': DATE_NA}
+        arrays.append((name, dates.days[name]))
+        layout[name + '_month'] = {'kind': 'month', 'typecode': 'i', 'na': DATE_NA}
+        arrays.append((name + '_month', dates.months[name]))
+    for name in FLAG_COLUMNS:
+        layout[name] = {'kind': 'flag', 'typecode': 'B'}
+        arrays.append((name, flags[name]))
+    for name in CATEGORY_COLUMNS:
+        tc = _code_typecode(len(categories[name]))
+        layout[name] = {'kind': 'category', 'typecode': tc, 'categories': list(categories[name])}
+        arrays.append((name, array.array(tc, codes[name])))
+    layout['_text_offsets'] = {'kind': 'offsets', 'typecode': 'Q'}
+    arrays.append(('_text_offsets', text_offsets))
+
+    bin_path = os.path.join(out_dir, COLUMNS_BIN)
+    with open(bin_path + '.tmp', 'wb') as f:
+        for name, values in arrays:
+            pad = -f.tell() % 8
+            f.write(b'\0' * pad)
+            layout[name]['offset'] = f.tell()
+            layout[name]['length'] = len(values)
+            values.tofile(f)
+
+    manifest = {'version': FORMAT_VERSION, 'rows': n, 'columns': layout}
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Manifest last, so readers never see it pointing at half-written files
+    os.replace(bin_path + '.tmp', bin_path)
+    os.replace(text_path + '.tmp', text_path)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return n
+
+class Categorical:
+    """
+    Dictionary-encoded column: `codes[i]` indexes into `categories`.
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.categories[self.codes[i]]
+
+    def code_of(self, value):
+        """
+        Code for `value`, or -1 if it never occurs (so comparisons simply fail).
+        """
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return -1
+
+class ColumnarDataset:
+    """
+    Read-only view over an exported directory. Columns are decoded lazily.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version: {manifest.get('version')}")
+        self.rows = manifest['rows']
+        self.layout = manifest['columns']
+        self._file = open(os.path.join(path, COLUMNS_BIN), 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._text = None
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def column_names(self):
+        return [name for name in self.layout if not name.startswith('_')]
+
+    def _raw(self, name):
+        spec = self.layout[name]
+        if self._mmap is None or spec['length'] == 0:
+            return memoryview(array.array(spec['typecode']))
+        itemsize = array.array(spec['typecode']).itemsize
+        start = spec['offset']
+        view = memoryview(self._mmap)[start:start + spec['length'] * itemsize]
+        return view.cast(spec['typecode'])
+
+    def column(self, name):
+        """
+        Zero-copy memoryview for numeric/date/flag columns, Categorical for categoricals.
+        """
+        if name not in self.layout or name.startswith('_'):
+            raise KeyError(f"Unknown column: {name}")
+        spec = self.layout[name]
+        values = self._raw(name)
+        if spec['kind'] == 'category':
+            return Categorical(values, spec['categories'])
+        return values
+
+    def columns(self, names):
+        return {name: self.column(name) for name in names}
+
+    def text(self, i):
+        """
+        The free-text/remaining fields of row `i` as a dict.
+        """
+        if self._text is None:
+            self._text = open(os.path.join(self.path, TEXT_JSONL), 'rb')
+        offsets = self._raw('_text_offsets')
+        self._text.seek(offsets[i])
+        return json.loads(self._text.read(offsets[i + 1] - offsets[i]))
+
+    def close(self):
+        # Views handed out keep the mmap alive; only close it when nothing refers to it
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        self._file.close()
+        if self._text is not None:
+            self._text.close()
+
+def load_columns(path, columns):
+    """
+    Loads only `columns` from the export at `path`.
+    Returns {name: memoryview | Categorical}. The file is closed before
+    returning; the views own the mapping, which goes when the last is dropped.
+    """
+    with ColumnarDataset(path) as dataset:
+        return dataset.columns(columns)
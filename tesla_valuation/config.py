@@ -0,0 +1,44 @@
+"""
+VALUATION_CONFIG, read from src/utils/valuation.js.
+
+The JS file stays the single source of truth for the tuned parameters; this
+module extracts the object literal so Python tools score with the same
+numbers the app does.
+"""
+import copy
+import json
+import os
+import re
+
+VALUATION_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'utils', 'valuation.js')
+
+_BLOCK = re.compile(r'const VALUATION_CONFIG = (\{.*?\n\});', re.S)
+_COMMENT = re.compile(r'//[^\n]*')
+_KEY = re.compile(r'(\w+)\s*:')
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+_cache = {}
+
+def parse_config_literal(source):
+    """
+    Parses the VALUATION_CONFIG object literal out of JS source text.
+    """
+    match = _BLOCK.search(source)
+    if not match:
+        raise ValueError("VALUATION_CONFIG not found")
+    text = _COMMENT.sub('', match.group(1))
+    text = _KEY.sub(r'"\1":', text)
+    text = _TRAILING_COMMA.sub(r'\1', text)
+    return json.loads(text)
+
+def load_valuation_config(path=VALUATION_JS):
+    """
+    Returns a fresh copy of {'shared': {...}, 'model3': {...}, 'modelY': {...}}.
+    """
+    if path not in _cache:
+        with open(path, 'r', encoding='utf-8') as f:
+            _cache[path] = parse_config_literal(f.read())
+    return copy.deepcopy(_cache[path])
+
+def model_config(config, model):
+    return config['model3'] if model == "Model 3" else config['modelY']
@@ -0,0 +1,35 @@
+"""
+Loading the dataset CSV written by scripts/transform_new_csv.py.
+
+clean_row() is the numeric cleaning convert_csv_to_json.py applies before
+writing the app's JSON, so Python consumers see the same rows the app does.
+"""
+import csv
+
+from .powertrain import CLUSTER_COLUMN, row_cluster
+
+DATASET_CSV = 'tesla_data_with_highland_flag.csv'
+DATASET_JSON = 'src/data/tesla_data.json'
+
+def clean_row(row):
+    """
+    Converts the numeric fields in place and fills in powertrain_cluster
+    (None for no cluster) if the CSV predates it. Raises ValueError on bad values.
+    """
+    row['highest_bid_price'] = float(row['highest_bid_price']) if row['highest_bid_price'] else 0
+    row['mileage'] = int(row['mileage']) if row['mileage'] else 0
+    row['powe_kw'] = int(float(row['powe_kw'])) if row['powe_kw'] else 0
+    row['battery_netto'] = int(round(float(row['battery_netto']))) if row['battery_netto'] else 0
+    row[CLUSTER_COLUMN] = row_cluster(row)
+    return row
+
+def iter_clean_rows(csv_path=DATASET_CSV):
+    """
+    Yields cleaned rows, skipping the ones clean_row() rejects (as the JSON does).
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                yield clean_row(row)
+            except ValueError:
+                continue
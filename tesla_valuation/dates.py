@@ -0,0 +1,189 @@
+"""
+date-fns semantics used by src/utils/valuation.js, ported to Python.
+
+predictPrice relies on parseISO, differenceInDays and differenceInMonths.
+These helpers reproduce them for a process running in UTC (the export's
+timestamps are all +00). Dates are timezone-aware UTC datetimes.
+
+The dataset's date fields are also normalized to integer columns: days
+since 1970-01-01 and months since January 1970 (DateColumns). The dataset
+has a few hundred distinct date strings, so parsing is memoized per string.
+"""
+import csv
+import heapq
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+UTC = timezone.utc
+PARSE_CACHE_SIZE = 1 << 16
+
+DATE_NA = -2**31
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Dataset date fields normalized by DateColumns (and the columnar export)
+DATE_FIELDS = ('first_registration', 'auction_start_date', 'auction_end_date', 'activated_at', 'highest_bid_at')
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_iso(value):
+    """
+    parseISO / new Date(...) for the dataset's formats: 'YYYY-MM-DD' and
+    'YYYY-MM-DD hh:mm:ss[.fff]+00'. Accepts date/datetime objects too.
+    Returns None where JS would produce an Invalid Date.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    elif hasattr(value, 'toordinal'):
+        dt = datetime(value.year, value.month, value.day)
+    else:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+def _compare(a, b):
+    return (a > b) - (a < b)
+
+def difference_in_days(later, earlier):
+    """
+    differenceInDays: whole 24h periods, truncated toward zero.
+    """
+    delta = later - earlier
+    if delta < timedelta(0):
+        return -((-delta).days)
+    return delta.days
+
+def _js_set_date(dt, day):
+    # Date.prototype.setDate: overflowing days roll into the next month
+    return dt.replace(day=1) + timedelta(days=day - 1)
+
+def _js_set_month(dt, month0):
+    # Date.prototype.setMonth: keeps the day of month, overflowing if it does not exist
+    years, month0 = divmod(month0, 12)
+    first = dt.replace(year=dt.year + years, month=month0 + 1, day=1)
+    return first + timedelta(days=dt.day - 1)
+
+def _is_last_day_of_month(dt):
+    return (dt + timedelta(days=1)).month != dt.month
+
+def difference_in_months(later, earlier):
+    """
+    differenceInMonths: whole calendar months, with date-fns' end-of-month rules.
+    """
+    sign = _compare(later, earlier)
+    difference = abs((later.year - earlier.year) * 12 + later.month - earlier.month)
+    if difference < 1:
+        return 0
+
+    working = later
+    if working.month == 2 and working.day > 27:
+        working = _js_set_date(working, 30)
+    working = _js_set_month(working, working.month - 1 - sign * difference)
+
+    last_month_not_full = _compare(working, earlier) == -sign
+    if _is_last_day_of_month(later) and difference == 1 and _compare(later, earlier) == 1:
+        last_month_not_full = False
+    return sign * (difference - int(last_month_not_full))
+
+def utc_now():
+    return datetime.now(UTC)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _calendar_date(value):
+    # (epoch day, month index) of the date part, DATE_NA for both if it is not a date
+    try:
+        d = date.fromisoformat(value[:10])
+    except ValueError:
+        return DATE_NA, DATE_NA
+    return d.toordinal() - EPOCH_ORDINAL, (d.year - 1970) * 12 + d.month - 1
+
+def to_epoch_days(value):
+    """
+    'YYYY-MM-DD' or 'YYYY-MM-DD hh:mm:ss+00' -> days since 1970-01-01.
+    Only the calendar date is kept; the export's timestamps are UTC.
+    """
+    if not value:
+        return DATE_NA
+    return _calendar_date(value)[0]
+
+def to_month_index(value):
+    """
+    'YYYY-MM-DD[...]' -> months since January 1970 (DATE_NA if not a date).
+    """
+    if not value:
+        return DATE_NA
+    return _calendar_date(value)[1]
+
+def from_epoch_days(days):
+    return None if days == DATE_NA else date.fromordinal(days + EPOCH_ORDINAL)
+
+def from_month_index(index):
+    """
+    Month index -> (year, month), or None for DATE_NA.
+    """
+    if index == DATE_NA:
+        return None
+    year, month0 = divmod(index, 12)
+    return 1970 + year, month0 + 1
+
+class DateColumns:
+    """
+    Epoch-day and month-index columns (array('i'), DATE_NA where missing)
+    of date fields, built one row at a time.
+    """
+
+    def __init__(self, fields=DATE_FIELDS):
+        self.fields = tuple(fields)
+        self.days = {name: array('i') for name in self.fields}
+        self.months = {name: array('i') for name in self.fields}
+
+    def __len__(self):
+        return len(self.days[self.fields[0]]) if self.fields else 0
+
+    def add(self, row):
+        for name in self.fields:
+            value = row.get(name)
+            if value:
+                days, month = _calendar_date(value)
+            else:
+                days = month = DATE_NA
+            self.days[name].append(days)
+            self.months[name].append(month)
+
+    @classmethod
+    def from_csv(cls, csv_path, fields=DATE_FIELDS):
+        columns = cls(fields)
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                columns.add(row)
+        return columns
+
+    def valid(self, name, months=False):
+        """
+        The column's values without the missing ones.
+        """
+        values = self.months[name] if months else self.days[name]
+        return (v for v in values if v != DATE_NA)
+
+    def range(self, name, months=False):
+        """
+        (earliest, latest) in one pass, or None if the column has no dates.
+        """
+        lo = hi = None
+        for v in self.valid(name, months):
+            if lo is None or v < lo:
+                lo = v
+            if hi is None or v > hi:
+                hi = v
+        return None if lo is None else (lo, hi)
+
+    def latest(self, name, n, distinct=False, months=False):
+        """
+        The n latest values, newest first, without sorting the column.
+        """
+        values = self.valid(name, months)
+        return heapq.nlargest(n, set(values) if distinct else values)
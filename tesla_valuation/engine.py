@@ -0,0 +1,398 @@
+"""
+Python port of predictPrice (src/utils/valuation.js) with a segment index.
+
+predictPrice filters the whole database on every call, re-running the
+powertrain clustering, parseISO and the Highland/taxation checks for every
+row. ValuationEngine does that work once when it is built: rows are parsed,
+zero-price rows dropped and the rest grouped by
+(model, powertrain cluster, is_highland, is_vat). A query then only scores
+the comparables of its own segment.
+
+Large segments are searched through a SegmentIndex
+(tesla_valuation/neighbors.py), which prunes comparables that cannot reach
+the neighbour pool instead of scoring and sorting all of them.
+
+with_changes() derives the engine of a newer dataset version from a delta
+of auction rows (see tesla_valuation/snapshots.py) without re-indexing the
+untouched segments.
+
+Inputs and results use predictPrice's shapes (camelCase keys), so requests
+and responses can be passed between the app and Python unchanged.
+"""
+import heapq
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from .config import load_valuation_config, model_config
+from .dataset import DATASET_CSV, iter_clean_rows
+from .dates import difference_in_days, difference_in_months, parse_iso, utc_now
+from .neighbors import SegmentIndex, prunable
+from .powertrain import row_cluster
+
+ACCEPTED_STATUS = "closed_seller_accepted"
+OUTLIER_THRESHOLD = 0.25 # 25% deviation from the pool median
+# Smaller segments are scanned in full: building and walking an index costs more
+INDEX_MIN_SEGMENT = 1000
+TIRE_LABELS = {
+    "8_tires": "8 Tires",
+    "4_summer": "Summer",
+    "4_winter": "Winter",
+    "4_all_season": "All-Season",
+}
+
+def js_to_fixed(value, digits):
+    """
+    Number.prototype.toFixed: rounds the exact binary value half away from zero.
+    """
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "Infinity" if value > 0 else "-Infinity"
+    quantum = Decimal(1).scaleb(-digits)
+    return str(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP))
+
+def tire_option_of(row):
+    """
+    The tire option a comparable offers, as predictPrice derives it.
+    """
+    try:
+        sets = int(row.get('tires_total_sets') or 0) or 1
+    except ValueError:
+        sets = 1
+    if sets == 2:
+        return "8_tires"
+    if row.get('tires_all_season') == "1":
+        return "4_all_season"
+    if row.get('tires_winter') == "1":
+        return "4_winter"
+    return "4_summer"
+
+def segment_key(model, cluster, is_highland, is_vat):
+    return (model, cluster, bool(is_highland), bool(is_vat))
+
+class Comparable:
+    """
+    A priced dataset row with everything that does not depend on the query precomputed.
+    """
+    __slots__ = (
+        'index', 'row', 'segment', 'price', 'mileage', 'reg_date', 'auction_date', 'age_at_sale',
+        'accident_free', 'has_ahk', 'tire_option', 'accepted',
+    )
+
+    def __init__(self, index, row, segment, reg_date, auction_date):
+        self.index = index
+        self.segment = segment
+        self.row = row
+        self.price = float(row['highest_bid_price'])
+        self.mileage = row['mileage']
+        self.reg_date = reg_date
+        self.auction_date = auction_date
+        self.age_at_sale = abs(difference_in_months(auction_date, reg_date))
+        self.accident_free = row.get('accident_free_cardentity') == "t"
+        self.has_ahk = row.get('features_trailer_hitch') == "t" or row.get('trailer_hitch_seller') == "t"
+        self.tire_option = tire_option_of(row)
+        self.accepted = row.get('status') == ACCEPTED_STATUS
+
+class Query:
+    """
+    predictPrice inputs, normalized once per call.
+    """
+
+    def __init__(self, inputs):
+        self.model = inputs['model']
+        self.powertrain_id = inputs['powertrainId']
+        self.mileage = inputs['mileage']
+        self.is_net_price = bool(inputs.get('isNetPrice'))
+        self.has_ahk = bool(inputs.get('hasAhk'))
+        self.is_accident_free = bool(inputs.get('isAccidentFree'))
+        self.is_highland = bool(inputs.get('isHighland'))
+        self.tire_option = inputs.get('tireOption')
+        self.now = parse_iso(inputs.get('valuationDate')) or utc_now()
+        self.target_date = parse_iso(inputs['registrationDate'])
+        self.age_target = abs(difference_in_months(self.now, self.target_date))
+
+    @property
+    def segment(self):
+        return segment_key(self.model, self.powertrain_id, self.is_highland, self.is_net_price)
+
+class ValuationEngine:
+    """
+    Prices cars against an indexed dataset, matching predictPrice.
+
+    comparables[i] is the comparable with index i; slots of auctions removed
+    by with_changes() hold None. `version` is the snapshot the engine was
+    built from, if any.
+    """
+
+    def __init__(self, rows, config=None):
+        self.config = config if config is not None else load_valuation_config()
+        self.segments = defaultdict(list)
+        self.comparables = []
+        self.by_id = {}
+        self.vacant = 0
+        self.version = None
+        self._indexes = {}
+        for row in rows:
+            comp = self._comparable(row, len(self.comparables))
+            if comp is not None:
+                self.comparables.append(comp)
+                self.segments[comp.segment].append(comp)
+                self._register(comp)
+
+    @classmethod
+    def from_csv(cls, path=DATASET_CSV, config=None):
+        return cls(iter_clean_rows(path), config=config)
+
+    @staticmethod
+    def _comparable(row, index):
+        # predictPrice drops rows with a missing or non-positive price
+        if not row.get('highest_bid_price') or float(row['highest_bid_price']) <= 0:
+            return None
+        reg_date = parse_iso(row.get('first_registration'))
+        auction_date = parse_iso(row.get('auction_end_date'))
+        if reg_date is None or auction_date is None:
+            # JS would score these NaN; they never rank meaningfully
+            return None
+        cluster = row_cluster(row)
+        key = segment_key(row['model'], cluster, row.get('is_highland') == "TRUE",
+                          row.get('taxation') == "vat_deductible")
+        return Comparable(index, row, key, reg_date, auction_date)
+
+    def _register(self, comp):
+        auction_id = comp.row.get('auction_id')
+        if auction_id:
+            self.by_id[auction_id] = comp.index
+
+    @property
+    def size(self):
+        return len(self.comparables) - self.vacant
+
+    def with_changes(self, rows, removed=()):
+        """
+        A new engine with `rows` (cleaned dataset rows) replacing the
+        comparables of the same auction_id or added after the others, and the
+        `removed` auction_ids dropped. Returns (engine, keys of the segments
+        that changed).
+
+        Copy-on-write: this engine is left as it was, so callers still
+        pricing against it see a consistent dataset. The new one shares every
+        untouched segment list and Comparable with it; only the touched
+        segments are rebuilt. A replaced auction keeps its index (its place
+        in the tie-break order), as it keeps its line when the dataset CSV
+        is patched in place.
+        """
+        engine = object.__new__(type(self))
+        engine.config = self.config
+        engine.segments = defaultdict(list, self.segments)
+        engine.comparables = list(self.comparables)
+        engine.by_id = dict(self.by_id)
+        engine.vacant = self.vacant
+        engine.version = self.version
+
+        touched = set()
+        vacated = set()
+        placed = []
+
+        def vacate(auction_id):
+            index = engine.by_id.pop(auction_id, None)
+            if index is None:
+                return None
+            touched.add(engine.comparables[index].segment)
+            vacated.add(index)
+            engine.comparables[index] = None
+            engine.vacant += 1
+            return index
+
+        for auction_id in removed:
+            vacate(auction_id)
+        for row in rows:
+            index = vacate(row['auction_id']) if row.get('auction_id') else None
+            comp = self._comparable(row, len(engine.comparables) if index is None else index)
+            if comp is None:
+                continue
+            if index is None:
+                engine.comparables.append(comp)
+            else:
+                engine.comparables[index] = comp
+                engine.vacant -= 1
+            engine._register(comp)
+            touched.add(comp.segment)
+            placed.append(comp)
+
+        for key in touched:
+            comps = [c for c in self.segments.get(key, []) if c.index not in vacated]
+            # An auction listed twice keeps its last row
+            comps.extend(c for c in placed if c.segment == key and engine.comparables[c.index] is c)
+            comps.sort(key=lambda c: c.index)
+            if comps:
+                engine.segments[key] = comps
+            else:
+                engine.segments.pop(key, None)
+        engine._indexes = {key: index for key, index in self._indexes.items() if key not in touched}
+        return engine, touched
+
+    def segment(self, inputs):
+        return self.segments.get(Query(inputs).segment, [])
+
+    def neighbor_index(self, key):
+        """
+        SegmentIndex of one segment, built on first use.
+        """
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = SegmentIndex(self.segments.get(key, []))
+        return index
+
+    def score(self, comp, query, shared, model_cfg):
+        """
+        Distance score and price adjustments of one comparable (predictPrice step 2).
+        """
+        score = 0
+        penalties = {}
+
+        # Recency (Market Trend)
+        days_since_auction = abs(difference_in_days(query.now, comp.auction_date))
+        recency_penalty = days_since_auction * shared['recencyPenalty']
+        score += recency_penalty
+
+        # Relative age with quadratic term
+        months_diff = abs(query.age_target - comp.age_at_sale)
+        age_penalty = months_diff * model_cfg['agePenalty']
+        age_penalty += (months_diff * months_diff) * model_cfg['ageQuadratic']
+        score += age_penalty
+
+        km_diff = abs(query.mileage - comp.mileage)
+        mileage_penalty = km_diff * model_cfg['mileageDistancePenalty']
+        score += mileage_penalty
+
+        if query.is_accident_free != comp.accident_free:
+            score += shared['accidentPenalty']
+            penalties['accident'] = shared['accidentPenalty']
+
+        car_option = comp.tire_option
+        tire_label = TIRE_LABELS[car_option]
+        if query.tire_option == "8_tires":
+            if car_option != "8_tires":
+                score += shared['tireUserWants8Penalty']
+                penalties['tire'] = shared['tireUserWants8Penalty']
+                tire_label = f"Mismatch: Requested 8 Tires vs Car has {TIRE_LABELS[car_option]}"
+        elif car_option == "8_tires":
+            score += shared['tireUserWants4Penalty']
+            penalties['tire'] = shared['tireUserWants4Penalty']
+            tire_label = "Mismatch: Requested 4 Tires vs Car has 8 Tires"
+        elif query.tire_option != car_option:
+            score += shared['tireTypePenalty']
+            penalties['tire'] = shared['tireTypePenalty']
+            tire_label = f"Mismatch: {TIRE_LABELS.get(query.tire_option)} vs {TIRE_LABELS[car_option]}"
+
+        if not comp.accepted:
+            score += shared['statusPenalty']
+            penalties['status'] = shared['statusPenalty']
+
+        # Price adjustment (appraisal method)
+        adjustment = 0
+        hitch_msg = None
+        mileage_msg = None
+        if query.has_ahk and not comp.has_ahk:
+            adjustment += shared['hitchValue']
+            hitch_msg = f"+€{shared['hitchValue']} (Missing Hitch)"
+        elif not query.has_ahk and comp.has_ahk:
+            adjustment -= shared['hitchValue']
+            hitch_msg = f"-€{shared['hitchValue']} (Has Hitch)"
+
+        mileage_adj = (comp.mileage - query.mileage) * model_cfg['mileageDepreciation']
+        if abs(mileage_adj) > 50:
+            adjustment += mileage_adj
+            sign = "+" if mileage_adj > 0 else "-"
+            mileage_msg = f"{sign}€{js_to_fixed(abs(mileage_adj), 0)}"
+
+        return {
+            **comp.row,
+            'score': score,
+            'price': comp.price,
+            'adjustedPrice': comp.price + adjustment,
+            'adjustmentReason': ", ".join(m for m in (hitch_msg, mileage_msg) if m),
+            'hitchAdjMsg': hitch_msg,
+            'mileageAdjMsg': mileage_msg,
+            'penalties': penalties,
+            'matchDetails': {
+                'tireMatchLabel': tire_label,
+                'recencyPenalty': recency_penalty,
+                'agePenalty': age_penalty,
+                'mileagePenalty': mileage_penalty,
+                'diffMileage': comp.mileage - query.mileage,
+                'diffAgeMonths': query.age_target - comp.age_at_sale,
+                'ageTarget': query.age_target,
+                'ageComp': comp.age_at_sale,
+            },
+        }
+
+    def predict(self, inputs):
+        """
+        predictPrice(inputs, database) against the indexed dataset.
+        Returns {'price': float, 'neighbors': [...]}.
+        """
+        query = Query(inputs)
+        shared = self.config['shared']
+        model_cfg = model_config(self.config, query.model)
+
+        # Only the pool reaches the consensus filter
+        pool = shared['neighborCount'] * 3
+        comps = self.segments.get(query.segment, [])
+        if len(comps) >= INDEX_MIN_SEGMENT and prunable(shared, model_cfg):
+            comps = self.neighbor_index(query.segment).nearest(query, pool, shared, model_cfg)
+        # nsmallest keeps ties in dataset order, like the stable sort
+        scored = heapq.nsmallest(pool, (self.score(comp, query, shared, model_cfg) for comp in comps),
+                                 key=lambda c: c['score'])
+        neighbors = select_neighbors(scored, shared['neighborCount'])
+        if not neighbors:
+            return {'price': 0, 'neighbors': []}
+        return {'price': weigh_neighbors(neighbors, shared['weightExponent']), 'neighbors': neighbors}
+
+    def predict_many(self, inputs_list):
+        return [self.predict(inputs) for inputs in inputs_list]
+
+def select_neighbors(scored, neighbor_count):
+    """
+    Consensus filter of predictPrice step 3 over score-sorted candidates.
+    """
+    candidates = scored[:neighbor_count * 3]
+    if len(candidates) < 3:
+        return scored[:neighbor_count]
+
+    prices = sorted(c['adjustedPrice'] for c in candidates)
+    median = prices[len(prices) // 2]
+    valid = []
+    for c in candidates:
+        if median:
+            deviation = abs(c['adjustedPrice'] - median) / median
+        else:
+            # JS: x / 0 is Infinity, 0 / 0 is NaN (never an outlier)
+            deviation = float('inf') if c['adjustedPrice'] else 0.0
+        if deviation > OUTLIER_THRESHOLD:
+            c['isOutlier'] = True
+            c['outlierReason'] = (
+                f"Deviated {js_to_fixed(deviation * 100, 1)}% from median (€{js_to_fixed(median, 0)})"
+            )
+        else:
+            valid.append(c)
+
+    if valid:
+        return valid[:neighbor_count]
+    # Everything is an outlier: fall back to the closest matches
+    return candidates[:neighbor_count]
+
+def weigh_neighbors(neighbors, weight_exponent):
+    """
+    Inverse-score weighted mean of adjusted prices; sets weight/influence on each neighbor.
+    """
+    total_weight = 0
+    weighted_sum = 0
+    for n in neighbors:
+        weight = 1 / ((n['score'] + 1) ** weight_exponent)
+        weighted_sum += n['adjustedPrice'] * weight
+        total_weight += weight
+        n['weight'] = weight
+    for n in neighbors:
+        n['influence'] = n['weight'] / total_weight if total_weight > 0 else 0
+    return weighted_sum / total_weight
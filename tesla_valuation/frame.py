@@ -0,0 +1,127 @@
+"""
+Typed pandas frame of the dataset CSV, cached on disk.
+
+Parsing the CSV with pandas' default inference leaves the categoricals as
+strings and every date as text. load_frame() applies one schema (categorical
+model/taxation/status/drive_type/powertrain_cluster, nullable int powe_kw/mileage, float
+battery_netto/highest_bid_price, UTC datetimes) and stores the result as
+Parquet next to a small JSON stamp. Later loads read the Parquet file as long
+as the CSV's size and mtime match the stamp; when only the mtime changed the
+content hash decides, so a touched-but-identical file still hits the cache.
+
+pandas is required; pyarrow (or fastparquet) only for the Parquet cache.
+Without either the frame is cached as a pickle instead.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from .dataset import DATASET_CSV
+
+SCHEMA_VERSION = 2
+DEFAULT_CACHE_DIR = '.cache'
+
+CATEGORY_COLUMNS = ['model', 'taxation', 'status', 'drive_type', 'powertrain_cluster']
+INT_COLUMNS = {'powe_kw': 'Int32', 'mileage': 'Int64'}
+FLOAT_COLUMNS = ['battery_netto', 'highest_bid_price']
+DATE_COLUMNS = [
+    'first_registration', 'auction_start_date', 'auction_end_date', 'activated_at',
+    'auction_created_at', 'highest_bid_at', 'last_bid_at',
+]
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def read_typed_csv(path=DATASET_CSV):
+    """
+    Parses the CSV and applies the schema. Unparseable numbers and dates become NA.
+    """
+    df = pd.read_csv(path, dtype={name: str for name in CATEGORY_COLUMNS})
+    for name in CATEGORY_COLUMNS:
+        if name in df:
+            df[name] = df[name].astype('category')
+    for name, dtype in INT_COLUMNS.items():
+        if name in df:
+            df[name] = pd.to_numeric(df[name], errors='coerce').round().astype(dtype)
+    for name in FLOAT_COLUMNS:
+        if name in df:
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+    for name in DATE_COLUMNS:
+        if name in df:
+            df[name] = pd.to_datetime(df[name], format='ISO8601', utc=True, errors='coerce')
+    return df
+
+def _parquet_available():
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+def _cache_paths(source, cache_dir):
+    base = os.path.join(cache_dir, os.path.basename(source))
+    data = base + ('.parquet' if _parquet_available() else '.pkl')
+    return data, base + '.stamp.json'
+
+def _read_stamp(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_stamp(path, stamp):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(stamp, f)
+    os.replace(path + '.tmp', path)
+
+def load_frame(path=DATASET_CSV, cache_dir=None, refresh=False):
+    """
+    The typed frame of `path`, from the cache when it is current.
+    cache_dir defaults to `.cache/` beside the CSV; pass cache_dir=False to skip caching.
+    """
+    if cache_dir is False:
+        return read_typed_csv(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_CACHE_DIR)
+    data_path, stamp_path = _cache_paths(path, cache_dir)
+    st = os.stat(path)
+    stamp = None if refresh else _read_stamp(stamp_path)
+
+    if stamp and stamp.get('schema') == SCHEMA_VERSION and os.path.exists(data_path) \
+            and stamp.get('format') == os.path.splitext(data_path)[1]:
+        fresh = stamp['size'] == st.st_size and stamp['mtime_ns'] == st.st_mtime_ns
+        if not fresh and stamp['size'] == st.st_size and stamp['sha1'] == file_hash(path):
+            # Touched but unchanged: keep the cache, remember the new mtime
+            stamp['mtime_ns'] = st.st_mtime_ns
+            _write_stamp(stamp_path, stamp)
+            fresh = True
+        if fresh:
+            if data_path.endswith('.parquet'):
+                return pd.read_parquet(data_path)
+            return pd.read_pickle(data_path)
+
+    digest = file_hash(path)
+    df = read_typed_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    if data_path.endswith('.parquet'):
+        df.to_parquet(data_path + '.tmp', index=False)
+    else:
+        df.to_pickle(data_path + '.tmp')
+    os.replace(data_path + '.tmp', data_path)
+    _write_stamp(stamp_path, {
+        'schema': SCHEMA_VERSION,
+        'format': os.path.splitext(data_path)[1],
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha1': digest,
+    })
+    return df
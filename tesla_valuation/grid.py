@@ -0,0 +1,321 @@
+"""
+Precomputed depreciation grids: approximate predictPrice in O(1).
+
+For every segment of the valuation engine (model, powertrain cluster,
+Highland, taxation) build_grid() prices a dense grid of
+
+    age in months (0 .. max_age-1)  x  hitch  x  accident free  x
+    tire option  x  mileage (0, step, 2*step, ... max_mileage)
+
+with the batch pricer, i.e. exactly what predictPrice returns at the grid's
+valuation instant. Age, hitch, accident and tires are discrete inputs of
+predictPrice, so those axes are exact; only mileage is interpolated
+(linearly between the two neighbouring grid points).
+
+Interpolation is wrong where the neighbour set changes inside a mileage
+step, so the build also prices every interval's midpoint and marks the
+interval trusted only if interpolating there is within `tolerance` of the
+exact price. lookup() returns None outside the grid, for untrusted
+intervals, segments without comparables and valuation dates other than the
+grid's (so a grid is rebuilt daily); callers then price exactly (GridQuoter
+does both). The manifest
+reports the error of lookup() against the exact price on random probes
+(registration dates and valuation instants on the grid's day), per segment
+and overall.
+
+On disk a grid is a directory like the columnar export:
+
+    <dir>/manifest.json   axes, segments, layout, dataset/config stamp, error report
+    <dir>/grid.bin        float32 prices, then uint8 trusted flags, 8-byte aligned
+
+grid.bin is mmap'd; a lookup reads two prices and one flag.
+"""
+import hashlib
+import json
+import mmap
+import os
+import random
+from datetime import timedelta
+
+import numpy as np
+
+from .batch import TIRE_CODES, BatchPricer, TargetTable
+from .dates import difference_in_months, parse_iso, utc_now
+from .engine import segment_key
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+GRID_BIN = 'grid.bin'
+
+DEFAULT_MAX_AGE = 96            # months; older cars fall back to exact pricing
+DEFAULT_MAX_MILEAGE = 250_000
+DEFAULT_MILEAGE_STEP = 5_000
+DEFAULT_TOLERANCE = 0.005       # interpolation error allowed at an interval's midpoint
+DEFAULT_PROBES = 500            # random error probes per segment
+MS_PER_DAY = 86400000
+DAYS_PER_MONTH = 30.44          # mean calendar month, to draw registration dates
+
+# Axis order of the price array, mileage last so an interpolation reads adjacent cells
+AXES = ('segment', 'age', 'has_ahk', 'accident_free', 'tire', 'mileage')
+
+def _epoch_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+def target_table(key, now_ms, age, has_ahk, accident_free, tire, mileage):
+    """
+    A TargetTable for segment `key` straight from column arrays (ages in
+    months, tire codes), skipping the per-target date parsing.
+    """
+    n = len(age)
+    table = TargetTable.__new__(TargetTable)
+    table.model = [key[0]] * n
+    table.segment = [key] * n
+    table.now_ms = np.broadcast_to(np.asarray(now_ms, dtype=np.int64), (n,)).copy()
+    table.age_target = np.asarray(age, dtype=np.float64)
+    table.mileage = np.asarray(mileage, dtype=np.float64)
+    table.accident_free = np.asarray(accident_free, dtype=bool)
+    table.has_ahk = np.asarray(has_ahk, dtype=bool)
+    table.tire = np.asarray(tire, dtype=np.int8)
+    return table
+
+def _grid_points(ages, mileages):
+    # Every (age, hitch, accident, tire, mileage) combination, in AXES order
+    return [axis.ravel() for axis in np.meshgrid(
+        ages, [False, True], [False, True], np.arange(len(TIRE_CODES)), mileages, indexing='ij')]
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+def error_summary(exact, approx):
+    """
+    Error of the probes a grid answered (approx not NaN) against the exact prices.
+    """
+    hit = ~np.isnan(approx)
+    abs_err = np.abs(approx[hit] - exact[hit])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_err = np.where(exact[hit] > 0, abs_err / exact[hit], 0.0)
+    return {
+        'probes': int(len(exact)),
+        'hit_rate': float(hit.mean()) if len(exact) else None,
+        'abs_error_p50': _percentile(abs_err, 50),
+        'abs_error_p95': _percentile(abs_err, 95),
+        'abs_error_max': float(abs_err.max()) if len(abs_err) else None,
+        'rel_error_p50': _percentile(rel_err, 50),
+        'rel_error_p95': _percentile(rel_err, 95),
+        'rel_error_max': float(rel_err.max()) if len(rel_err) else None,
+    }
+
+def _sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def build_grid(engine, out_dir, valuation_date, max_age=DEFAULT_MAX_AGE, max_mileage=DEFAULT_MAX_MILEAGE,
+               mileage_step=DEFAULT_MILEAGE_STEP, tolerance=DEFAULT_TOLERANCE, probes=DEFAULT_PROBES,
+               seed=42, dataset_path=None):
+    """
+    Prices the grid of every segment of `engine` at `valuation_date`
+    (midnight UTC of that date), measures its error and writes it to
+    `out_dir`. Returns the manifest.
+    """
+    now = parse_iso(valuation_date)
+    now = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    now_ms = _epoch_ms(now)
+    pricer = BatchPricer(engine)
+    rng = random.Random(seed)
+
+    keys = sorted((key for key, comps in engine.segments.items() if comps), key=repr)
+    ages = np.arange(max_age)
+    mileages = np.arange(0, max_mileage + mileage_step, mileage_step, dtype=np.float64)
+    n_tires = len(TIRE_CODES)
+    shape = (len(keys), max_age, 2, 2, n_tires, len(mileages))
+    prices = np.zeros(shape, dtype=np.float32)
+    trusted = np.zeros(shape[:-1] + (len(mileages) - 1,), dtype=np.uint8)
+    axes = {
+        'order': list(AXES),
+        'max_age': max_age,
+        'mileage_step': mileage_step,
+        'max_mileage': max_mileage,
+        'tire': list(TIRE_CODES),
+    }
+    # Probes go through the same lookup() readers use, over the arrays being filled
+    grid = DepreciationGrid.from_arrays(now, axes, keys, prices, trusted)
+
+    segments = []
+    all_exact, all_approx = [], []
+    for s, key in enumerate(keys):
+        # Grid points and interval midpoints in one batch
+        half_steps = np.arange(0, max_mileage + mileage_step / 2, mileage_step / 2, dtype=np.float64)
+        points = _grid_points(ages, half_steps)
+        exact = pricer.price(target_table(key, now_ms, *points)).prices.reshape(shape[1:-1] + (len(half_steps),))
+        nodes, mids = exact[..., ::2], exact[..., 1::2]
+        prices[s] = nodes
+        # Compare against what interpolating the stored float32 values gives
+        stored = prices[s].astype(np.float64)
+        interpolated = (stored[..., :-1] + stored[..., 1:]) / 2
+        trusted[s] = np.abs(interpolated - mids) <= tolerance * np.abs(mids)
+
+        # Random probes at any time of the valuation day, registered at any
+        # time up to max_age months before it
+        targets = []
+        for _ in range(probes):
+            valuation = now + timedelta(milliseconds=rng.randrange(MS_PER_DAY))
+            registration = valuation - timedelta(days=rng.uniform(0, max_age * DAYS_PER_MONTH))
+            targets.append({
+                'model': key[0], 'powertrainId': key[1], 'isHighland': key[2], 'isNetPrice': key[3],
+                'registrationDate': registration.isoformat(), 'valuationDate': valuation.isoformat(),
+                'mileage': rng.uniform(0, max_mileage), 'hasAhk': rng.random() < 0.5,
+                'isAccidentFree': rng.random() < 0.5, 'tireOption': axes['tire'][rng.randrange(n_tires)],
+            })
+        exact = pricer.price(targets).prices
+        approx = np.array([grid.lookup(t) for t in targets], dtype=np.float64)
+        all_exact.append(exact)
+        all_approx.append(approx)
+        segments.append({
+            'key': list(key),
+            'comparables': len(engine.segments[key]),
+            'trusted_share': float(trusted[s].mean()),
+            'error': error_summary(exact, approx),
+        })
+
+    os.makedirs(out_dir, exist_ok=True)
+    bin_path = os.path.join(out_dir, GRID_BIN)
+    layout = {}
+    with open(bin_path + '.tmp', 'wb') as f:
+        for name, values in (('prices', prices), ('trusted', trusted)):
+            f.write(b'\0' * (-f.tell() % 8))
+            layout[name] = {'offset': f.tell(), 'dtype': values.dtype.str, 'shape': list(values.shape)}
+            f.write(values.tobytes())
+
+    manifest = {
+        'version': FORMAT_VERSION,
+        'valuation_date': now.isoformat(),
+        'axes': axes,
+        'tolerance': tolerance,
+        'segments': segments,
+        'layout': layout,
+        'dataset': {'path': dataset_path, 'sha1': _sha1(dataset_path)} if dataset_path else None,
+        'config': engine.config,
+        'error': error_summary(np.concatenate(all_exact), np.concatenate(all_approx)) if keys else None,
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    # Manifest last, so readers never see it pointing at a half-written grid
+    os.replace(bin_path + '.tmp', bin_path)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+class DepreciationGrid:
+    """
+    Read-only view over a grid directory written by build_grid().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported grid format version: {self.manifest.get('version')}")
+        self._file = open(os.path.join(path, GRID_BIN), 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        arrays = {}
+        for name, spec in self.manifest['layout'].items():
+            count = int(np.prod(spec['shape']))
+            arrays[name] = np.frombuffer(self._mmap, dtype=np.dtype(spec['dtype']), count=count,
+                                         offset=spec['offset']).reshape(spec['shape'])
+        self._bind(parse_iso(self.manifest['valuation_date']), self.manifest['axes'],
+                   [seg['key'] for seg in self.manifest['segments']], arrays['prices'], arrays['trusted'])
+
+    @classmethod
+    def from_arrays(cls, now, axes, keys, prices, trusted):
+        """
+        A grid over in-memory arrays (no directory, manifest or mmap).
+        """
+        grid = cls.__new__(cls)
+        grid.path = grid.manifest = grid._file = grid._mmap = None
+        grid._bind(now, axes, keys, prices, trusted)
+        return grid
+
+    def _bind(self, now, axes, keys, prices, trusted):
+        self.now = now
+        self.max_age = axes['max_age']
+        self.step = axes['mileage_step']
+        self.tires = {name: code for code, name in enumerate(axes['tire'])}
+        self.segments = {tuple(key): s for s, key in enumerate(keys)}
+        self.prices = prices
+        self.trusted = trusted
+        self._n_mileage = prices.shape[-1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, inputs):
+        """
+        Interpolated predictPrice(inputs) price, or None where the grid cannot
+        answer it (price those exactly).
+        """
+        s = self.segments.get(segment_key(inputs['model'], inputs['powertrainId'],
+                                          inputs.get('isHighland'), inputs.get('isNetPrice')))
+        tire = self.tires.get(inputs.get('tireOption'))
+        if s is None or tire is None:
+            return None
+        # predictPrice values at valuationDate, or now; the grid holds one day
+        now = parse_iso(inputs.get('valuationDate')) or utc_now()
+        if now.date() != self.now.date():
+            return None
+        registration = parse_iso(inputs['registrationDate'])
+        if registration is None:
+            return None
+        # From the query's own instant, as predictPrice does: the age can change during the day
+        age = abs(difference_in_months(now, registration))
+        mileage = inputs['mileage']
+        if age >= self.max_age or mileage < 0:
+            return None
+        pos = mileage / self.step
+        j = int(pos)
+        if j >= self._n_mileage - 1:
+            if pos != self._n_mileage - 1:
+                return None
+            j -= 1
+        cell = (s, age, int(bool(inputs.get('hasAhk'))), int(bool(inputs.get('isAccidentFree'))), tire)
+        if not self.trusted[cell + (j,)]:
+            return None
+        p0 = float(self.prices[cell + (j,)])
+        p1 = float(self.prices[cell + (j + 1,)])
+        return p0 + (p1 - p0) * (pos - j)
+
+    def close(self):
+        self.prices = self.trusted = None
+        if self._mmap is None:
+            return
+        # Arrays handed out keep the mmap alive; only close it when nothing refers to it
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+class GridQuoter:
+    """
+    Grid lookups with exact ValuationEngine pricing where the grid has no answer.
+    """
+
+    def __init__(self, grid, engine):
+        self.grid = grid
+        self.engine = engine
+        self.hits = 0
+        self.fallbacks = 0
+
+    def quote(self, inputs):
+        price = self.grid.lookup(inputs)
+        if price is not None:
+            self.hits += 1
+            return price
+        self.fallbacks += 1
+        return self.engine.predict(inputs)['price']
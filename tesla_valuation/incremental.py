@@ -0,0 +1,140 @@
+"""
+Byte-offset row index for patching the dataset files in place.
+
+Each output file (the dataset CSV, the app's JSON) gets a sidecar
+`<file>.index.json` mapping auction_id -> [content_hash, offset, length].
+New auctions are appended at the end of the file; changed auctions are
+spliced over their old byte range. The index also records the file's size
+and mtime, so a file rewritten by anything else is detected as stale and
+rebuilt from scratch.
+"""
+import bisect
+import hashlib
+import json
+import os
+import shutil
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index.json'
+
+def content_hash(values):
+    """
+    Stable digest of a row's values, used to detect changed auctions.
+    """
+    h = hashlib.sha1()
+    for v in values:
+        h.update((v or '').encode('utf-8'))
+        h.update(b'\x1f')
+    return h.hexdigest()[:16]
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+class RowIndex:
+    """
+    auction_id -> [content_hash, offset, length] for one data file.
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows if rows is not None else {}
+
+    @classmethod
+    def load(cls, data_path):
+        """
+        Returns the index for `data_path`, or None when it is missing or stale.
+        """
+        index_path = data_path + INDEX_SUFFIX
+        if not os.path.exists(index_path) or not os.path.exists(data_path):
+            return None
+        with open(index_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != INDEX_VERSION:
+            return None
+        if list(_file_stamp(data_path)) != payload.get('stamp'):
+            return None
+        return cls(payload['rows'])
+
+    def save(self, data_path):
+        index_path = data_path + INDEX_SUFFIX
+        payload = {'version': INDEX_VERSION, 'stamp': list(_file_stamp(data_path)), 'rows': self.rows}
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(index_path + '.tmp', index_path)
+
+    def digest(self, key):
+        entry = self.rows.get(key)
+        return entry[0] if entry else None
+
+    def span(self, key):
+        _, offset, length = self.rows[key]
+        return offset, length
+
+    def set(self, key, digest, offset, length):
+        self.rows[key] = [digest, offset, length]
+
+    def shift_after_splice(self, edits):
+        """
+        Moves every row's offset to account for `edits`, a list of
+        (old_offset, old_length, new_length) produced by splice().
+        """
+        if not edits:
+            return
+        edits = sorted(edits)
+        starts = [e[0] for e in edits]
+        shifts = []
+        total = 0
+        for _, old_len, new_len in edits:
+            total += new_len - old_len
+            shifts.append(total)
+        for entry in self.rows.values():
+            i = bisect.bisect_left(starts, entry[1])
+            if i:
+                entry[1] += shifts[i - 1]
+
+def append_bytes(path, chunks):
+    """
+    Appends encoded rows to `path`. Returns their (offset, length) spans.
+    """
+    spans = []
+    with open(path, 'ab') as f:
+        offset = f.tell()
+        for chunk in chunks:
+            f.write(chunk)
+            spans.append((offset, len(chunk)))
+            offset += len(chunk)
+    return spans
+
+def splice(path, replacements):
+    """
+    Rewrites `path` with byte ranges replaced.
+
+    `replacements` maps old offset -> (old_length, new_bytes). Untouched ranges
+    are copied verbatim, so the cost is a raw copy rather than a re-transform.
+    Returns the edit list expected by RowIndex.shift_after_splice().
+    """
+    if not replacements:
+        return []
+    tmp_path = path + '.tmp'
+    edits = []
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        pos = 0
+        for offset in sorted(replacements):
+            old_len, new_bytes = replacements[offset]
+            src.seek(pos)
+            _copy_range(src, dst, offset - pos)
+            dst.write(new_bytes)
+            pos = offset + old_len
+            edits.append((offset, old_len, len(new_bytes)))
+        src.seek(pos)
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path)
+    return edits
+
+def _copy_range(src, dst, length, block=1 << 20):
+    while length > 0:
+        data = src.read(min(block, length))
+        if not data:
+            break
+        dst.write(data)
+        length -= len(data)
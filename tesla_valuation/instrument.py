@@ -0,0 +1,231 @@
+"""
+Per-stage instrumentation for the data refresh pipeline.
+
+    with stage('transform') as s:
+        ...
+        s.rows_in, s.rows_out = 1000, 700
+        s.skip('make_model', 300)
+
+records wall and CPU time, rows in/out, skipped rows by reason, bytes read
+and written and peak RSS (the process high-water mark when the block ends,
+plus that of finished child processes) for the block. When TESLA_RUN_REPORT names a file
+(or report_path is passed) the record is appended to that JSON run report,
+so transform_new_csv.py, convert_csv_to_json.py and
+scripts/measure_app_load.mjs can add to the same report one after another.
+
+TESLA_PROFILE=cprofile profiles each stage with cProfile and
+TESLA_PROFILE=sample with a SIGPROF stack sampler (Unix only). Both print a
+summary to stderr and write their output (<stage>.prof or
+<stage>.stacks, the collapsed format flame graph tools read) into
+TESLA_PROFILE_DIR (default: the working directory).
+"""
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REPORT_VERSION = 1
+REPORT_ENV = 'TESLA_RUN_REPORT'
+PROFILE_ENV = 'TESLA_PROFILE'
+PROFILE_DIR_ENV = 'TESLA_PROFILE_DIR'
+SAMPLE_INTERVAL = 0.005
+
+def _peak_rss_kb(who=None):
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class Stage:
+    """
+    Measurements of one pipeline stage. Callers fill in rows and bytes; timing
+    and memory are recorded by stage().
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = 0
+        self.rows_out = 0
+        self.skipped = Counter()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.extra = {}
+        self.started_at = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_kb = None
+        self.peak_rss_children_kb = None
+        self.status = 'ok'
+
+    def skip(self, reason, n=1):
+        self.skipped[reason] += n
+
+    def read_file(self, path):
+        self.bytes_read += file_size(path)
+
+    def wrote_file(self, path):
+        self.bytes_written += file_size(path)
+
+    def to_dict(self):
+        return {
+            'stage': self.name,
+            'status': self.status,
+            'started_at': self.started_at,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_skipped': dict(self.skipped),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_rss_kb': self.peak_rss_kb,
+            'peak_rss_children_kb': self.peak_rss_children_kb,
+            'pid': os.getpid(),
+            'command': sys.argv,
+            **self.extra,
+        }
+
+def load_report(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {'version': REPORT_VERSION, 'stages': []}
+    if report.get('version') != REPORT_VERSION:
+        return {'version': REPORT_VERSION, 'stages': []}
+    return report
+
+def append_to_report(path, record):
+    report = load_report(path)
+    report['stages'].append(record)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+class StackSampler:
+    """
+    Counts the main thread's stacks on every SIGPROF tick (CPU time, not wall time).
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous = None
+
+    def _sample(self, signum, frame):
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(parts))] += 1
+
+    def start(self):
+        import signal
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        import signal
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, limit=15):
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(name, count, count / total) for name, count in leaves.most_common(limit)]
+
+class _Profiler:
+    """
+    The TESLA_PROFILE hook: None, cProfile or the stack sampler around one stage.
+    """
+
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.directory = os.environ.get(PROFILE_DIR_ENV, '.')
+        self.impl = None
+        if mode == 'cprofile':
+            import cProfile
+            self.impl = cProfile.Profile()
+        elif mode == 'sample':
+            if not hasattr(__import__('signal'), 'setitimer'):
+                print(f"{PROFILE_ENV}=sample needs setitimer (Unix); not profiling {name}", file=sys.stderr)
+            else:
+                self.impl = StackSampler()
+        elif mode:
+            print(f"Unknown {PROFILE_ENV}={mode!r} (use cprofile or sample); not profiling", file=sys.stderr)
+
+    def start(self):
+        if self.mode == 'cprofile' and self.impl:
+            self.impl.enable()
+        elif self.impl:
+            self.impl.start()
+
+    def stop(self):
+        if self.impl is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == 'cprofile':
+            import pstats
+            self.impl.disable()
+            path = os.path.join(self.directory, f"{self.name}.prof")
+            self.impl.dump_stats(path)
+            print(f"\n[profile] {self.name}: cProfile stats in {path}", file=sys.stderr)
+            pstats.Stats(self.impl, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+        else:
+            self.impl.stop()
+            path = os.path.join(self.directory, f"{self.name}.stacks")
+            self.impl.write(path)
+            print(f"\n[profile] {self.name}: collapsed stacks in {path}", file=sys.stderr)
+            for name, count, share in self.impl.summary():
+                print(f"  {share:6.1%} {count:>6}  {name}", file=sys.stderr)
+
+@contextmanager
+def stage(name, report_path=None):
+    """
+    Measures the enclosed block as stage `name`; yields the Stage to fill in.
+    """
+    s = Stage(name)
+    profiler = _Profiler(name, os.environ.get(PROFILE_ENV, '').strip().lower())
+    s.started_at = datetime.now(timezone.utc).isoformat()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    profiler.start()
+    try:
+        yield s
+    except BaseException as e:
+        s.status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        profiler.stop()
+        s.wall_s = time.perf_counter() - wall
+        s.cpu_s = time.process_time() - cpu
+        s.peak_rss_kb = _peak_rss_kb()
+        if resource is not None:
+            s.peak_rss_children_kb = _peak_rss_kb(resource.RUSAGE_CHILDREN)
+        path = report_path or os.environ.get(REPORT_ENV)
+        if path:
+            append_to_report(path, s.to_dict())
@@ -0,0 +1,88 @@
+"""
+Memoized decoding of the export's JSON blob columns (tyres, conditions).
+
+The blobs are generated from a handful of templates, so the same few strings
+repeat on most rows. BlobDecoder decodes each distinct string once (LRU
+cache keyed on the raw text) and counts empty and malformed blobs per field
+instead of dropping them silently. orjson is used when installed; strings it
+rejects are retried with the json module so both backends accept exactly
+the same input.
+
+Decoded values are shared between rows: treat them as read-only.
+"""
+import json
+from collections import Counter
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_CACHE_SIZE = 4096
+
+def _stdlib_loads(raw):
+    return json.loads(raw)
+
+def _orjson_loads(raw):
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # NaN/Infinity literals, lone surrogates, ... : defer to the json module
+        return json.loads(raw)
+
+def resolve_backend(name='auto'):
+    """
+    'auto' (orjson if installed), 'orjson' or 'json' -> (name, loads).
+    """
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name == 'orjson':
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return name, _orjson_loads
+    if name == 'json':
+        return name, _stdlib_loads
+    raise ValueError(f"Unknown JSON backend: {name}")
+
+class BlobDecoder:
+    """
+    decode(raw) -> parsed value, or `default` for empty/malformed blobs.
+    maxsize=0 disables the cache.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, backend='auto'):
+        self.backend, loads = resolve_backend(backend)
+        self.maxsize = maxsize
+        self.empty = Counter()
+        self.malformed = Counter()
+
+        def parse(raw):
+            try:
+                return loads(raw), True
+            except (ValueError, TypeError):
+                return None, False
+
+        self._parse = lru_cache(maxsize=maxsize)(parse) if maxsize else parse
+
+    def decode(self, raw, field=None, default=None):
+        if not raw:
+            self.empty[field] += 1
+            return [] if default is None else default
+        value, ok = self._parse(raw)
+        if not ok:
+            self.malformed[field] += 1
+            return [] if default is None else default
+        return value
+
+    def cache_info(self):
+        return self._parse.cache_info() if self.maxsize else None
+
+    def take_counts(self):
+        """
+        Returns and resets (empty, malformed) counters, e.g. to ship them out of a worker.
+        """
+        counts = (self.empty, self.malformed)
+        self.empty = Counter()
+        self.malformed = Counter()
+        return counts
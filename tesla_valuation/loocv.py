@@ -0,0 +1,175 @@
+"""
+Leave-one-out cross-validation of VALUATION_CONFIG.
+
+The optimizers in scripts/ run a full LOOCV per trial, re-filtering and
+re-scoring the whole database for every car. Nothing but the config changes
+between trials, so LoocvHarness computes every config-independent term once
+per segment: the target x comparable month, km and recency gaps, the
+accident/tire/status/hitch mismatches and the self-exclusion mask. A trial
+is then a few multiply-adds over those matrices plus the vectorized
+consensus step of BatchPricer.
+
+Predictions follow predictPrice (the consensus filter included, zero-price
+rows excluded), with each car priced against the dataset minus its own
+auction_id, as in validate_current.js. Errors are scored like
+optimize_v5_best_of_both.js: absolute % error capped at 100, over cars
+with a known powertrain cluster, a price and a non-zero prediction.
+"""
+import numpy as np
+
+from .batch import MS_PER_DAY, TIRE_CODES, SegmentArrays, _epoch_ms, consensus_price
+from .config import load_valuation_config, model_config
+from .dates import difference_in_months, utc_now
+from .dataset import DATASET_CSV
+from .engine import ValuationEngine
+
+ERROR_CAP = 100.0
+
+# Tire penalty slots, indexed by SegmentPairs.tire
+TIRE_NONE, TIRE_WANTS_8, TIRE_WANTS_4, TIRE_TYPE = range(4)
+
+def upper_median(values):
+    """
+    values[floor(n/2)] of the sorted values, the optimizers' median. None if empty.
+    """
+    if len(values) == 0:
+        return None
+    return float(np.sort(values)[len(values) // 2])
+
+class SegmentPairs:
+    """
+    Config-independent pairwise terms of one segment. Every comparable is
+    also a target (rows), priced against the other comparables (columns).
+    """
+
+    def __init__(self, model, comps, now):
+        arrays = SegmentArrays(comps)
+        self.model = model
+        self.index = arrays.index
+        self.price = arrays.price
+
+        now_ms = _epoch_ms(now)
+        self.days = (np.abs(now_ms - arrays.auction_ms) // MS_PER_DAY)[None, :]
+        age_target = np.array([abs(difference_in_months(now, c.reg_date)) for c in comps], dtype=np.float64)
+        self.months = np.abs(age_target[:, None] - arrays.age_at_sale[None, :])
+        self.months_sq = self.months * self.months
+        self.km = arrays.mileage[:, None] - arrays.mileage[None, :]
+        self.km_abs = np.abs(self.km)
+        self.accident = arrays.accident_free[:, None] != arrays.accident_free[None, :]
+        self.not_accepted = (~arrays.accepted)[None, :]
+
+        want8 = (arrays.tire == TIRE_CODES["8_tires"])[:, None]
+        has8 = (arrays.tire == TIRE_CODES["8_tires"])[None, :]
+        mismatch = arrays.tire[:, None] != arrays.tire[None, :]
+        self.tire = np.where(want8, np.where(has8, TIRE_NONE, TIRE_WANTS_8),
+                             np.where(has8, TIRE_WANTS_4, np.where(mismatch, TIRE_TYPE, TIRE_NONE))).astype(np.int8)
+
+        # +1: target has a hitch the comparable lacks, -1: the other way round
+        self.hitch = arrays.has_ahk[:, None].astype(np.float64) - arrays.has_ahk[None, :]
+
+        ids = np.array([c.row.get('auction_id') for c in comps], dtype=object)
+        self.excluded = ids[:, None] == ids[None, :]
+        np.fill_diagonal(self.excluded, True)
+
+    def __len__(self):
+        return len(self.index)
+
+    def predict(self, config, rows=None):
+        """
+        LOOCV prices of this segment's cars (or of `rows`, positions into the segment).
+        """
+        shared = config['shared']
+        cfg = model_config(config, self.model)
+        take = (lambda m: m) if rows is None else (lambda m: m[rows])
+
+        months = take(self.months)
+        score = self.days * shared['recencyPenalty']
+        score = score + (months * cfg['agePenalty'] + take(self.months_sq) * cfg['ageQuadratic'])
+        score = score + take(self.km_abs) * cfg['mileageDistancePenalty']
+        score = score + take(self.accident) * shared['accidentPenalty']
+        tire_penalty = np.array([0, shared['tireUserWants8Penalty'], shared['tireUserWants4Penalty'],
+                                 shared['tireTypePenalty']], dtype=np.float64)
+        score = score + tire_penalty[take(self.tire)]
+        score = score + self.not_accepted * shared['statusPenalty']
+        score = np.where(take(self.excluded), np.inf, score)
+
+        mileage_adj = -take(self.km) * cfg['mileageDepreciation']
+        adjustment = take(self.hitch) * shared['hitchValue'] + np.where(np.abs(mileage_adj) > 50, mileage_adj, 0)
+        adjusted = self.price[None, :] + adjustment
+
+        prices, _, _ = consensus_price(score, adjusted, shared['neighborCount'], shared['weightExponent'])
+        return prices
+
+class LoocvHarness:
+    """
+    Scores configs by LOOCV over an indexed dataset, reusing the pairwise terms across calls.
+    """
+
+    def __init__(self, engine, now=None):
+        self.now = now or utc_now()
+        self.segments = []
+        targets = []
+        for key, comps in engine.segments.items():
+            model, cluster = key[0], key[1]
+            if not cluster or cluster == "unknown":
+                continue
+            pairs = SegmentPairs(model, comps, self.now)
+            start = len(targets)
+            targets.extend(comps)
+            self.segments.append((pairs, start))
+        self.targets = targets
+        self.actual = np.array([c.price for c in targets], dtype=np.float64)
+        self.models = np.array([c.row['model'] for c in targets], dtype=object)
+
+    @classmethod
+    def from_csv(cls, path=DATASET_CSV, now=None):
+        return cls(ValuationEngine.from_csv(path), now=now)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def predict(self, config, sample=None):
+        """
+        LOOCV price of every target, in self.targets order. With `sample` (a
+        boolean mask over the targets) only those are priced; the rest are NaN.
+        The comparables are always the full segment.
+        """
+        prices = np.full(len(self.targets), np.nan)
+        for pairs, start in self.segments:
+            end = start + len(pairs)
+            if sample is None:
+                prices[start:end] = pairs.predict(config)
+                continue
+            rows = np.flatnonzero(sample[start:end])
+            if len(rows):
+                prices[start + rows] = pairs.predict(config, rows)
+        return prices
+
+    def errors(self, config, sample=None):
+        """
+        Capped absolute % error per target; NaN where the target was not scored.
+        """
+        predicted = self.predict(config, sample)
+        with np.errstate(invalid='ignore'):
+            pct = np.minimum(np.abs(predicted - self.actual) / self.actual * 100, ERROR_CAP)
+            return np.where(predicted > 0, pct, np.nan)
+
+    def evaluate(self, config=None, sample=None):
+        """
+        {'median', 'mean', 'count', 'models': {model: median}} for `config`
+        (VALUATION_CONFIG when omitted).
+        """
+        config = config if config is not None else load_valuation_config()
+        errors = self.errors(config, sample)
+        scored = ~np.isnan(errors)
+        if not scored.any():
+            return {'median': None, 'mean': None, 'count': 0, 'models': {}}
+        models = {}
+        for model in sorted(set(self.models[scored])):
+            models[model] = upper_median(errors[scored & (self.models == model)])
+        return {
+            'median': upper_median(errors[scored]),
+            'mean': float(errors[scored].mean()),
+            'count': int(scored.sum()),
+            'models': models,
+        }
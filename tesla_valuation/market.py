@@ -0,0 +1,301 @@
+"""
+Weekly market index: per-segment medians of age- and mileage-adjusted prices.
+
+predictPrice only sees market drift through recencyPenalty, and looking at
+the drift itself meant rescanning the dataset (check_dates.py,
+analyze_data.py). MarketIndex keeps, for every (segment, week) cell, a
+quantile sketch of highest_bid_price adjusted to a reference car of
+REFERENCE_AGE_MONTHS and REFERENCE_MILEAGE:
+
+    adjusted = price + (mileage - REFERENCE_MILEAGE) * mileageDepreciation
+                     - (age at sale - REFERENCE_AGE_MONTHS) * age slope
+
+mileageDepreciation is VALUATION_CONFIG's. The age slope (EUR per month)
+is fitted per model, within segments, when the index is built, and kept on
+incremental updates so every cell is adjusted alike.
+
+Sketches are log-bucketed (DDSketch-style): quantiles are within
+RELATIVE_ACCURACY of the exact ones, sketches merge by adding bucket
+counts, and a changed auction's old price can be taken back out. Each
+cell's count and median are kept current, so cell() is a dict lookup.
+
+Rows and segments follow the engine: rows predictPrice drops are left out,
+segments are (model, powertrain cluster, is_highland, is_vat), and a week
+starts on the Monday (UTC) of the auction end date.
+
+The index is saved next to the dataset as `<dataset>.market.json`, stamped
+with the dataset's size and mtime like the row index
+(tesla_valuation/incremental.py), so load() returns None for a stale one.
+transform_new_csv.py updates it with the rows an incremental run adds or
+changes and rebuilds it after a full run.
+"""
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+from .config import load_valuation_config, model_config
+from .dataset import DATASET_CSV, iter_clean_rows
+from .dates import parse_iso
+from .engine import ValuationEngine, segment_key
+from .incremental import _file_stamp
+
+FORMAT_VERSION = 1
+MARKET_SUFFIX = '.market.json'
+
+RELATIVE_ACCURACY = 0.005
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+MIN_PRICE = 100.0 # adjusted prices below this share its bucket
+
+# Dataset medians at the time of writing
+REFERENCE_AGE_MONTHS = 36
+REFERENCE_MILEAGE = 50000
+
+_LOG_GAMMA = math.log(GAMMA)
+
+def price_bucket(price):
+    return math.ceil(math.log(max(price, MIN_PRICE)) / _LOG_GAMMA)
+
+def bucket_price(bucket):
+    # Midpoint (in relative terms) of (GAMMA^(bucket-1), GAMMA^bucket]
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+def week_of(value):
+    """
+    Monday of the week of a date, datetime or ISO string (None if unparseable).
+    """
+    dt = parse_iso(value) if isinstance(value, str) else value
+    if dt is None:
+        return None
+    day = dt.date() if hasattr(dt, 'date') else dt
+    return day - timedelta(days=day.weekday())
+
+class PriceSketch:
+    """
+    Log-bucketed quantile sketch: bucket -> count.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = Counter(counts or {})
+        self.total = sum(self.counts.values())
+
+    def __len__(self):
+        return self.total
+
+    def add(self, bucket, n=1):
+        """
+        Adds n prices of one bucket; a negative n removes them.
+        """
+        self.counts[bucket] += n
+        self.total += n
+        if self.counts[bucket] <= 0:
+            del self.counts[bucket]
+
+    def merge(self, other):
+        for bucket, n in other.counts.items():
+            self.add(bucket, n)
+        return self
+
+    def quantile(self, q):
+        """
+        The value of rank floor(q * count) (q=0.5: the upper median), None if empty.
+        """
+        if not self.total:
+            return None
+        rank = min(self.total - 1, int(q * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return bucket_price(bucket)
+
+class MarketCell:
+    """
+    One segment-week: its sketch and the count and median derived from it.
+    """
+    __slots__ = ('sketch', 'count', 'median')
+
+    def __init__(self, sketch=None):
+        self.sketch = sketch if sketch is not None else PriceSketch()
+        self.refresh()
+
+    def refresh(self):
+        self.count = len(self.sketch)
+        self.median = self.sketch.quantile(0.5)
+
+def fit_age_slopes(comps, config):
+    """
+    EUR per month of age at sale, per model: least squares on mileage-adjusted
+    prices, centered within each segment so segment price levels do not leak in.
+    """
+    groups = defaultdict(list)
+    for comp in comps:
+        groups[comp.segment].append(comp)
+    sums = defaultdict(lambda: [0.0, 0.0])
+    for key, members in groups.items():
+        depreciation = model_config(config, key[0])['mileageDepreciation']
+        age = np.array([c.age_at_sale for c in members], dtype=np.float64)
+        price = np.array([c.price + (c.mileage - REFERENCE_MILEAGE) * depreciation for c in members])
+        age -= age.mean()
+        sums[key[0]][0] += float(age @ (price - price.mean()))
+        sums[key[0]][1] += float(age @ age)
+    return {model: (xy / xx if xx else 0.0) for model, (xy, xx) in sums.items()}
+
+class MarketIndex:
+    """
+    (segment, week) -> MarketCell for one dataset, updatable row by row.
+    """
+
+    def __init__(self, age_slopes, config=None):
+        self.config = config if config is not None else load_valuation_config()
+        self.age_slopes = age_slopes
+        self.cells = {}
+        # auction_id -> (segment, week, bucket) of its counted price
+        self.rows = {}
+
+    @classmethod
+    def build(cls, rows, config=None):
+        """
+        Index of cleaned dataset rows, fitting the age slopes on them.
+        """
+        config = config if config is not None else load_valuation_config()
+        entries = []
+        for row in rows:
+            comp = ValuationEngine._comparable(row, len(entries))
+            if comp is not None:
+                entries.append((row.get('auction_id'), comp))
+        index = cls(fit_age_slopes([comp for _, comp in entries], config), config)
+        index._apply(entries)
+        return index
+
+    @classmethod
+    def from_csv(cls, path=DATASET_CSV, config=None):
+        return cls.build(iter_clean_rows(path), config=config)
+
+    def adjusted_price(self, comp):
+        model = comp.segment[0]
+        depreciation = model_config(self.config, model)['mileageDepreciation']
+        return (comp.price + (comp.mileage - REFERENCE_MILEAGE) * depreciation
+                - (comp.age_at_sale - REFERENCE_AGE_MONTHS) * self.age_slopes.get(model, 0.0))
+
+    def _apply(self, entries):
+        touched = set()
+        for auction_id, comp in entries:
+            if auction_id:
+                touched.update(self._remove(auction_id))
+            if comp is None:
+                continue
+            key = (comp.segment, week_of(comp.auction_date))
+            bucket = price_bucket(self.adjusted_price(comp))
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = MarketCell()
+            cell.sketch.add(bucket)
+            touched.add(key)
+            if auction_id:
+                self.rows[auction_id] = (comp.segment, key[1], bucket)
+        for key in touched:
+            cell = self.cells[key]
+            if len(cell.sketch):
+                cell.refresh()
+            else:
+                del self.cells[key]
+        return touched
+
+    def _remove(self, auction_id):
+        counted = self.rows.pop(auction_id, None)
+        if counted is None:
+            return ()
+        segment, week, bucket = counted
+        self.cells[(segment, week)].sketch.add(bucket, -1)
+        return ((segment, week),)
+
+    def update(self, rows, removed=()):
+        """
+        Counts cleaned dataset rows, replacing the earlier price of the same
+        auction_id, and drops the `removed` auction_ids. Rows without an
+        auction_id are added and cannot be replaced later. Returns the
+        (segment, week) keys that changed.
+        """
+        entries = [(auction_id, None) for auction_id in removed]
+        for row in rows:
+            comp = ValuationEngine._comparable(row, 0)
+            entries.append((row.get('auction_id'), comp))
+        return self._apply(entries)
+
+    def cell(self, segment, day):
+        """
+        MarketCell of the week containing `day`, None if that week has no sales.
+        """
+        return self.cells.get((segment, week_of(day)))
+
+    def drift(self, segment, day, base_day):
+        """
+        Median adjusted price in the week of `day` over the one in the week
+        of `base_day`; None unless both weeks have sales.
+        """
+        cell, base = self.cell(segment, day), self.cell(segment, base_day)
+        if cell is None or base is None:
+            return None
+        return cell.median / base.median
+
+    def segments(self):
+        return sorted({segment for segment, _ in self.cells}, key=repr)
+
+    def series(self, segments):
+        """
+        [(week, count, median)] of the given segments merged, by week.
+        """
+        wanted = set(segments)
+        merged = defaultdict(PriceSketch)
+        for (segment, week), cell in self.cells.items():
+            if segment in wanted:
+                merged[week].merge(cell.sketch)
+        return [(week, len(sketch), sketch.quantile(0.5)) for week, sketch in sorted(merged.items())]
+
+    @classmethod
+    def load(cls, data_path, config=None):
+        """
+        The index saved for `data_path`, or None when it is missing or stale.
+        """
+        path = data_path + MARKET_SUFFIX
+        if not os.path.exists(path) or not os.path.exists(data_path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if (payload.get('version') != FORMAT_VERSION or payload.get('relative_accuracy') != RELATIVE_ACCURACY
+                or payload.get('reference') != [REFERENCE_AGE_MONTHS, REFERENCE_MILEAGE]
+                or list(_file_stamp(data_path)) != payload.get('stamp')):
+            return None
+        index = cls(payload['age_slopes'], config)
+        keys = []
+        for entry in payload['cells']:
+            key = (segment_key(*entry['segment']), date.fromisoformat(entry['week']))
+            index.cells[key] = MarketCell(PriceSketch({int(b): n for b, n in entry['buckets'].items()}))
+            keys.append(key)
+        index.rows = {auction_id: (*keys[cell], bucket) for auction_id, (cell, bucket) in payload['rows'].items()}
+        return index
+
+    def save(self, data_path):
+        keys = sorted(self.cells, key=repr)
+        numbers = {key: i for i, key in enumerate(keys)}
+        payload = {
+            'version': FORMAT_VERSION,
+            'stamp': list(_file_stamp(data_path)),
+            'relative_accuracy': RELATIVE_ACCURACY,
+            'reference': [REFERENCE_AGE_MONTHS, REFERENCE_MILEAGE],
+            'age_slopes': self.age_slopes,
+            'cells': [{'segment': list(segment), 'week': week.isoformat(), 'count': self.cells[(segment, week)].count,
+                       'median': self.cells[(segment, week)].median,
+                       'buckets': {str(b): n for b, n in sorted(self.cells[(segment, week)].sketch.counts.items())}}
+                      for segment, week in keys],
+            'rows': {auction_id: [numbers[(segment, week)], bucket]
+                     for auction_id, (segment, week, bucket) in self.rows.items()},
+        }
+        path = data_path + MARKET_SUFFIX
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,162 @@
+"""
+Pruned nearest-neighbour search over one segment's comparables.
+
+ValuationEngine.predict only needs the neighborCount*3 best-scoring
+comparables of a segment, but a full scan scores and sorts all of them.
+Every term of the score is either a non-negative constant (accident, tire,
+status) or a non-negative weight times a gap that grows with distance:
+days between the valuation and the auction, months of age at sale, km. A
+group of comparables therefore cannot score below the penalties of the
+point of its bounding box nearest the query.
+
+SegmentIndex tiles a segment into cells of about LEAF_SIZE comparables
+(sorted by age at sale, then auction date, then mileage, sort-tile-recursive
+style) and keeps each cell's bounds. A query visits cells in order of that
+lower bound, scores their members exactly and keeps the k best in a bounded
+heap, stopping at the first cell whose bound exceeds the current k-th best
+score.
+
+Scores are summed in predictPrice's order with the engine's arithmetic
+(whole days of integer microseconds, as differenceInDays truncates), and
+ties are broken by comparable index, so the result is exactly the first k
+of the engine's stable sort of the whole segment.
+"""
+import heapq
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .dates import UTC
+
+LEAF_SIZE = 64
+US_PER_DAY = 86_400_000_000
+SHARED_PENALTIES = ('recencyPenalty', 'accidentPenalty', 'tireUserWants8Penalty', 'tireUserWants4Penalty',
+                    'tireTypePenalty', 'statusPenalty')
+MODEL_PENALTIES = ('agePenalty', 'ageQuadratic', 'mileageDistancePenalty')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _epoch_us(dt):
+    return (dt - _EPOCH) // _MICROSECOND
+
+def prunable(shared, model_cfg):
+    """
+    Whether cell lower bounds are valid for this config: no penalty weight is negative.
+    """
+    return (all(shared[name] >= 0 for name in SHARED_PENALTIES)
+            and all(model_cfg[name] >= 0 for name in MODEL_PENALTIES))
+
+def _tile(keys, leaf_size):
+    # Sort-tile-recursive: equal-count slabs along each key in turn
+    n = len(keys[0])
+    slabs = max(1, math.ceil((n / leaf_size) ** (1 / len(keys))))
+    cells = [np.arange(n)]
+    for key in keys:
+        split = []
+        for cell in cells:
+            cell = cell[np.argsort(key[cell], kind='stable')]
+            size = max(1, math.ceil(len(cell) / slabs))
+            split.extend(cell[i:i + size] for i in range(0, len(cell), size))
+        cells = split
+    return cells
+
+class SegmentIndex:
+    """
+    One segment's comparables, grouped into cells with their bounds on
+    age at sale, auction time and mileage.
+    """
+
+    def __init__(self, comps, leaf_size=LEAF_SIZE):
+        auction_us = np.array([_epoch_us(c.auction_date) for c in comps], dtype=np.int64)
+        age_at_sale = np.array([c.age_at_sale for c in comps], dtype=np.float64)
+        mileage = np.array([c.mileage for c in comps], dtype=np.float64)
+        cells = _tile((age_at_sale, auction_us, mileage), leaf_size) if comps else []
+        order = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+
+        # Members of a cell are contiguous, so scoring one is a slice
+        self.comps = [comps[i] for i in order]
+        self.index = np.array([c.index for c in self.comps], dtype=np.int64)
+        self.auction_us = auction_us[order]
+        self.age_at_sale = age_at_sale[order]
+        self.mileage = mileage[order]
+        self.accident_free = np.array([c.accident_free for c in self.comps], dtype=bool)
+        self.tire_codes = {option: code for code, option in enumerate(sorted({c.tire_option for c in comps}))}
+        self.tire = np.array([self.tire_codes[c.tire_option] for c in self.comps], dtype=np.int8)
+        self.accepted = np.array([c.accepted for c in self.comps], dtype=bool)
+
+        self.starts = np.cumsum([0] + [len(cell) for cell in cells]).tolist()
+        heads = np.array(self.starts[:-1], dtype=np.int64)
+        bounds = {}
+        for name in ('auction_us', 'age_at_sale', 'mileage'):
+            values = getattr(self, name)
+            bounds[name] = ((np.minimum.reduceat(values, heads), np.maximum.reduceat(values, heads))
+                            if len(heads) else (values, values))
+        self.auction_lo, self.auction_hi = bounds['auction_us']
+        self.age_lo, self.age_hi = bounds['age_at_sale']
+        self.mileage_lo, self.mileage_hi = bounds['mileage']
+
+    def __len__(self):
+        return len(self.comps)
+
+    def lower_bounds(self, query, now_us, shared, model_cfg):
+        """
+        Per cell, the smallest score any member can have for `query`.
+        """
+        gap_us = np.maximum(np.maximum(self.auction_lo - now_us, now_us - self.auction_hi), 0)
+        bound = (gap_us // US_PER_DAY) * shared['recencyPenalty']
+        months = np.maximum(np.maximum(self.age_lo - query.age_target, query.age_target - self.age_hi), 0)
+        bound = bound + (months * model_cfg['agePenalty'] + (months * months) * model_cfg['ageQuadratic'])
+        km = np.maximum(np.maximum(self.mileage_lo - query.mileage, query.mileage - self.mileage_hi), 0)
+        return bound + km * model_cfg['mileageDistancePenalty']
+
+    def scores(self, query, now_us, start, end, shared, model_cfg):
+        """
+        Exact scores of members start:end, as ValuationEngine.score sums them.
+        """
+        days = np.abs(now_us - self.auction_us[start:end]) // US_PER_DAY
+        score = days * shared['recencyPenalty']
+        months = np.abs(query.age_target - self.age_at_sale[start:end])
+        score = score + (months * model_cfg['agePenalty'] + (months * months) * model_cfg['ageQuadratic'])
+        score = score + np.abs(query.mileage - self.mileage[start:end]) * model_cfg['mileageDistancePenalty']
+        score = score + (self.accident_free[start:end] != query.is_accident_free) * shared['accidentPenalty']
+
+        has8 = self.tire[start:end] == self.tire_codes.get("8_tires", -1)
+        if query.tire_option == "8_tires":
+            tire = np.where(has8, 0, shared['tireUserWants8Penalty'])
+        else:
+            # Options no comparable has never match, like the JS string compare
+            mismatch = self.tire[start:end] != self.tire_codes.get(query.tire_option, -1)
+            tire = np.where(has8, shared['tireUserWants4Penalty'], np.where(mismatch, shared['tireTypePenalty'], 0))
+        score = score + tire
+        return score + (~self.accepted[start:end]) * shared['statusPenalty']
+
+    def nearest(self, query, k, shared, model_cfg):
+        """
+        The k comparables ranked first for `query` (an engine Query), best
+        first, ties in dataset order. Requires prunable(shared, model_cfg).
+        """
+        if k <= 0:
+            return []
+        now_us = _epoch_us(query.now)
+        bounds = self.lower_bounds(query, now_us, shared, model_cfg)
+        order = np.argsort(bounds, kind='stable')
+
+        # Max-heap of (-score, -index, position): the worst kept candidate on top
+        heap = []
+        for cell, lower in zip(order.tolist(), bounds[order].tolist()):
+            # A member scoring equal to the k-th best could still win on index
+            if len(heap) == k and lower > -heap[0][0]:
+                break
+            start, end = self.starts[cell], self.starts[cell + 1]
+            scores = self.scores(query, now_us, start, end, shared, model_cfg)
+            members = range(end - start) if len(heap) < k else np.flatnonzero(scores <= -heap[0][0]).tolist()
+            for j in members:
+                entry = (-float(scores[j]), -int(self.index[start + j]), start + j)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+        heap.sort(reverse=True)
+        return [self.comps[position] for _, _, position in heap]
@@ -0,0 +1,209 @@
+"""
+Powertrain clusters, mirroring getPowertrainCluster in src/utils/valuation.js.
+
+The clusters are a declarative rule table (CLUSTER_RULES): the first rule a
+car matches names its cluster. get_powertrain_cluster() applies it to one
+car; assign_clusters() to whole columns at once, which is how the dataset's
+powertrain_cluster column is filled (scripts/transform_new_csv.py,
+scripts/cluster_powertrains.py), so consumers read the cluster instead of
+recomputing it per row.
+
+derive_rules() proposes a table from the data instead: kW and kWh
+boundaries at the valleys of each model's value density.
+"""
+import math
+from collections import Counter
+
+import numpy as np
+
+CLUSTER_COLUMN = 'powertrain_cluster'
+UNKNOWN = "unknown"
+
+class ClusterRule:
+    """
+    One row of the rule table. kW and battery bounds are [min, max), None
+    meaning open-ended; drive_type and highland (True/False) only constrain
+    when set.
+    """
+    __slots__ = ('model', 'cluster', 'kw_min', 'kw_max', 'battery_min', 'battery_max',
+                 'drive_type', 'highland')
+
+    def __init__(self, model, cluster, kw=(None, None), battery=(None, None),
+                 drive_type=None, highland=None):
+        self.model = model
+        self.cluster = cluster
+        self.kw_min, self.kw_max = kw
+        self.battery_min, self.battery_max = battery
+        self.drive_type = drive_type
+        self.highland = highland
+
+    def matches(self, model, kw, battery, drive_type=None, highland=None):
+        return (model == self.model
+                and (self.kw_min is None or kw >= self.kw_min)
+                and (self.kw_max is None or kw < self.kw_max)
+                and (self.battery_min is None or battery >= self.battery_min)
+                and (self.battery_max is None or battery < self.battery_max)
+                and (self.drive_type is None or drive_type == self.drive_type)
+                and (self.highland is None or highland == self.highland))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ClusterRule({self.model!r}, {self.cluster!r}, kw=[{self.kw_min}, {self.kw_max}), " \
+               f"battery=[{self.battery_min}, {self.battery_max}))"
+
+# First match wins, so m3_p has to come before the wider m3_lr
+CLUSTER_RULES = [
+    ClusterRule("Model 3", "m3_sr", kw=(None, 250), battery=(None, 65)),
+    ClusterRule("Model 3", "m3_p", kw=(370, None), battery=(70, None)),
+    ClusterRule("Model 3", "m3_lr", kw=(250, None), battery=(70, None)),
+    # Highland Long Range RWD: big battery, ~235 kW
+    ClusterRule("Model 3", "m3_lr_rwd", kw=(220, 250), battery=(70, None)),
+    ClusterRule("Model Y", "my_sr", kw=(None, 250), battery=(None, 65)),
+    ClusterRule("Model Y", "my_lr", kw=(250, 390), battery=(70, None)),
+    ClusterRule("Model Y", "my_p", kw=(390, None), battery=(70, None)),
+]
+
+# Labels of POWERTRAIN_OPTIONS in src/utils/valuation.js
+CLUSTER_LABELS = {
+    "m3_sr": "Standard Range / RWD",
+    "m3_lr_rwd": "Long Range / RWD",
+    "m3_lr": "Long Range / AWD",
+    "m3_p": "Performance",
+    "my_sr": "Standard Range / RWD",
+    "my_lr": "Long Range / AWD",
+    "my_p": "Performance",
+}
+
+def get_powertrain_cluster(model, kw, battery, drive_type=None, highland=None, rules=CLUSTER_RULES):
+    """
+    Cluster id for a car's (model, powe_kw, battery_netto).
+    None when kW or battery is missing, "unknown" when no cluster matches.
+    """
+    if not kw or not battery:
+        return None
+    for rule in rules:
+        if rule.matches(model, kw, battery, drive_type, highland):
+            return rule.cluster
+    return UNKNOWN
+
+def row_cluster(row):
+    """
+    The cluster of a cleaned dataset row (numbers as clean_row() leaves
+    them): its powertrain_cluster column, or computed for rows from before
+    that column.
+    """
+    # An empty cell means kW or battery is missing, which recomputes to None
+    return row.get(CLUSTER_COLUMN) or get_powertrain_cluster(row.get('model'), row['powe_kw'], row['battery_netto'])
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _as_numbers(values):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # CSV text: '' and unparseable cells become NaN
+        return np.array([_number(v) for v in values], dtype=np.float64)
+
+def assign_clusters(models, kw, battery, drive_types=None, highland=None, rules=CLUSTER_RULES):
+    """
+    get_powertrain_cluster() over whole columns: an object array of cluster
+    ids (None where kW or battery is missing, empty or zero). Numbers may be
+    given as text; they are cleaned like dataset.clean_row() (kW truncated,
+    battery rounded) before matching. drive_types and highland are only
+    needed by rules that constrain them, highland as booleans.
+    """
+    models = np.asarray(models, dtype=object)
+    kw = np.trunc(_as_numbers(kw))
+    battery = np.round(_as_numbers(battery))
+    clusters = np.full(len(models), UNKNOWN, dtype=object)
+    missing = np.isnan(kw) | np.isnan(battery) | (kw == 0) | (battery == 0)
+    clusters[missing] = None
+
+    open_rows = ~missing
+    model_rows = {}
+    for rule in rules:
+        if rule.model not in model_rows:
+            model_rows[rule.model] = models == rule.model
+        hit = open_rows & model_rows[rule.model]
+        if rule.kw_min is not None:
+            hit &= kw >= rule.kw_min
+        if rule.kw_max is not None:
+            hit &= kw < rule.kw_max
+        if rule.battery_min is not None:
+            hit &= battery >= rule.battery_min
+        if rule.battery_max is not None:
+            hit &= battery < rule.battery_max
+        if rule.drive_type is not None:
+            if drive_types is None:
+                raise ValueError(f"Rule {rule!r} needs drive_types")
+            hit &= np.asarray(drive_types, dtype=object) == rule.drive_type
+        if rule.highland is not None:
+            if highland is None:
+                raise ValueError(f"Rule {rule!r} needs highland")
+            hit &= np.asarray(highland, dtype=bool) == rule.highland
+        clusters[hit] = rule.cluster
+        open_rows &= ~hit
+    return clusters
+
+def density_boundaries(values, bandwidth, depth=0.5, step=1.0):
+    """
+    Cut points between the modes of `values`: the lowest point of a Gaussian
+    kernel density between two neighbouring peaks, kept when it falls below
+    `depth` times the smaller of the two peaks.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return []
+    grid = np.arange(values.min() - 3 * bandwidth, values.max() + 3 * bandwidth + step, step)
+    distinct, counts = np.unique(values, return_counts=True)
+    density = (counts[None, :] * np.exp(-0.5 * ((grid[:, None] - distinct[None, :]) / bandwidth) ** 2)).sum(axis=1)
+
+    rising = np.diff(density) > 0
+    peaks = [i + 1 for i in range(len(rising) - 1) if rising[i] and not rising[i + 1]]
+    cuts = []
+    for left, right in zip(peaks, peaks[1:]):
+        valley = left + int(np.argmin(density[left:right + 1]))
+        if density[valley] < depth * min(density[left], density[right]):
+            cuts.append(round(float(grid[valley])))
+    return cuts
+
+def _bands(cuts):
+    edges = [None] + list(cuts) + [None]
+    return list(zip(edges, edges[1:]))
+
+def _band_name(band, unit):
+    low, high = band
+    if low is None:
+        return f"lt{high}{unit}"
+    if high is None:
+        return f"ge{low}{unit}"
+    return f"{low}-{high}{unit}"
+
+def derive_rules(models, kw, battery, kw_bandwidth=10.0, battery_bandwidth=2.0, min_count=5):
+    """
+    A rule table from the data: per model, kW and battery bands split at
+    density_boundaries(), one cluster per (kW band, battery band) holding at
+    least `min_count` cars. Ids read like 'model_3_281-344kw_ge65kwh'.
+    """
+    models = np.asarray(models, dtype=object)
+    kw = np.trunc(_as_numbers(kw))
+    battery = np.round(_as_numbers(battery))
+    known = ~(np.isnan(kw) | np.isnan(battery) | (kw == 0) | (battery == 0))
+
+    candidates = []
+    for model in sorted({m for m in models[known] if isinstance(m, str)}):
+        rows = known & (models == model)
+        prefix = model.lower().replace(' ', '_')
+        for kw_band in _bands(density_boundaries(kw[rows], kw_bandwidth)):
+            for battery_band in _bands(density_boundaries(battery[rows], battery_bandwidth)):
+                cluster = f"{prefix}_{_band_name(kw_band, 'kw')}_{_band_name(battery_band, 'kwh')}"
+                candidates.append(ClusterRule(model, cluster, kw=kw_band, battery=battery_band))
+    counts = Counter(assign_clusters(models, kw, battery, rules=candidates))
+    return [rule for rule in candidates if counts[rule.cluster] >= min_count]
@@ -0,0 +1,164 @@
+"""
+Pricing image: the engine's comparables as one mmap'd file of column arrays.
+
+A process pool of pricers would otherwise parse the dataset (68 fields a
+row, free text included) and build a ValuationEngine in every worker.
+write_image() stores what BatchPricer scores instead, once:
+
+    <dir>/manifest.json   row count, per-column layout, segment ranges, image name
+    <dir>/image.<n>.bin   fixed-width little-endian arrays, 8-byte aligned
+
+Comparables are grouped by segment, in dataset order within each, so a
+segment's SegmentArrays are slices of the file's columns. PricingImage maps
+the image the manifest names read-only and hands out numpy views of it:
+workers that open the same image share its pages through the OS page cache,
+and opening one costs reading the manifest, not parsing rows.
+
+Each write goes to a new image.<n>.bin and the manifest is replaced last, so
+a reader always gets a manifest and an image of the same write, and a pool
+still mapping the previous image keeps its pages. Images older than the
+previous one are deleted. Neighbour indices in a
+BatchResult translate to auction ids with auction_ids().
+"""
+import json
+import mmap
+import os
+import re
+import sys
+
+import numpy as np
+
+from .batch import SegmentArrays
+from .config import load_valuation_config
+from .engine import segment_key
+
+FORMAT_VERSION = 2
+MANIFEST = 'manifest.json'
+IMAGE_PATTERN = re.compile(r'image\.(\d+)\.bin$')
+
+# SegmentArrays attribute -> dtype, in segment order
+SEGMENT_COLUMNS = {
+    'index': np.int64,
+    'auction_ms': np.int64,
+    'age_at_sale': np.float64,
+    'mileage': np.float64,
+    'price': np.float64,
+    'accident_free': np.bool_,
+    'has_ahk': np.bool_,
+    'accepted': np.bool_,
+    'tire': np.int8,
+}
+
+if sys.byteorder != 'little':
+    raise ImportError("tesla_valuation.pricing_image assumes a little-endian host")
+
+def write_image(engine, out_dir):
+    """
+    Writes `engine`'s comparables to `out_dir`. Returns the manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    keys = sorted((key for key, comps in engine.segments.items() if comps), key=repr)
+    columns = {name: [] for name in SEGMENT_COLUMNS}
+    segments = []
+    start = 0
+    for key in keys:
+        arrays = SegmentArrays(engine.segments[key])
+        for name in SEGMENT_COLUMNS:
+            columns[name].append(getattr(arrays, name))
+        segments.append({'key': list(key), 'start': start, 'length': len(arrays)})
+        start += len(arrays)
+
+    # Indexed by comparable index (None slots stay empty)
+    ids = [(c.row.get('auction_id') or '').encode('utf-8') if c is not None else b'' for c in engine.comparables]
+    width = max((len(i) for i in ids), default=0) or 1
+    arrays = {name: np.concatenate(parts).astype(SEGMENT_COLUMNS[name]) if parts
+              else np.empty(0, dtype=SEGMENT_COLUMNS[name]) for name, parts in columns.items()}
+    arrays['auction_id'] = np.array(ids, dtype=f'S{width}')
+
+    generations = sorted(int(m.group(1)) for m in map(IMAGE_PATTERN.match, os.listdir(out_dir)) if m)
+    generation = generations[-1] + 1 if generations else 1
+    image = f'image.{generation}.bin'
+    layout = {}
+    bin_path = os.path.join(out_dir, image)
+    with open(bin_path + '.tmp', 'wb') as f:
+        for name, values in arrays.items():
+            f.write(b'\0' * (-f.tell() % 8))
+            layout[name] = {'dtype': values.dtype.str, 'offset': f.tell(), 'length': len(values)}
+            f.write(values.tobytes())
+
+    manifest = {'version': FORMAT_VERSION, 'image': image, 'rows': start, 'indices': len(engine.comparables),
+                'columns': layout, 'segments': segments}
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    # Manifest last, so readers never see it pointing at a half-written image
+    os.replace(bin_path + '.tmp', bin_path)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    # Keep the previous image for readers that read the old manifest just now
+    for old in generations[:-1]:
+        try:
+            os.remove(os.path.join(out_dir, f'image.{old}.bin'))
+        except OSError:
+            # Still mapped on a platform that refuses to delete it; next write retries
+            pass
+    return manifest
+
+class PricingImage:
+    """
+    Read-only, zero-copy view of a written image. Pass it to BatchPricer in
+    place of an engine.
+    """
+
+    def __init__(self, path, config=None):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported pricing image version: {manifest.get('version')}")
+        self.manifest = manifest
+        self.config = config if config is not None else load_valuation_config()
+        self.size = manifest['rows']
+        self._file = open(os.path.join(path, manifest['image']), 'rb')
+        length = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if length else None
+        self.columns = {name: self._column(spec) for name, spec in manifest['columns'].items()}
+        self.ranges = {segment_key(*seg['key']): (seg['start'], seg['length']) for seg in manifest['segments']}
+
+    def _column(self, spec):
+        dtype = np.dtype(spec['dtype'])
+        if self._mmap is None or not spec['length']:
+            return np.empty(0, dtype=dtype)
+        return np.frombuffer(self._mmap, dtype=dtype, count=spec['length'], offset=spec['offset'])
+
+    def segment_arrays(self, key):
+        """
+        SegmentArrays of one segment, as views into the image.
+        """
+        start, length = self.ranges.get(key, (0, 0))
+        arrays = SegmentArrays.__new__(SegmentArrays)
+        for name in SEGMENT_COLUMNS:
+            setattr(arrays, name, self.columns[name][start:start + length])
+        return arrays
+
+    def auction_ids(self, indices):
+        """
+        Auction ids of comparable indices (BatchResult.neighbors rows), -1 skipped.
+        """
+        ids = self.columns['auction_id']
+        return [ids[j].decode('utf-8') for j in indices if j >= 0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.columns = {}
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views handed out keep the mapping alive
+                pass
+        self._file.close()
@@ -0,0 +1,321 @@
+"""
+Compact typed record for dataset rows (tesla_data_with_highland_flag.csv).
+
+A csv.DictReader row is a 67-key dict of fresh strings, several kilobytes
+per auction, and every consumer re-parses the numbers, 't'/'f' flags and
+dates it needs. AuctionRecord is a __slots__ object holding each field
+decoded once:
+
+    INT        int                       mileage, powe_kw, tire flags, counts
+    NUMBER     int or float              battery sizes, prices
+    FLAG       True/False <- 't'/'f'     equipment and accident flags
+    BOOLEAN    True/False <- 'TRUE'/...  is_highland
+    DATE       datetime.date             first_registration
+    TIMESTAMP  aware UTC datetime        auction start/end ('... hh:mm:ss+00')
+    CATEGORY   str, one shared object per distinct value
+    TEXT       str
+
+Empty cells are None. A value is only decoded if encoding it gives back the
+exact text (so '075' or '78.10' stay strings); records therefore write out
+byte for byte what they were read from. Decoding is memoized per distinct
+text, which also shares the decoded objects between records. The
+activated/created/bid timestamps are unique per auction and read by no
+script, so they stay TEXT rather than paying for a parse per row.
+
+Pass-through code (the export transform, the JSON conversion) builds
+records with decode=False: every field then holds its text, which encodes
+to itself, so nothing is parsed that is only going to be written back.
+
+The dataset header lists 'upholstery' twice. Records have a single
+upholstery field, written to both columns so the file layout is unchanged.
+"""
+import csv
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from operator import attrgetter
+
+from .dataset import DATASET_CSV
+from .powertrain import CLUSTER_COLUMN, row_cluster
+
+# Dataset CSV layout (transform_new_csv.py writes it, everything else reads it)
+COLUMNS = [
+    'make', 'model', 'variant', 'mileage', 'first_registration', 'powe_kw',
+    'drive_type', 'features_autopilot', 'tires_summer', 'tires_winter',
+    'tires_all_season', 'tires_total_sets', 'features_heatpump',
+    'features_pano_roof', 'features_trailer_hitch', 'battery_netto',
+    'battery_brutto', 'color', 'upholstery', 'taxation', 'accident_free',
+    'number_of_keys', 'damage_description', 'auction_start_date',
+    'auction_end_date', 'status', 'highest_bid_price', 'number_of_bids',
+    'list_price', 'acc', 'number_of_seats', 'electric_seats', 'leather_seats',
+    'head_up_display', 'seat_heating', 'sport_seat_type', 'heated_steering_wheel',
+    'sport_steering_wheel', 'leather_steering_wheel', 'camera_type',
+    'trailer_hitch_seller', 'paint_color', 'upholstery', 'equipment',
+    'charging_cables', 'document_type', 'documents', 'form_of_ownership',
+    'seller_type', 'special_equipment_price', 'accident_free_cardentity',
+    'service_maintained', 'smoker_car', 'pet_car', 'auction_id',
+    'auction_short_id', 'auction_sequence', 'activated_at',
+    'auction_created_at', 'highest_bider_id', 'highest_bid_at',
+    'bids_count_calc', 'max_bid_offer_amount', 'min_bid_offer_amount',
+    'last_bid_at', 'is_highland', 'highland_logic_reason', 'powertrain_cluster'
+]
+# Unique field names, in DictReader key order
+FIELDS = tuple(dict.fromkeys(COLUMNS))
+
+CODEC_CACHE_SIZE = 1 << 16
+
+def _parse_number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def _parse_flag(text):
+    if text == 't':
+        return True
+    if text == 'f':
+        return False
+    raise ValueError(text)
+
+def _parse_boolean(text):
+    if text == 'TRUE':
+        return True
+    if text == 'FALSE':
+        return False
+    raise ValueError(text)
+
+def parse_timestamp(text):
+    """
+    'YYYY-MM-DD hh:mm:ss[.fff]+00' -> aware UTC datetime. Raises ValueError otherwise.
+    """
+    if not text.endswith('+00'):
+        raise ValueError(text)
+    base, _, fraction = text[:-3].partition('.')
+    dt = datetime.fromisoformat(base)
+    if fraction:
+        if not fraction.isdigit() or len(fraction) > 6:
+            raise ValueError(text)
+        dt = dt.replace(microsecond=int(fraction.ljust(6, '0')))
+    return dt.replace(tzinfo=timezone.utc)
+
+def format_timestamp(dt):
+    # isoformat() is several times faster than strftime(); drop its '+00:00'
+    text = dt.isoformat(' ')[:-6]
+    if dt.microsecond:
+        text = text.rstrip('0')
+    return text + '+00'
+
+def _flag_text(value):
+    return 't' if value else 'f'
+
+def _boolean_text(value):
+    return 'TRUE' if value else 'FALSE'
+
+class Codec:
+    """
+    decode(text) -> typed value (None if empty, the text itself if it does
+    not round-trip); encode(value) -> text.
+    """
+
+    def __init__(self, name, parse=None, to_text=str, cached=True):
+        self.name = name
+        self.to_text = to_text
+
+        def decode(text):
+            if not text:
+                return None
+            if parse is None:
+                return text
+            try:
+                value = parse(text)
+            except ValueError:
+                return text
+            return value if to_text(value) == text else text
+
+        self.decode = lru_cache(maxsize=CODEC_CACHE_SIZE)(decode) if cached else decode
+
+    def encode(self, value):
+        if value is None:
+            return ''
+        if value.__class__ is str:
+            return value
+        return self.to_text(value)
+
+INT = Codec('int', int)
+NUMBER = Codec('number', _parse_number)
+FLAG = Codec('flag', _parse_flag, _flag_text)
+BOOLEAN = Codec('boolean', _parse_boolean, _boolean_text)
+DATE = Codec('date', date.fromisoformat, date.isoformat)
+TIMESTAMP = Codec('timestamp', parse_timestamp, format_timestamp)
+CATEGORY = Codec('category')
+TEXT = Codec('text', cached=False)
+
+FIELD_CODECS = {
+    'mileage': INT, 'powe_kw': INT, 'tires_summer': INT, 'tires_winter': INT,
+    'tires_all_season': INT, 'tires_total_sets': INT, 'number_of_bids': INT,
+    'number_of_seats': INT, 'auction_sequence': INT, 'bids_count_calc': INT,
+    'battery_netto': NUMBER, 'battery_brutto': NUMBER, 'highest_bid_price': NUMBER,
+    'list_price': NUMBER, 'special_equipment_price': NUMBER,
+    'max_bid_offer_amount': NUMBER, 'min_bid_offer_amount': NUMBER,
+    'features_heatpump': FLAG, 'features_pano_roof': FLAG, 'features_trailer_hitch': FLAG,
+    'accident_free': FLAG, 'accident_free_cardentity': FLAG, 'trailer_hitch_seller': FLAG,
+    'electric_seats': FLAG, 'leather_seats': FLAG, 'head_up_display': FLAG,
+    'heated_steering_wheel': FLAG, 'sport_steering_wheel': FLAG, 'leather_steering_wheel': FLAG,
+    'service_maintained': FLAG, 'smoker_car': FLAG, 'pet_car': FLAG,
+    'is_highland': BOOLEAN,
+    'first_registration': DATE,
+    'auction_start_date': TIMESTAMP, 'auction_end_date': TIMESTAMP,
+    'activated_at': TEXT, 'auction_created_at': TEXT, 'highest_bid_at': TEXT, 'last_bid_at': TEXT,
+    'damage_description': TEXT, 'auction_id': TEXT, 'auction_short_id': TEXT,
+}
+CODECS = tuple(FIELD_CODECS.get(name, CATEGORY) for name in FIELDS)
+
+_get_fields = attrgetter(*FIELDS)
+_FIELD_TO_TEXT = tuple(codec.to_text for codec in CODECS)
+_get_columns = attrgetter(*COLUMNS)
+_COLUMN_TO_TEXT = tuple(FIELD_CODECS.get(name, CATEGORY).to_text for name in COLUMNS)
+
+@lru_cache(maxsize=None)
+def _row_plan(columns):
+    # (field, decode) per CSV column, and the fields no column provides
+    plan = tuple((name, FIELD_CODECS.get(name, CATEGORY).decode) for name in columns)
+    missing = tuple(name for name in FIELDS if name not in columns)
+    return plan, missing
+
+class AuctionRecord:
+    """
+    One dataset row with typed fields. AuctionRecord(**fields) leaves the
+    fields not given as None.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown AuctionRecord fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_row(cls, values, columns=tuple(COLUMNS), decode=True):
+        """
+        Builds a record from one csv.reader row laid out as `columns` (a tuple).
+        Repeated columns take the last value and short rows are padded with
+        None, as csv.DictReader does.
+        """
+        plan, missing = _row_plan(columns)
+        record = cls.__new__(cls)
+        if decode:
+            for (name, decode), text in zip(plan, values):
+                # Empty cells are the commonest; skip the codec call for them
+                setattr(record, name, decode(text) if text else None)
+        else:
+            for (name, _), text in zip(plan, values):
+                setattr(record, name, text)
+        for name, _ in plan[len(values):]:
+            setattr(record, name, None)
+        for name in missing:
+            setattr(record, name, None)
+        return record
+
+    def to_row(self):
+        """
+        The record as CSV cells in COLUMNS order.
+        """
+        # Codec.encode inlined: most cells are text or empty
+        return [
+            value if value.__class__ is str else '' if value is None else to_text(value)
+            for to_text, value in zip(_COLUMN_TO_TEXT, _get_columns(self))
+        ]
+
+    def to_dict(self):
+        """
+        The record as the {field: text} dict csv.DictReader yields.
+        """
+        return {
+            name: value if value.__class__ is str else '' if value is None else to_text(value)
+            for name, to_text, value in zip(FIELDS, _FIELD_TO_TEXT, _get_fields(self))
+        }
+
+    def __repr__(self):
+        return f"AuctionRecord(auction_id={self.auction_id!r}, model={self.model!r}, variant={self.variant!r})"
+
+def _given(value):
+    return value is not None and value != ''
+
+def clean_record(record):
+    """
+    The {field: value} dict dataset.clean_row() makes of the same row, from
+    decoded or text records alike. Raises ValueError where clean_row() would.
+    """
+    row = record.to_dict()
+    price, mileage, kw, battery = (record.highest_bid_price, record.mileage,
+                                   record.powe_kw, record.battery_netto)
+    row['highest_bid_price'] = float(price) if _given(price) else 0
+    row['mileage'] = mileage if mileage.__class__ is int else int(mileage) if _given(mileage) else 0
+    row['powe_kw'] = int(float(kw)) if _given(kw) else 0
+    row['battery_netto'] = int(round(float(battery))) if _given(battery) else 0
+    row[CLUSTER_COLUMN] = row_cluster(row)
+    return row
+
+class RecordDecoder:
+    """
+    Builds AuctionRecords from mappings of raw text (csv.DictReader rows).
+    `sources` maps field -> key in the mapping; fields it leaves out or maps
+    to None start as None. By default every field reads its own name.
+
+    decode=False stores the text as it is, for pass-through writers that
+    never look at the values: encoding a text value returns it unchanged,
+    so such records write out the same cells without paying for decoding.
+    """
+
+    def __init__(self, sources=None, decode=True):
+        if sources is None:
+            sources = {name: name for name in FIELDS}
+        self.decode = decode
+        self.plan = tuple(
+            (name, sources[name], codec.decode)
+            for name, codec in zip(FIELDS, CODECS) if sources.get(name) is not None
+        )
+        self.missing = tuple(name for name in FIELDS if sources.get(name) is None)
+
+    def __call__(self, row):
+        get = row.get
+        record = AuctionRecord.__new__(AuctionRecord)
+        if self.decode:
+            for name, key, decode in self.plan:
+                text = get(key)
+                setattr(record, name, decode(text) if text else None)
+        else:
+            for name, key, _ in self.plan:
+                setattr(record, name, get(key))
+        for name in self.missing:
+            setattr(record, name, None)
+        return record
+
+def read_records(csv_path=DATASET_CSV, decode=True):
+    """
+    Yields the dataset rows as AuctionRecords (holding text if not `decode`).
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if columns is None:
+            return
+        columns = tuple(columns)
+        for values in reader:
+            # csv.DictReader skips blank lines too
+            if values:
+                yield AuctionRecord.from_row(values, columns, decode)
+
+def write_records(f, records, header=True):
+    """
+    Writes records to an open text file in the dataset CSV layout.
+    Returns the number of records written.
+    """
+    writer = csv.writer(f)
+    if header:
+        writer.writerow(COLUMNS)
+    n = 0
+    for record in records:
+        writer.writerow(record.to_row())
+        n += 1
+    return n
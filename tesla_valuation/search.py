@@ -0,0 +1,214 @@
+"""
+Random search over VALUATION_CONFIG with successive halving.
+
+Trial i's config is drawn from its own RNG seeded with (seed, i), so a run is
+reproducible whatever the worker count or the order trials finish in. With
+rungs > 1 every config is first scored by LOOCV on a random subsample of the
+targets; the best 1/eta of them move up to a larger sample, and only the
+last rung scores against every target. Each result is appended to a JSON
+lines trial log as it arrives; rerunning with the same log skips the
+(trial, rung) pairs already in it.
+"""
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import load_valuation_config
+from .dataset import DATASET_CSV
+from .dates import parse_iso, utc_now
+from .loocv import LoocvHarness
+
+# block -> parameter -> (kind, low, high), the ranges of optimize_v5_best_of_both.js
+SEARCH_SPACE = {
+    'shared': {
+        'recencyPenalty': ('float', 0.1, 0.4),
+        'accidentPenalty': ('float', 20, 80),
+        'tireUserWants8Penalty': ('float', 20, 60),
+        'tireUserWants4Penalty': ('float', 15, 50),
+        'tireTypePenalty': ('float', 1, 20),
+        'statusPenalty': ('float', 50, 150),
+        'hitchValue': ('float', 150, 350),
+        'neighborCount': ('int', 5, 12),
+        'weightExponent': ('float', 1.5, 5.0),
+    },
+    'model3': {
+        'agePenalty': ('float', 4, 15),
+        'ageQuadratic': ('float', 0, 0.2),
+        'mileageDepreciation': ('float', 0.03, 0.08),
+        'mileageDistancePenalty': ('float', 0.0005, 0.004),
+    },
+    'modelY': {
+        'agePenalty': ('float', 8, 20),
+        'ageQuadratic': ('float', 0, 0.2),
+        'mileageDepreciation': ('float', 0.04, 0.10),
+        'mileageDistancePenalty': ('float', 0.0005, 0.005),
+    },
+}
+
+LOG_VERSION = 1
+
+def trial_config(seed, trial, space=SEARCH_SPACE):
+    """
+    The config of `trial`; depends only on (seed, trial).
+    """
+    rng = random.Random(f"{seed}:{trial}")
+    config = {}
+    for block, params in space.items():
+        config[block] = {}
+        for name, (kind, low, high) in params.items():
+            config[block][name] = rng.randint(low, high) if kind == 'int' else rng.uniform(low, high)
+    return config
+
+def rung_samples(n_targets, rungs, eta, seed):
+    """
+    Nested boolean target masks, one per rung; the last rung is None (every target).
+    """
+    order = np.random.default_rng(seed).permutation(n_targets)
+    samples = []
+    for rung in range(rungs - 1):
+        mask = np.zeros(n_targets, dtype=bool)
+        mask[order[:math.ceil(n_targets / eta ** (rungs - 1 - rung))]] = True
+        samples.append(mask)
+    samples.append(None)
+    return samples
+
+def round_config(config, digits=3):
+    """
+    Floats rounded to `digits` significant digits, as they would be pasted into valuation.js.
+    """
+    rounded = {}
+    for block, params in config.items():
+        rounded[block] = {}
+        for name, value in params.items():
+            if isinstance(value, float) and value:
+                value = round(value, digits - 1 - math.floor(math.log10(abs(value))))
+            rounded[block][name] = value
+    return rounded
+
+def format_config_js(config):
+    """
+    `config` as a `const VALUATION_CONFIG = {...};` literal in valuation.js's layout.
+    """
+    blocks = []
+    for block, params in config.items():
+        lines = []
+        for name, value in params.items():
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            lines.append(f"        {name}: {json.dumps(value)}")
+        blocks.append(f"    {block}: {{\n" + ",\n".join(lines) + "\n    }")
+    return "const VALUATION_CONFIG = {\n" + ",\n".join(blocks) + "\n};"
+
+class TrialLog:
+    """
+    Append-only JSON lines checkpoint. The first line holds the run's settings,
+    then one {'trial', 'rung', 'config', 'result'} record per evaluation.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = None
+        self.records = {}
+        if path and os.path.exists(path):
+            with open(path, 'r+b') as f:
+                good = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write leaves a partial last line; drop it
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    if 'meta' in entry:
+                        self.meta = entry['meta']
+                    else:
+                        self.records[(entry['trial'], entry['rung'])] = entry
+
+    def start(self, meta):
+        """
+        Checks `meta` against a resumed log, or writes it to a new one.
+        """
+        if self.meta is not None:
+            mismatched = [k for k in meta if self.meta.get(k) != meta[k]]
+            if mismatched:
+                raise ValueError(f"{self.path} was written with different settings: {', '.join(mismatched)}")
+            return
+        self.meta = meta
+        self._write({'meta': meta})
+
+    def add(self, record):
+        self.records[(record['trial'], record['rung'])] = record
+        self._write(record)
+
+    def _write(self, entry):
+        if not self.path:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+_worker = {}
+
+def _init_worker(data, now, rungs, eta, seed):
+    harness = LoocvHarness.from_csv(data, now=parse_iso(now))
+    _worker['harness'] = harness
+    _worker['samples'] = rung_samples(len(harness), rungs, eta, seed)
+
+def _evaluate(task):
+    trial, rung, config = task
+    result = _worker['harness'].evaluate(config, _worker['samples'][rung])
+    return {'trial': trial, 'rung': rung, 'config': config, 'result': result}
+
+def _median(record):
+    median = record['result']['median']
+    return math.inf if median is None else median
+
+def run_search(trials, seed=0, workers=1, rungs=1, eta=3, data=DATASET_CSV, now=None,
+               log_path=None, on_record=None):
+    """
+    Runs (or resumes) a search. Returns (final-rung records best first, the
+    run's settings). `on_record(record)` is called for every new evaluation.
+    """
+    log = TrialLog(log_path)
+    now = now or (log.meta or {}).get('now') or utc_now().isoformat()
+    log.start({'version': LOG_VERSION, 'seed': seed, 'trials': trials, 'rungs': rungs, 'eta': eta,
+               'data': os.path.abspath(data), 'now': now})
+
+    init_args = (data, now, rungs, eta, seed)
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) if workers > 1 else None
+    if executor is None:
+        _init_worker(*init_args)
+
+    try:
+        alive = list(range(trials))
+        for rung in range(rungs):
+            tasks = [(t, rung, trial_config(seed, t)) for t in alive if (t, rung) not in log.records]
+            if executor is None:
+                results = map(_evaluate, tasks)
+            else:
+                results = executor.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+            for record in results:
+                log.add(record)
+                if on_record:
+                    on_record(record)
+
+            ranked = sorted(alive, key=lambda t: (_median(log.records[(t, rung)]), t))
+            if rung < rungs - 1:
+                alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+        return [log.records[(t, rungs - 1)] for t in ranked], log.meta
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def evaluate_baseline(data=DATASET_CSV, now=None, config=None):
+    """
+    Full LOOCV result of `config` (VALUATION_CONFIG by default) at the search's valuation date.
+    """
+    harness = LoocvHarness.from_csv(data, now=parse_iso(now))
+    return harness.evaluate(config if config is not None else load_valuation_config())
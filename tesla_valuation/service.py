@@ -0,0 +1,387 @@
+"""
+Local asyncio HTTP pricing service over a warm ValuationEngine.
+
+    POST /price         one predictPrice input  -> {"price": ..., "neighbors": [auction ids]}
+    POST /price/batch   a JSON array of inputs  -> an array of results
+    GET  /health        counters (requests, cache hits, batches, ...)
+    POST /reload        pick up newly published dataset snapshots now
+
+The dataset is loaded and indexed once at startup. Cars that are not in
+the response cache wait up to `batch_window` seconds for others and are
+priced together in one BatchPricer call (on a worker thread, so the event
+loop keeps accepting requests meanwhile); identical cars in flight are
+priced once.
+
+Responses are cached (LRU) under normalized inputs: model, powertrainId,
+the Highland/VAT/hitch/accident flags, tireOption, the valuation date, the
+age in months the registration date gives at that date (all predictPrice
+uses it for) and the mileage rounded to `mileage_bucket` km. Cars are
+priced at the rounded mileage, so every request under one key gets the
+same answer; mileage_bucket=0 prices exact mileages. Requests without a
+valuationDate are valued as of midnight UTC of the current day.
+
+With a SnapshotStore the service follows the published dataset versions
+(every `poll` seconds, or on POST /reload): deltas are applied to a
+copy-on-write engine off the event loop and swapped in between requests.
+Batches already scoring finish against the engine they started with; the
+response cache is dropped with the old version.
+
+Only the standard library is used for HTTP (HTTP/1.1 with keep-alive,
+Content-Length bodies).
+"""
+import asyncio
+import json
+import math
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .batch import BatchPricer
+from .dates import UTC, difference_in_months, parse_iso, utc_now
+
+DEFAULT_BATCH_WINDOW = 0.002
+DEFAULT_MAX_BATCH = 4096
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_MILEAGE_BUCKET = 500
+DEFAULT_POLL = 5.0
+MAX_BODY = 16 << 20
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class LRUCache:
+    """
+    Mapping with a size bound that evicts the least recently used key.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is not None:
+            self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+def today_utc():
+    return datetime.combine(utc_now().date(), datetime.min.time(), UTC)
+
+def normalize_inputs(inputs, mileage_bucket=DEFAULT_MILEAGE_BUCKET, now=None):
+    """
+    (cache key, predictPrice input to price) for one request. Raises
+    ValueError for inputs predictPrice cannot price.
+    """
+    if not isinstance(inputs, dict):
+        raise ValueError("expected a JSON object of predictPrice inputs")
+    for name in ('model', 'powertrainId', 'registrationDate', 'mileage'):
+        if name not in inputs:
+            raise ValueError(f"missing {name}")
+    for name in ('model', 'powertrainId'):
+        if not isinstance(inputs[name], str):
+            raise ValueError(f"{name} must be a string")
+    # A missing or null tireOption prices as matching no comparable's tires, like predictPrice
+    if not isinstance(inputs.get('tireOption'), (str, type(None))):
+        raise ValueError("tireOption must be a string or null")
+    dates = [inputs['registrationDate']] + ([inputs['valuationDate']] if inputs.get('valuationDate') else [])
+    if not all(isinstance(value, str) for value in dates):
+        raise ValueError("registrationDate and valuationDate must be ISO date strings")
+    valuation_date = parse_iso(inputs['valuationDate']) if inputs.get('valuationDate') else now or today_utc()
+    registration = parse_iso(inputs['registrationDate'])
+    if valuation_date is None or registration is None:
+        raise ValueError("registrationDate and valuationDate must be ISO dates")
+    try:
+        mileage = float(inputs['mileage'])
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("mileage must be a number") from None
+    if not math.isfinite(mileage):
+        raise ValueError("mileage must be a finite number")
+    if mileage_bucket:
+        mileage = round(mileage / mileage_bucket) * mileage_bucket
+    try:
+        age = abs(difference_in_months(valuation_date, registration))
+    except OverflowError:
+        raise ValueError("registrationDate and valuationDate are out of range") from None
+
+    query = dict(inputs, mileage=mileage, valuationDate=valuation_date.isoformat())
+    key = (
+        inputs['model'], inputs['powertrainId'],
+        bool(inputs.get('isHighland')), bool(inputs.get('isNetPrice')),
+        bool(inputs.get('hasAhk')), bool(inputs.get('isAccidentFree')), inputs.get('tireOption'),
+        query['valuationDate'], age, mileage,
+    )
+    return key, query
+
+class MicroBatcher:
+    """
+    Collects queries for `window` seconds (or until `max_batch`) and prices
+    them in one BatchPricer call on a single worker thread. Futures resolve
+    to {'price', 'neighbors': [auction ids]}.
+    """
+
+    def __init__(self, pricer, window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        self.pricer = pricer
+        self.window = window
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+        self.timer = None
+        self.batches = 0
+        self.batched = 0
+        self.largest = 0
+
+    def submit(self, query):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((query, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._price(batch))
+
+    async def _price(self, batch):
+        self.batches += 1
+        self.batched += len(batch)
+        self.largest = max(self.largest, len(batch))
+        loop = asyncio.get_running_loop()
+        # The pricer may be swapped while this batch scores; ids come from the one used
+        pricer = self.pricer
+        try:
+            result = await loop.run_in_executor(self.executor, pricer.price, [q for q, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        comps = pricer.engine.comparables
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({
+                    'price': float(result.prices[i]),
+                    'neighbors': [comps[j].row.get('auction_id') for j in result.neighbors[i] if j >= 0],
+                })
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+class PricingService:
+    """
+    The HTTP front end: cache, in-flight deduplication, the micro-batcher
+    and, with `snapshots`, dataset hot reload.
+    """
+
+    def __init__(self, engine, batch_window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH,
+                 cache_size=DEFAULT_CACHE_SIZE, mileage_bucket=DEFAULT_MILEAGE_BUCKET, snapshots=None):
+        self.engine = engine
+        self.batcher = MicroBatcher(BatchPricer(engine), batch_window, max_batch)
+        self.cache = LRUCache(cache_size)
+        self.mileage_bucket = mileage_bucket
+        self.snapshots = snapshots
+        self.reloader = ThreadPoolExecutor(max_workers=1)
+        self.reload_lock = asyncio.Lock()
+        self.inflight = {}
+        self.requests = 0
+        self.priced = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.reloads = 0
+
+    async def price(self, inputs, now=None):
+        key, query = normalize_inputs(inputs, self.mileage_bucket, now)
+        # In-flight cars are shared per dataset version only
+        key = (self.engine.version, key)
+        self.priced += 1
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        future = self.inflight.get(key)
+        if future is None:
+            # A reload replaces the cache; results priced meanwhile stay out of the new one
+            cache = self.cache
+            future = self.inflight[key] = self.batcher.submit(query)
+            try:
+                result = await future
+            finally:
+                del self.inflight[key]
+            cache.put(key, result)
+            return result
+        self.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def refresh(self):
+        """
+        Applies the snapshots published since the running engine's version
+        and swaps the result in. Returns True if the engine changed.
+        """
+        if self.snapshots is None:
+            return False
+        async with self.reload_lock:
+            loop = asyncio.get_running_loop()
+            engine, touched = await loop.run_in_executor(self.reloader, self.snapshots.update_engine, self.engine)
+            if engine is self.engine:
+                return False
+            # Nothing awaits between these, so no request sees a mix of versions
+            self.batcher.pricer = self.batcher.pricer.rebased(engine, touched)
+            self.engine = engine
+            self.cache = LRUCache(self.cache.maxsize)
+            self.reloads += 1
+            return True
+
+    async def follow(self, poll=DEFAULT_POLL):
+        """
+        Checks the snapshot store for new versions every `poll` seconds.
+        """
+        while True:
+            await asyncio.sleep(poll)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # A bad snapshot must not take the service down; keep serving the last good one
+                print(f"Snapshot reload failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def price_many(self, inputs_list):
+        # One timestamp for the whole request, so its cars share a valuation day
+        now = today_utc()
+        return await asyncio.gather(*(self.price(inputs, now) for inputs in inputs_list))
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'version': self.engine.version,
+            'comparables': self.engine.size,
+            'reloads': self.reloads,
+            'requests': self.requests,
+            'errors': self.errors,
+            'cars_priced': self.priced,
+            'cache_hits': self.cache_hits,
+            'coalesced': self.coalesced,
+            'cache_size': len(self.cache),
+            'batches': self.batcher.batches,
+            'batched_cars': self.batcher.batched,
+            'largest_batch': self.batcher.largest,
+        }
+
+    async def dispatch(self, method, path, body):
+        """
+        (status, JSON payload) for one request.
+        """
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return (200, self.health()) if method == 'GET' else (405, {'error': 'use GET'})
+        if path == '/reload':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            if self.snapshots is None:
+                return 400, {'error': 'not following a snapshot store'}
+            reloaded = await self.refresh()
+            return 200, {'reloaded': reloaded, 'version': self.engine.version, 'comparables': self.engine.size}
+        if path not in ('/price', '/price/batch'):
+            return 404, {'error': f"no route {path}"}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            payload = json.loads(body)
+            if path == '/price':
+                return 200, await self.price(payload)
+            if isinstance(payload, dict):
+                payload = payload.get('inputs')
+            if not isinstance(payload, list):
+                raise ValueError("expected a JSON array of predictPrice inputs")
+            return 200, await self.price_many(payload)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+
+    async def handle(self, reader, writer):
+        """
+        asyncio.start_server callback: serves requests on one connection until it closes.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                length = headers.get('content-length', '0')
+                if len(parts) != 3 or not length.isdigit():
+                    status, payload, keep_alive = 400, {'error': 'malformed request'}, False
+                elif int(length) > MAX_BODY:
+                    status, payload, keep_alive = 413, {'error': f"body over {MAX_BODY} bytes"}, False
+                else:
+                    method, path, version = parts
+                    body = await reader.readexactly(int(length))
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    self.requests += 1
+                    try:
+                        status, payload = await self.dispatch(method, path, body)
+                    except Exception as e:
+                        status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                if status != 200:
+                    self.errors += 1
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.batcher.close()
+        self.reloader.shutdown(wait=False)
+
+async def serve(service, host='127.0.0.1', port=8765, ready=None, poll=DEFAULT_POLL):
+    """
+    Runs the service until cancelled. `ready(server)` is called once it
+    listens. With a snapshot store and `poll` seconds, new versions are
+    picked up in the background.
+    """
+    server = await asyncio.start_server(service.handle, host, port)
+    follower = None
+    if service.snapshots is not None and poll:
+        follower = asyncio.get_running_loop().create_task(service.follow(poll))
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if follower is not None:
+            follower.cancel()
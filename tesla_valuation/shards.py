@@ -0,0 +1,167 @@
+"""
+Segment-sharded dataset output: one gzip'd NDJSON file per valuation segment.
+
+predictPrice only ever compares cars of one (model, powertrain cluster,
+Highland, taxation) segment, so the app does not need the whole JSON
+array to price a car. ShardWriter streams the same cleaned rows as the
+JSON into
+
+    <dir>/manifest.json                              segments, row counts, hashes
+    <dir>/model_3__m3_lr__classic__margin.ndjson.gz  one JSON object per line
+    ...
+
+and the app fetches the manifest plus the one shard it needs
+(src/utils/shards.js). Each manifest entry carries the shard's row count,
+its compressed size and the sha256 of its uncompressed NDJSON, which also
+versions the shard's URL for caching. Gzip headers carry no timestamp, so
+unchanged segments are rewritten byte for byte.
+
+Segments are assigned exactly as predictPrice filters: model,
+powertrain_cluster, is_highland == "TRUE", taxation == "vat_deductible".
+Rows predictPrice would drop (no price) stay in their shard, as they stay
+in the JSON.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+from .powertrain import row_cluster
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+SHARD_SUFFIX = '.ndjson.gz'
+
+def row_segment(row):
+    """
+    (model, powertrainId, isHighland, isNetPrice) of a cleaned row.
+    """
+    return (row.get('model'), row_cluster(row), row.get('is_highland') == "TRUE",
+            row.get('taxation') == "vat_deductible")
+
+def shard_file(segment):
+    model, cluster, highland, vat = segment
+    slug = (model or 'none').lower().replace(' ', '_')
+    return (f"{slug}__{cluster or 'none'}__{'highland' if highland else 'classic'}__"
+            f"{'vat' if vat else 'margin'}{SHARD_SUFFIX}")
+
+class _Shard:
+    def __init__(self, path):
+        self.path = path
+        self.raw = open(path + '.tmp', 'wb')
+        # mtime=0 and no file name in the header: identical rows give identical bytes
+        self.gz = gzip.GzipFile(filename='', mode='wb', fileobj=self.raw, mtime=0)
+        self.sha = hashlib.sha256()
+        self.rows = 0
+
+    def write(self, line):
+        self.gz.write(line)
+        self.sha.update(line)
+        self.rows += 1
+
+    def close(self):
+        self.gz.close()
+        self.raw.close()
+
+class ShardWriter:
+    """
+    Streams rows into per-segment shards; only the open gzip streams are
+    held in memory. Use as a context manager, or call close() to publish;
+    the published manifest is kept in `manifest`.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.shards = {}
+        self.manifest = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, row, encoded=None):
+        """
+        Appends a cleaned row; `encoded` is its JSON bytes if already encoded.
+        """
+        segment = row_segment(row)
+        shard = self.shards.get(segment)
+        if shard is None:
+            shard = self.shards[segment] = _Shard(os.path.join(self.out_dir, shard_file(segment)))
+        shard.write((encoded if encoded is not None else json.dumps(row).encode('utf-8')) + b'\n')
+
+    def abort(self):
+        for shard in self.shards.values():
+            shard.close()
+            os.remove(shard.path + '.tmp')
+        self.shards = {}
+
+    def close(self):
+        """
+        Moves the shards into place, writes the manifest last and removes
+        shards of segments that no longer have rows. Returns the manifest.
+        """
+        entries = []
+        for (model, cluster, highland, vat), shard in self.shards.items():
+            shard.close()
+            os.replace(shard.path + '.tmp', shard.path)
+            entries.append({
+                'model': model, 'powertrainId': cluster, 'isHighland': highland, 'isNetPrice': vat,
+                'file': os.path.basename(shard.path), 'rows': shard.rows,
+                'bytes': os.path.getsize(shard.path), 'sha256': shard.sha.hexdigest(),
+            })
+        entries.sort(key=lambda e: e['file'])
+        manifest = {'version': FORMAT_VERSION, 'rows': sum(e['rows'] for e in entries), 'shards': entries}
+        manifest_path = os.path.join(self.out_dir, MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        current = {e['file'] for e in entries}
+        for path in glob.glob(os.path.join(self.out_dir, '*' + SHARD_SUFFIX)):
+            if os.path.basename(path) not in current:
+                os.remove(path)
+        self.shards = {}
+        self.manifest = manifest
+        return manifest
+
+class ShardedDataset:
+    """
+    Reads a sharded output directory, one segment at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format version: {self.manifest.get('version')}")
+        self.entries = {(e['model'], e['powertrainId'], e['isHighland'], e['isNetPrice']): e
+                        for e in self.manifest['shards']}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def load(self, model, powertrain_id, is_highland=False, is_net_price=False, verify=False):
+        """
+        Rows of one segment ([] if it has none). With `verify`, raises
+        ValueError when the shard does not match its manifest hash.
+        """
+        entry = self.entries.get((model, powertrain_id, bool(is_highland), bool(is_net_price)))
+        if entry is None:
+            return []
+        with gzip.open(os.path.join(self.path, entry['file']), 'rb') as f:
+            data = f.read()
+        if verify and hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise ValueError(f"{entry['file']} does not match its manifest hash")
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    def __iter__(self):
+        for segment in self.entries:
+            yield from self.load(*segment)
@@ -0,0 +1,231 @@
+"""
+Versioned, immutable snapshots of the dataset CSV with auction_id deltas.
+
+Ingest publishes each new dataset (scripts/transform_new_csv.py
+--snapshots, or scripts/publish_snapshot.py) into a SnapshotStore:
+
+    dataset_snapshots/
+        CURRENT             latest version number, replaced last
+        v000007/
+            manifest.json   version, parent, row count, the delta's auction_ids
+            dataset.csv     the full dataset as published
+            delta.csv       header + the rows added or changed since the parent
+            rows.json       auction_id -> content hash, to diff the next version
+
+A version directory is complete before it is renamed into place and before
+CURRENT points at it, so readers never see a half-written snapshot.
+
+Long-running pricing processes open an engine once (open_engine) and then
+follow the store (update_engine): each newer version's delta.csv is applied
+with ValuationEngine.with_changes(), so a refresh costs the size of the
+delta rather than a full re-index, and requests still holding the previous
+engine keep a consistent view. Versions without a usable delta (the first
+one, datasets with missing or repeated auction_ids, pruned history) are
+loaded in full from their dataset.csv, as are deltas that price an auction
+the engine skipped before, which only a full load puts in dataset order.
+Delta rows clean_row() rejects remove their auction, as a full load skips
+them. same_comparables() checks a followed engine against a cold load.
+"""
+import csv
+import json
+import os
+import shutil
+from datetime import datetime
+
+from .dataset import clean_row
+from .dates import UTC
+from .engine import ValuationEngine
+from .incremental import content_hash
+
+SNAPSHOT_DIR = 'dataset_snapshots'
+CURRENT = 'CURRENT'
+MANIFEST = 'manifest.json'
+DATASET = 'dataset.csv'
+DELTA = 'delta.csv'
+ROWS = 'rows.json'
+# Versions whose full dataset.csv/rows.json are kept; older ones keep only manifest and delta
+DEFAULT_KEEP = 5
+
+def read_delta(path):
+    """
+    (cleaned rows, auction_ids of rows clean_row() rejects) of a delta CSV.
+    A full load skips rejected rows, so their earlier version must go too.
+    """
+    rows, invalid = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                rows.append(clean_row(row))
+            except ValueError:
+                if row.get('auction_id'):
+                    invalid.append(row['auction_id'])
+    return rows, invalid
+
+def same_comparables(a, b):
+    """
+    Whether two engines hold the same rows in every segment, in the same order.
+    """
+    def listing(engine):
+        return {key: [c.row for c in comps] for key, comps in engine.segments.items() if comps}
+    return listing(a) == listing(b)
+
+class SnapshotStore:
+    """
+    A directory of dataset versions.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+
+    def path(self, version, name=''):
+        return os.path.join(self.root, f"v{version:06d}", name)
+
+    def current(self):
+        """
+        The latest published version, or None for an empty store.
+        """
+        try:
+            with open(os.path.join(self.root, CURRENT), 'r', encoding='utf-8') as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, version):
+        with open(self.path(version, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def row_hashes(self, version):
+        with open(self.path(version, ROWS), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def publish(self, csv_path, keep=DEFAULT_KEEP):
+        """
+        Publishes `csv_path` as the next version and returns its manifest,
+        or the current manifest (unchanged) when no row differs from it.
+        """
+        parent = self.current()
+        parent_rows = self.row_hashes(parent) if parent is not None else {}
+        version = (parent or 0) + 1
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".v{version:06d}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        try:
+            # Diff the copy, not the source, in case ingest rewrites it meanwhile
+            dataset = os.path.join(tmp_dir, DATASET)
+            shutil.copyfile(csv_path, dataset)
+            rows = {}
+            added, changed = [], []
+            keyed = True
+            with open(dataset, 'r', encoding='utf-8', newline='') as src, \
+                    open(os.path.join(tmp_dir, DELTA), 'w', encoding='utf-8', newline='') as out:
+                reader = csv.reader(src)
+                header = next(reader, [])
+                key_col = header.index('auction_id') if 'auction_id' in header else None
+                writer = csv.writer(out)
+                writer.writerow(header)
+                for values in reader:
+                    digest = content_hash(values)
+                    key = values[key_col] if key_col is not None and key_col < len(values) else ''
+                    if not key or key in rows:
+                        # Rows a delta cannot address; still hashed for the change check
+                        keyed = False
+                        key = key or digest
+                    rows[key] = digest
+                    known = parent_rows.get(key)
+                    if known != digest:
+                        writer.writerow(values)
+                        (added if known is None else changed).append(key)
+            removed = [key for key in parent_rows if key not in rows]
+
+            if parent is not None and not (added or changed or removed):
+                return self.manifest(parent)
+            delta = None
+            if parent is not None and keyed:
+                delta = {'added': added, 'changed': changed, 'removed': removed}
+            else:
+                os.remove(os.path.join(tmp_dir, DELTA))
+            with open(os.path.join(tmp_dir, ROWS), 'w', encoding='utf-8') as f:
+                json.dump(rows, f)
+            manifest = {
+                'version': version,
+                'parent': parent,
+                'created_at': datetime.now(UTC).isoformat(),
+                'source': os.path.abspath(csv_path),
+                'rows': len(rows),
+                'counts': {'added': len(added), 'changed': len(changed), 'removed': len(removed)},
+                'delta': delta,
+            }
+            with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1)
+            os.rename(tmp_dir, self.path(version))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        pointer = os.path.join(self.root, CURRENT)
+        with open(pointer + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(f"{version}\n")
+        os.replace(pointer + '.tmp', pointer)
+        self.prune(keep)
+        return manifest
+
+    def prune(self, keep=DEFAULT_KEEP):
+        """
+        Drops dataset.csv and rows.json of all but the newest `keep` versions.
+        Manifests and deltas stay, so followers can still catch up.
+        """
+        current = self.current()
+        if current is None or keep is None:
+            return
+        for version in range(1, current - max(keep, 1) + 1):
+            for name in (DATASET, ROWS):
+                path = self.path(version, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def open_engine(self, version=None, config=None):
+        """
+        A ValuationEngine over a version's full dataset (default: the latest).
+        """
+        version = self.current() if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No snapshot published in {self.root}")
+        engine = ValuationEngine.from_csv(self.path(version, DATASET), config=config)
+        engine.version = version
+        return engine
+
+    def update_engine(self, engine, config=None):
+        """
+        Brings `engine` up to the latest version. Returns (engine, touched
+        segment keys); touched is None when the engine had to be reloaded in
+        full. `engine` itself is never modified.
+        """
+        current = self.current()
+        if current is None or engine.version == current:
+            return engine, set()
+
+        chain = []
+        version = current
+        while engine.version is not None and version > engine.version:
+            manifest = self.manifest(version)
+            if manifest['delta'] is None or manifest['parent'] is None:
+                break
+            chain.append(manifest)
+            version = manifest['parent']
+        if version != engine.version:
+            return self.open_engine(current, config=config if config is not None else engine.config), None
+
+        touched = set()
+        for manifest in reversed(chain):
+            rows, invalid = read_delta(self.path(manifest['version'], DELTA))
+            changed = set(manifest['delta']['changed'])
+            if any(row.get('auction_id') in changed and row['auction_id'] not in engine.by_id
+                   and engine._comparable(row, 0) is not None for row in rows):
+                # An auction the engine skipped before (no price, bad dates) is now
+                # priced; only a full load puts it at its place in the tie-break order
+                return self.open_engine(current, config=config if config is not None else engine.config), None
+            engine, keys = engine.with_changes(rows, list(manifest['delta']['removed']) + invalid)
+            engine.version = manifest['version']
+            touched |= keys
+        return engine, touched
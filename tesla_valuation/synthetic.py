@@ -0,0 +1,128 @@
+"""
+Synthetic auction exports in the schema scripts/transform_new_csv.py reads.
+
+Rows are resampled from the real dataset, so the joint distribution of
+model, powertrain, equipment, taxation, status and damage text is the real
+one. With jitter (the default) each copy is then perturbed the way two
+auctions of the same configuration differ: mileage by a log-normal factor,
+registration and auction dates by a few weeks, bid prices by a few percent,
+and tread depths per tyre set. Without it, rows are verbatim copies.
+"""
+import csv
+import json
+import random
+from datetime import date, timedelta
+
+from .dataset import DATASET_CSV
+
+# Export column <- dataset column (inverse of the renames in transform_row)
+EXPORT_COLUMNS = {
+    'make': 'make', 'model': 'model', 'variant': 'variant', 'mileage': 'mileage',
+    'first_registration': 'first_registration', 'power_kw': 'powe_kw',
+    'drive_type': 'drive_type', 'tesla_autopilot': 'features_autopilot',
+    'heatpump': 'features_heatpump', 'panorama_roof': 'features_pano_roof',
+    'trailer_hitch': 'features_trailer_hitch', 'battery_capacity_netto': 'battery_netto',
+    'battery_capacity_brutto': 'battery_brutto', 'paint_color': 'paint_color',
+    'taxation': 'taxation', 'accident_free_seller': 'accident_free',
+    'accident_free_cardentity': 'accident_free_cardentity', 'number_of_keys': 'number_of_keys',
+    'start_time': 'auction_start_date', 'end_time': 'auction_end_date', 'status': 'status',
+    'highest_bid_amount': 'highest_bid_price', 'max_bid_offer_amount': 'max_bid_offer_amount',
+    'number_of_bids': 'number_of_bids', 'list_price': 'list_price', 'acc': 'acc',
+    'seat_heating': 'seat_heating', 'camera_type': 'camera_type',
+    'trailer_hitch_seller': 'trailer_hitch_seller', 'charging_cables': 'charging_cables',
+    'documents': 'documents', 'form_of_ownership': 'form_of_ownership',
+    'seller_type': 'seller_type', 'auction_id': 'auction_id',
+    'auction_short_id': 'auction_short_id', 'activated_at': 'activated_at',
+    'auction_created_at': 'auction_created_at', 'highest_bid_at': 'highest_bid_at',
+}
+FIELDNAMES = list(EXPORT_COLUMNS) + ['tyres', 'conditions']
+
+AUCTION_DATE_COLUMNS = ('start_time', 'end_time', 'activated_at', 'auction_created_at', 'highest_bid_at')
+PRICE_COLUMNS = ('highest_bid_amount', 'max_bid_offer_amount')
+
+MILEAGE_SIGMA = 0.15      # log-normal spread of mileage around the seed car's
+REGISTRATION_DAYS = 45    # +/- shift of first_registration
+AUCTION_DAYS = 60         # +/- shift of the auction timestamps (all by the same amount)
+PRICE_SIGMA = 0.03        # relative spread of bid prices
+TREAD_DEPTHS = (3, 4, 5, 6, 7, 8)
+DEFAULT_TREAD = {'summer': 5, 'winter': 4, 'all_season': 5}
+
+def shift_date(value, days):
+    """
+    Moves the date part of 'YYYY-MM-DD[...]' by `days`, keeping any time suffix.
+    Values that are not dates are returned unchanged.
+    """
+    if not days or len(value) < 10:
+        return value
+    try:
+        moved = date.fromisoformat(value[:10]) + timedelta(days=days)
+    except ValueError:
+        return value
+    return moved.isoformat() + value[10:]
+
+def scale_number(value, factor, step):
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(round(number * factor / step) * step))
+
+def load_seeds(path=DATASET_CSV):
+    """
+    Dataset rows as (export row, tyre types, damage descriptions) templates.
+    """
+    seeds = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for src in csv.DictReader(f):
+            out = {col: src.get(old) or '' for col, old in EXPORT_COLUMNS.items()}
+            tyres = [kind for kind, flag in (('summer', 'tires_summer'), ('winter', 'tires_winter'),
+                                              ('all_season', 'tires_all_season')) if src.get(flag) == '1']
+            damage = [d for d in (src.get('damage_description') or '').split('; ') if d]
+            seeds.append((out, tyres, damage))
+    if not seeds:
+        raise ValueError(f"No rows in {path} to generate from")
+    return seeds
+
+def synthetic_export(path, rows, non_tesla_share=0.3, seed=42, jitter=True,
+                     malformed_share=0.0, seed_csv=DATASET_CSV):
+    """
+    Writes an auction export of `rows` rows resampled from `seed_csv`, with the
+    tyres/conditions JSON blobs rebuilt from the tire flags and damage text.
+    `malformed_share` of the tyres blobs are truncated, as broken exports are.
+    Same arguments, same file.
+    """
+    rng = random.Random(seed)
+    seeds = load_seeds(seed_csv)
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for i in range(rows):
+            src, tyre_types, damage = rng.choice(seeds)
+            out = dict(src)
+            if rng.random() < non_tesla_share:
+                out['make'] = 'Volkswagen'
+            out['auction_id'] = f"{i:08x}-{src['auction_id'][9:]}"
+
+            if jitter:
+                if out['mileage']:
+                    out['mileage'] = scale_number(out['mileage'], rng.lognormvariate(0, MILEAGE_SIGMA), 100)
+                out['first_registration'] = shift_date(
+                    out['first_registration'], rng.randint(-REGISTRATION_DAYS, REGISTRATION_DAYS))
+                days = rng.randint(-AUCTION_DAYS, AUCTION_DAYS)
+                for col in AUCTION_DATE_COLUMNS:
+                    out[col] = shift_date(out[col], days)
+                factor = 1 + rng.gauss(0, PRICE_SIGMA)
+                for col in PRICE_COLUMNS:
+                    if out[col]:
+                        out[col] = scale_number(out[col], factor, 10)
+
+            tyres = [
+                {'type': kind, 'tread_depth': rng.choice(TREAD_DEPTHS) if jitter else DEFAULT_TREAD[kind]}
+                for kind in tyre_types
+            ]
+            out['tyres'] = json.dumps(tyres)
+            if malformed_share and rng.random() < malformed_share:
+                out['tyres'] = out['tyres'][:-1]
+            out['conditions'] = json.dumps([{'title': 'Damage', 'description': d} for d in damage])
+            writer.writerow(out)